@@ -0,0 +1,3 @@
+"""
+AI tutor package for AI Tutor Backend
+"""
\ No newline at end of file
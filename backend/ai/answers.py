@@ -0,0 +1,112 @@
+from dataclasses import replace
+from datetime import datetime, UTC
+from typing import AsyncIterator, Optional, Tuple
+from fastapi import HTTPException, status
+from backend.ai.cache import answer_cache, answer_cache_key
+from backend.ai.context import related_code
+from backend.ai.engine import AnswerEngine, AnswerRequest, get_engine
+from backend.ai.jobs import AnswerJob, AnswerJobQueue
+from backend.db.repository import execute, table
+from backend.utils.sse import format_sse
+
+async def append_ai_message(student_id: str, question_id: str, text: str) -> dict:
+    """Store a finished AI answer in the question's conversation"""
+    result = await execute(
+        table("conversations").insert({
+            "student_id": student_id,
+            "question_id": question_id,
+            "message_type": "ai",
+            "message_text": text,
+            "created_at": datetime.now(UTC).isoformat()
+        })
+    )
+    
+    if not result.data:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to store AI response"
+        )
+    
+    return result.data[0]
+
+def ai_response_payload(message: dict, is_hint: bool, cached: bool = False) -> dict:
+    """Shape a stored AI conversation row like the AIResponse model"""
+    return {
+        "id": message["id"],
+        "question_id": message["question_id"],
+        "response_text": message["message_text"],
+        "is_hint": is_hint,
+        "cached": cached,
+        "created_at": message["created_at"]
+    }
+
+async def with_related_code(student_id: str, request: AnswerRequest) -> AnswerRequest:
+    """`request` with the most similar chunks of the student's uploaded files attached"""
+    chunks = await related_code(student_id, request.question_text, request.code_context)
+    return replace(request, related_code=tuple(chunks))
+
+async def _replay(text: str) -> AsyncIterator[str]:
+    yield text
+
+async def answer_events(
+    student_id: str,
+    question_id: str,
+    request: AnswerRequest,
+    engine: Optional[AnswerEngine] = None
+) -> AsyncIterator[str]:
+    """
+    Server-Sent Events for one answer: `start` immediately, a `token` per
+    fragment as the engine produces it, then `done` with the stored
+    message once the full answer has been saved (or `error`). `done` carries
+    the message id as its event id, so a reconnecting EventSource reports it.
+    Related code is retrieved after `start`, so it never delays the first event.
+    Answers to equivalent questions are served from the answer cache as a
+    single token without running the engine.
+    """
+    engine = engine or get_engine()
+    yield format_sse("start", {"question_id": question_id, "is_hint": request.is_hint})
+    
+    request = await with_related_code(student_id, request)
+    key = answer_cache_key(request, engine.name)
+    cached = answer_cache.get(key)
+    fragments = []
+    try:
+        source = engine.stream(request) if cached is None else _replay(cached)
+        async for fragment in source:
+            fragments.append(fragment)
+            yield format_sse("token", {"text": fragment})
+        text = "".join(fragments)
+        message = await append_ai_message(student_id, question_id, text)
+    except Exception as e:
+        detail = e.detail if isinstance(e, HTTPException) else "Failed to generate response"
+        yield format_sse("error", {"detail": detail})
+        return
+    
+    if cached is None:
+        answer_cache.set(key, text)
+    
+    yield format_sse(
+        "done",
+        ai_response_payload(message, request.is_hint, cached=cached is not None),
+        event_id=message["id"]
+    )
+
+async def produce_answer(request: AnswerRequest, engine: Optional[AnswerEngine] = None) -> Tuple[str, bool]:
+    """Full answer text for `request`, from the cache when possible; returns (text, cached)"""
+    engine = engine or get_engine()
+    key = answer_cache_key(request, engine.name)
+    cached = answer_cache.get(key)
+    if cached is not None:
+        return cached, True
+    text = await engine.generate(request)
+    answer_cache.set(key, text)
+    return text, False
+
+async def run_answer_job(job: AnswerJob) -> str:
+    """Generate and store the answer for a queued job; returns the message id"""
+    text, _ = await produce_answer(await with_related_code(job.student_id, job.request))
+    message = await append_ai_message(job.student_id, job.question_id, text)
+    return message["id"]
+
+# Background answer generation shared by the chat routes
+answer_jobs = AnswerJobQueue(run_answer_job)
@@ -0,0 +1,150 @@
+import ast
+import builtins
+import hashlib
+import io
+import keyword
+import os
+import re
+import tokenize
+from typing import Optional, Set
+from backend.ai.engine import AnswerRequest
+from backend.utils.cache import TTLCache
+from backend.utils.metrics import cache_stats
+
+# Answer cache configuration
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "2048"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "86400"))
+
+# Maps a canonical question key -> generated answer text
+answer_cache: TTLCache[str] = TTLCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL_SECONDS)
+cache_stats.add("answer", answer_cache.stats)
+
+# Names that carry meaning and must survive identifier normalization
+_KEEP_NAMES = frozenset(keyword.kwlist) | frozenset(keyword.softkwlist) | frozenset(dir(builtins))
+
+# Sentence punctuation closing a question; operators and brackets elsewhere are kept
+_TRAILING_PUNCTUATION = re.compile(r"[\s.?!,;:]+$")
+_WHITESPACE = re.compile(r"\s+")
+_LINE_COMMENT = re.compile(r"(#|//).*?$", re.MULTILINE)
+_BLOCK_COMMENT = re.compile(r"/\*.*?\*/", re.DOTALL)
+_IDENTIFIER = re.compile(r"[A-Za-z_]\w*")
+# An assignment (not a comparison) right after an identifier
+_ASSIGNMENT = re.compile(r"\s*=(?!=)")
+# Member access right before an identifier: obj.name, ptr->name, Type::name
+_MEMBER_ACCESS = re.compile(r"(?:\.|->|::)\s*\Z")
+# Keywords that declare the name after them in C-like languages and JavaScript
+_DECLARATIONS = frozenset({
+    "let", "const", "var", "function", "class", "struct", "def", "fn",
+    "int", "long", "short", "float", "double", "char", "bool", "boolean", "string", "String", "auto", "void",
+})
+
+def normalize_question(text: str) -> str:
+    """
+    Lowercase, collapse whitespace and drop trailing sentence punctuation.
+    Other symbols stay, since "why does a+b fail" and "why does a*b fail"
+    need different answers.
+    """
+    text = _WHITESPACE.sub(" ", text.lower()).strip()
+    return _TRAILING_PUNCTUATION.sub("", text)
+
+def _bound_names(tree: ast.AST) -> Set[str]:
+    """Names a Python snippet binds itself: assignment and loop targets, parameters, defs and classes"""
+    bound, imported = set(), set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            bound.add(node.id)
+        elif isinstance(node, ast.arg):
+            bound.add(node.arg)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            bound.add(node.name)
+        elif isinstance(node, (ast.ExceptHandler, ast.MatchAs, ast.MatchStar)) and node.name:
+            bound.add(node.name)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            imported.update((alias.asname or alias.name).split(".")[0] for alias in node.names)
+    # Imported names refer to outside code, like attributes do
+    return bound - imported
+
+def _normalize_python(code: str) -> Optional[str]:
+    """Token-level normalization for Python; None if the code isn't valid Python"""
+    names = {}
+    parts = []
+    try:
+        tree = ast.parse(code)
+        bound = _bound_names(tree)
+        # `key` in `f(key=value)` names the callee's parameter, not ours
+        keyword_args = {
+            (node.lineno, node.col_offset) for node in ast.walk(tree)
+            if isinstance(node, ast.keyword) and node.arg is not None
+        }
+        previous = None
+        for token in tokenize.generate_tokens(io.StringIO(code).readline):
+            if token.type in (tokenize.COMMENT, tokenize.NL, tokenize.NEWLINE,
+                              tokenize.INDENT, tokenize.DEDENT, tokenize.ENDMARKER):
+                continue
+            if (
+                token.type == tokenize.NAME
+                and token.string in bound
+                and previous != "."
+                and token.start not in keyword_args
+            ):
+                parts.append(names.setdefault(token.string, f"v{len(names)}"))
+            else:
+                parts.append(token.string)
+            previous = token.string
+    except (tokenize.TokenError, SyntaxError, ValueError):
+        return None
+    return " ".join(parts)
+
+def _is_member(code: str, position: int) -> bool:
+    return _MEMBER_ACCESS.search(code, max(position - 8, 0), position) is not None
+
+def _normalize_generic(code: str) -> str:
+    """Regex normalization for code that isn't valid Python"""
+    code = _BLOCK_COMMENT.sub(" ", code)
+    code = _LINE_COMMENT.sub(" ", code)
+    # Assigned or declared names are the snippet's own; anything else may be an API
+    bound = set()
+    previous = None
+    for match in _IDENTIFIER.finditer(code):
+        name = match.group(0)
+        declared = previous is not None and previous.group(0) in _DECLARATIONS \
+            and code[previous.end():match.start()].isspace()
+        if (declared or _ASSIGNMENT.match(code, match.end())) and not _is_member(code, match.start()):
+            bound.add(name)
+        previous = match
+    names = {}
+
+    def rename(match):
+        name = match.group(0)
+        if name in _KEEP_NAMES or name not in bound or _is_member(code, match.start()):
+            return name
+        return names.setdefault(name, f"v{len(names)}")
+
+    code = _IDENTIFIER.sub(rename, code)
+    return _WHITESPACE.sub(" ", code).strip()
+
+def normalize_code(code: Optional[str]) -> str:
+    """
+    Canonical form of a code snippet: comments and layout removed and
+    the names the snippet binds itself renamed in order of first use, so
+    snippets that differ only in their own naming or formatting compare
+    equal. Attributes, imports and other outside names are kept: `nums.sort()`
+    and `nums.reverse()` must not share an answer.
+    """
+    if not code or not code.strip():
+        return ""
+    normalized = _normalize_python(code)
+    if normalized is None:
+        normalized = _normalize_generic(code)
+    return normalized
+
+def answer_cache_key(request: AnswerRequest, engine_name: str) -> str:
+    """Digest of the engine, answer kind, canonical question, code context and retrieved code"""
+    canonical = "\x00".join([
+        engine_name,
+        "hint" if request.is_hint else "answer",
+        normalize_question(request.question_text),
+        normalize_code(request.code_context),
+        *(normalize_code(chunk.text) for chunk in request.related_code),
+    ])
+    return hashlib.sha256(canonical.encode()).hexdigest()
@@ -0,0 +1,143 @@
+import asyncio
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+from starlette.concurrency import run_in_threadpool
+from dotenv import load_dotenv
+from backend.db.repository import execute, table, storage_download
+from backend.search.code_index import CodeChunk, CodeIndex, SOURCE_EXTENSIONS
+
+# Load environment variables
+load_dotenv()
+
+# Chunks of the student's own files attached to each question
+CODE_CONTEXT_TOP_K = int(os.getenv("CODE_CONTEXT_TOP_K", "3"))
+# Files larger than this are not indexed
+CODE_INDEX_MAX_FILE_BYTES = int(os.getenv("CODE_INDEX_MAX_FILE_BYTES", str(256 * 1024)))
+# Newest files read from storage when a student's index is built
+CODE_INDEX_MAX_FILES = int(os.getenv("CODE_INDEX_MAX_FILES", "50"))
+# Longest an answer waits for a student's index to be built; the build carries on in the background
+CODE_CONTEXT_TIMEOUT_SECONDS = float(os.getenv("CODE_CONTEXT_TIMEOUT_SECONDS", "1.0"))
+
+_TEXT_CONTENT_TYPES = {"application/json", "application/javascript", "application/x-python", "application/x-sh", "application/sql"}
+
+# Per-student retrieval indexes over uploaded files
+code_index = CodeIndex()
+
+# (event loop, student id) -> index build in progress, shared by concurrent
+# questions on that loop. The server loop and each answer job worker's loop
+# keep their own builds, since a task can only be awaited on its own loop.
+_builds: Dict[Tuple[asyncio.AbstractEventLoop, str], asyncio.Task] = {}
+_builds_lock = threading.Lock()
+
+def is_indexable(file_name: Optional[str], content_type: Optional[str], size: int) -> bool:
+    """Whether a file is small enough and textual enough to index"""
+    if size > CODE_INDEX_MAX_FILE_BYTES:
+        return False
+    extension = os.path.splitext(file_name or "")[1].lower()
+    content_type = (content_type or "").split(";")[0].strip()
+    return (
+        extension in SOURCE_EXTENSIONS
+        or content_type.startswith("text/")
+        or content_type in _TEXT_CONTENT_TYPES
+    )
+
+def decode_text(data: bytes) -> Optional[str]:
+    """UTF-8 text of `data`, or None for binary content"""
+    if b"\x00" in data:
+        return None
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+
+def _read_text(path: str) -> Optional[str]:
+    with open(path, "rb") as f:
+        return decode_text(f.read())
+
+async def index_uploaded_file(student_id: str, file_row: dict, path: str) -> int:
+    """Add a freshly uploaded file (still spooled at `path`) to the student's index"""
+    if not is_indexable(file_row["name"], file_row.get("content_type"), file_row["size"]):
+        return 0
+    text = await run_in_threadpool(_read_text, path)
+    if text is None:
+        return 0
+    return await run_in_threadpool(code_index.add_file, student_id, file_row["id"], file_row["name"], text)
+
+def forget_file(student_id: str, file_id: str) -> None:
+    """Remove a deleted file from the student's index"""
+    code_index.remove_file(student_id, file_id)
+
+async def _download_text(file_row: dict) -> Optional[str]:
+    try:
+        return decode_text(await storage_download("files", file_row["storage_path"]))
+    except Exception as e:
+        print(f"Failed to read {file_row['storage_path']} for indexing: {e}")
+        return None
+
+async def load_student_index(student_id: str) -> None:
+    """Build the student's index from their newest indexable files"""
+    generation = code_index.generation(student_id)
+    result = await execute(
+        table("files")
+        .select("id, name, content_type, size, storage_path")
+        .eq("student_id", student_id)
+        .order("created_at", desc=True)
+        .limit(CODE_INDEX_MAX_FILES)
+    )
+    rows = [
+        row for row in result.data or []
+        if is_indexable(row["name"], row.get("content_type"), row["size"])
+    ]
+    texts = await asyncio.gather(*(_download_text(row) for row in rows))
+    # Oldest first, so the per-student bound drops the oldest files
+    files = [
+        (row["id"], row["name"], text)
+        for row, text in reversed(list(zip(rows, texts)))
+        if text is not None
+    ]
+    await run_in_threadpool(code_index.load, student_id, files, generation)
+
+def _build_index(student_id: str) -> asyncio.Task:
+    """The student's index build on the running loop, started unless one is already running"""
+    key = (asyncio.get_running_loop(), student_id)
+    with _builds_lock:
+        build = _builds.get(key)
+        if build is None:
+            build = _builds[key] = asyncio.create_task(load_student_index(student_id))
+            build.add_done_callback(lambda task: _build_finished(key, task))
+    return build
+
+def _build_finished(key: Tuple[asyncio.AbstractEventLoop, str], task: asyncio.Task) -> None:
+    student_id = key[1]
+    with _builds_lock:
+        if _builds.get(key) is task:
+            del _builds[key]
+    # Nobody may be waiting any more, so failures are reported here
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Failed to build code index for student {student_id}: {task.exception()}")
+
+async def related_code(student_id: str, question_text: str, code_context: Optional[str] = None) -> List[CodeChunk]:
+    """
+    The chunks of the student's uploaded files most similar to a question.
+    Retrieval is best effort: failures are logged and yield no chunks, and
+    an index that takes longer than CODE_CONTEXT_TIMEOUT_SECONDS to build
+    is skipped for this question.
+    """
+    if CODE_CONTEXT_TOP_K <= 0:
+        return []
+    try:
+        if not code_index.loaded(student_id):
+            # Shielded, so the build finishes for later questions after we give up on it
+            await asyncio.wait_for(asyncio.shield(_build_index(student_id)), CODE_CONTEXT_TIMEOUT_SECONDS)
+        query = f"{question_text}\n{code_context or ''}"
+        matches = await run_in_threadpool(code_index.search, student_id, query, CODE_CONTEXT_TOP_K)
+    except TimeoutError:
+        print(f"Code index for student {student_id} still building, answering without it")
+        return []
+    except Exception as e:
+        print(f"Code retrieval failed for student {student_id}: {e}")
+        return []
+    # The question's own snippet adds nothing when it is one of the matches
+    pasted = (code_context or "").strip()
+    return [chunk for chunk, _ in matches if not pasted or chunk.text.strip() != pasted]
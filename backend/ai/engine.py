@@ -0,0 +1,130 @@
+import asyncio
+import os
+import re
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, Optional, Tuple
+from dotenv import load_dotenv
+from backend.search.code_index import CodeChunk
+
+# Load environment variables
+load_dotenv()
+
+@dataclass
+class AnswerRequest:
+    """Everything an engine needs to answer one question"""
+    question_text: str
+    code_context: Optional[str] = None
+    is_hint: bool = False
+    # Chunks of the student's uploaded files retrieved for this question
+    related_code: Tuple[CodeChunk, ...] = ()
+
+class AnswerEngine(ABC):
+    """Generates tutor answers as a stream of text fragments"""
+
+    name: str = "base"
+
+    @abstractmethod
+    def stream(self, request: AnswerRequest) -> AsyncIterator[str]:
+        """Yield the answer incrementally; joining the fragments gives the full text"""
+
+    async def generate(self, request: AnswerRequest) -> str:
+        """Produce the whole answer at once"""
+        return "".join([fragment async for fragment in self.stream(request)])
+
+# Topic keyword -> explanation used by the local engine
+_TOPICS = [
+    (("for loop", "for-loop", "iterate", "loop"),
+     "A for loop repeats a block once for each item in a sequence. "
+     "Write `for item in items:` and indent the body underneath it."),
+    (("while",),
+     "A while loop keeps running its body as long as its condition is true, "
+     "so make sure something inside the loop eventually makes the condition false."),
+    (("recursion", "recursive"),
+     "A recursive function calls itself on a smaller piece of the problem. "
+     "Every recursive function needs a base case that returns without recursing."),
+    (("function", "def "),
+     "A function packages a piece of logic behind a name. Define it with `def name(parameters):` "
+     "and use `return` to hand a value back to the caller."),
+    (("list", "array"),
+     "A list holds an ordered collection of values. You can index it with `items[0]`, "
+     "add to it with `items.append(value)` and loop over it directly."),
+    (("dict", "dictionary", "map"),
+     "A dictionary maps keys to values. Look values up with `data[key]` or `data.get(key)` "
+     "and loop over `data.items()` to see both."),
+    (("error", "exception", "traceback", "bug"),
+     "Start from the last line of the traceback: it names the error and the line that raised it. "
+     "Then check the values of the variables used on that line."),
+]
+
+_GENERIC = (
+    "Let's break the problem into smaller steps. Describe what the code should do, "
+    "what it does instead, and test each step on its own."
+)
+
+_TOKEN_PATTERN = re.compile(r"\S+\s*|\s+")
+
+class LocalTutorEngine(AnswerEngine):
+    """
+    Deterministic rule-based stand-in for a real model.
+    Used in tests and local development; needs no network or GPU.
+    """
+
+    name = "local"
+
+    def __init__(self, token_delay: float = 0.0):
+        self.token_delay = token_delay
+
+    def compose(self, request: AnswerRequest) -> str:
+        """Build the full answer text for `request`"""
+        question = request.question_text.lower()
+        explanation = next(
+            (text for keywords, text in _TOPICS if any(k in question for k in keywords)),
+            _GENERIC
+        )
+        if request.is_hint:
+            first_sentence = explanation.split(". ")[0].rstrip(".")
+            return f"Hint: {first_sentence}. Try applying that to your code before asking for the full answer."
+        parts = [explanation]
+        if request.code_context:
+            lines = [line for line in request.code_context.splitlines() if line.strip()]
+            parts.append(
+                f"Looking at the {len(lines)} line{'s' if len(lines) != 1 else ''} of code you shared, "
+                "trace it by hand with a small input and compare each step with what you expect."
+            )
+        if request.related_code:
+            labels = ", ".join(chunk.label for chunk in request.related_code)
+            parts.append(f"Your uploaded files look related too: compare with {labels}.")
+        return " ".join(parts)
+
+    async def stream(self, request: AnswerRequest) -> AsyncIterator[str]:
+        for token in _TOKEN_PATTERN.findall(self.compose(request)):
+            if self.token_delay:
+                await asyncio.sleep(self.token_delay)
+            yield token
+
+# Engine name -> factory, selected with the AI_ENGINE environment variable
+_engine_factories: Dict[str, Callable[[], AnswerEngine]] = {
+    "local": lambda: LocalTutorEngine(token_delay=float(os.getenv("AI_LOCAL_TOKEN_DELAY", "0"))),
+}
+
+_engine: Optional[AnswerEngine] = None
+
+def register_engine(name: str, factory: Callable[[], AnswerEngine]) -> None:
+    """Make an engine available under `name` for AI_ENGINE"""
+    _engine_factories[name] = factory
+
+def get_engine() -> AnswerEngine:
+    """Returns the configured answer engine"""
+    global _engine
+    if _engine is None:
+        name = os.getenv("AI_ENGINE", "local")
+        if name not in _engine_factories:
+            raise ValueError(f"Unknown AI_ENGINE: {name}")
+        _engine = _engine_factories[name]()
+    return _engine
+
+def set_engine(engine: Optional[AnswerEngine]) -> None:
+    """Override the active engine (None re-reads AI_ENGINE on next use)"""
+    global _engine
+    _engine = engine
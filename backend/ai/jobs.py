@@ -0,0 +1,175 @@
+import asyncio
+import itertools
+import os
+import queue
+import threading
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, UTC
+from enum import Enum
+from typing import Awaitable, Callable, List, Optional
+from dotenv import load_dotenv
+from backend.ai.engine import AnswerRequest
+from backend.utils.cache import TTLCache
+
+# Load environment variables
+load_dotenv()
+
+# Worker pool configuration
+AI_WORKERS = int(os.getenv("AI_WORKERS", "4"))
+AI_QUEUE_MAX_PENDING = int(os.getenv("AI_QUEUE_MAX_PENDING", "200"))
+AI_JOB_RETENTION_SECONDS = float(os.getenv("AI_JOB_RETENTION_SECONDS", "3600"))
+
+# Suggested client back-off when the queue is saturated
+QUEUE_RETRY_AFTER_SECONDS = 5
+
+# Priority lanes: lower runs first. Hints are short and students wait on them.
+HINT_PRIORITY = 0
+ANSWER_PRIORITY = 1
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+@dataclass
+class AnswerJob:
+    """One answer generation request and its progress"""
+    question_id: str
+    student_id: str
+    request: AnswerRequest
+    id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    status: JobStatus = JobStatus.QUEUED
+    created_at: datetime = field(default_factory=lambda: datetime.now(UTC))
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    message_id: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def is_hint(self) -> bool:
+        return self.request.is_hint
+
+    @property
+    def priority(self) -> int:
+        return HINT_PRIORITY if self.is_hint else ANSWER_PRIORITY
+
+    @property
+    def active(self) -> bool:
+        return self.status in (JobStatus.QUEUED, JobStatus.RUNNING)
+
+class QueueFull(Exception):
+    """Raised when the job queue has no room for another job"""
+
+class QueueClosed(Exception):
+    """Raised when submitting to a queue that has been shut down"""
+
+class AnswerJobQueue:
+    """
+    Bounded priority queue of answer jobs drained by a pool of worker threads.
+    Each worker runs its own event loop, so generation is independent of
+    the request that submitted the job. `runner` does the work and returns
+    the stored AI message id.
+    """
+
+    def __init__(
+        self,
+        runner: Callable[[AnswerJob], Awaitable[str]],
+        workers: int = AI_WORKERS,
+        max_pending: int = AI_QUEUE_MAX_PENDING,
+        retention: float = AI_JOB_RETENTION_SECONDS
+    ):
+        self.runner = runner
+        self.workers = workers
+        self.max_pending = max_pending
+        self._queue: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._closed = False
+        # Latest job per question, kept for polling after it finishes
+        self._jobs: TTLCache[AnswerJob] = TTLCache(max(max_pending * 10, 1000), retention)
+
+    @property
+    def pending(self) -> int:
+        """Jobs waiting for a worker"""
+        return self._pending
+
+    def start(self) -> None:
+        """Start the worker threads if they aren't running"""
+        with self._lock:
+            if self._threads or self._closed:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"ai-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def shutdown(self) -> None:
+        """
+        Stop accepting jobs, drain the queue and wait for the workers to exit.
+        A later submit starts a fresh pool.
+        """
+        with self._lock:
+            self._closed = True
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            # Sentinels sort after every real job
+            self._queue.put((float("inf"), next(self._sequence), None))
+        for thread in threads:
+            thread.join()
+        with self._lock:
+            self._closed = False
+
+    def submit(self, job: AnswerJob) -> AnswerJob:
+        """
+        Queue `job`, or return the question's job already in progress.
+        Raises QueueFull when `max_pending` jobs are waiting.
+        """
+        self.start()
+        with self._lock:
+            if self._closed:
+                raise QueueClosed()
+            existing = self._jobs.get(job.question_id)
+            if existing is not None and existing.active:
+                return existing
+            if self._pending >= self.max_pending:
+                raise QueueFull()
+            self._pending += 1
+            self._jobs.set(job.question_id, job)
+        self._queue.put((job.priority, next(self._sequence), job))
+        return job
+
+    def get(self, question_id: str) -> Optional[AnswerJob]:
+        """Latest job for a question, if one is still remembered"""
+        return self._jobs.get(question_id)
+
+    def _work(self) -> None:
+        loop = asyncio.new_event_loop()
+        try:
+            while True:
+                _, _, job = self._queue.get()
+                if job is None:
+                    return
+                with self._lock:
+                    self._pending -= 1
+                job.status = JobStatus.RUNNING
+                job.started_at = datetime.now(UTC)
+                try:
+                    job.message_id = loop.run_until_complete(self.runner(job))
+                    job.status = JobStatus.COMPLETED
+                except Exception as e:
+                    job.error = str(e) or e.__class__.__name__
+                    job.status = JobStatus.FAILED
+                finally:
+                    job.finished_at = datetime.now(UTC)
+        finally:
+            # Background work a job left behind (like a code index build that
+            # outlived its timeout) is cancelled rather than destroyed pending
+            pending = asyncio.all_tasks(loop)
+            for task in pending:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            loop.close()
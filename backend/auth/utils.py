@@ -1,11 +1,15 @@
 from datetime import datetime, timedelta, UTC
 from typing import Optional
+import hashlib
+import time
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 import os
 from dotenv import load_dotenv
-from backend.db.supabase_client import get_supabase
+from backend.db.repository import execute, table
+from backend.utils.cache import TTLCache
+from backend.utils.metrics import cache_stats
 
 # Load environment variables
 load_dotenv()
@@ -18,6 +22,22 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 if not SECRET_KEY:
     raise ValueError("JWT_SECRET_KEY not found in environment variables")
 
+# Student existence cache configuration
+STUDENT_CACHE_SIZE = int(os.getenv("STUDENT_CACHE_SIZE", "10000"))
+STUDENT_CACHE_TTL_SECONDS = float(os.getenv("STUDENT_CACHE_TTL_SECONDS", "300"))
+STUDENT_NEGATIVE_CACHE_TTL_SECONDS = float(os.getenv("STUDENT_NEGATIVE_CACHE_TTL_SECONDS", "30"))
+
+# Maps student id -> whether the student exists
+student_cache: TTLCache[bool] = TTLCache(STUDENT_CACHE_SIZE, STUDENT_CACHE_TTL_SECONDS)
+cache_stats.add("student", student_cache.stats)
+
+# Verified token cache configuration
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+
+# Maps sha256(token) -> decoded claims, kept until the token's exp
+token_cache: TTLCache[dict] = TTLCache(TOKEN_CACHE_SIZE, ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+cache_stats.add("token", token_cache.stats)
+
 # OAuth2 scheme for token
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
@@ -33,6 +53,45 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def decode_token(token: str) -> dict:
+    """
+    Decode and verify a JWT, reusing claims from earlier requests with the same token.
+    Raises JWTError for invalid or expired tokens.
+    """
+    digest = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(digest)
+    if payload is None:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        exp = payload.get("exp")
+        if exp is not None:
+            remaining = exp - time.time()
+            if remaining > 0:
+                token_cache.set(digest, payload, ttl=remaining)
+    return payload
+
+async def student_exists(student_id: str) -> bool:
+    """Check that a student row exists, consulting the in-process cache first"""
+    exists = student_cache.get(student_id)
+    if exists is None:
+        result = await execute(table("students").select("id").eq("id", student_id))
+        exists = bool(result.data)
+        # Unknown ids are remembered briefly so bad tokens can't hammer the DB
+        ttl = None if exists else STUDENT_NEGATIVE_CACHE_TTL_SECONDS
+        student_cache.set(student_id, exists, ttl=ttl)
+    return exists
+
+def mark_student_exists(student_id: str) -> None:
+    """Record a freshly created student so their first request skips the DB"""
+    student_cache.set(student_id, True)
+
+def invalidate_student(student_id: str) -> None:
+    """Forget a student; call when a student is deleted or disabled"""
+    student_cache.invalidate(student_id)
+
+def clear_student_cache() -> None:
+    """Forget every cached student"""
+    student_cache.clear()
+
 async def get_current_student(token: str = Depends(oauth2_scheme)) -> str:
     """Get current authenticated student from JWT token"""
     credentials_exception = HTTPException(
@@ -41,7 +100,7 @@ async def get_current_student(token: str = Depends(oauth2_scheme)) -> str:
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         student_id: str = payload.get("sub")
         role: str = payload.get("role")
         if student_id is None or role is None:
@@ -52,10 +111,7 @@ async def get_current_student(token: str = Depends(oauth2_scheme)) -> str:
         raise credentials_exception
 
     # Verify student exists in database
-    supabase = get_supabase()
-    result = supabase.table("students").select("id").eq("id", student_id).execute()
-    
-    if not result.data:
+    if not await student_exists(student_id):
         raise credentials_exception
         
     return student_id
@@ -68,7 +124,7 @@ async def get_current_admin(token: str = Depends(oauth2_scheme)) -> str:
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         admin_id: str = payload.get("sub")
         role: str = payload.get("role")
         if admin_id is None or role is None:
@@ -0,0 +1,3 @@
+"""
+Benchmarks package for AI Tutor Backend
+"""
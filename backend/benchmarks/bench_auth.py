@@ -0,0 +1,65 @@
+"""
+Microbenchmark for per-request authentication cost.
+
+Compares verifying the bearer token with `jwt.decode` on every request
+against the shared verified-token cache used by the auth dependencies.
+
+    python -m backend.benchmarks.bench_auth --iterations 20000
+"""
+import argparse
+import asyncio
+import os
+import timeit
+from datetime import timedelta
+
+os.environ.setdefault("SUPABASE_URL", "https://bench.supabase.co")
+os.environ.setdefault("SUPABASE_KEY", "bench-key")
+os.environ.setdefault("JWT_SECRET_KEY", "bench-secret-key")
+
+from jose import jwt
+from backend.auth import utils as auth_utils
+
+
+def report(label: str, seconds: float, iterations: int) -> float:
+    per_call = seconds / iterations * 1e6
+    print(f"{label:<40} {per_call:>9.2f} us/request")
+    return per_call
+
+
+def main(iterations: int):
+    student_id = "00000000-0000-0000-0000-000000000001"
+    token = auth_utils.create_access_token(
+        {"sub": student_id, "role": "student"},
+        expires_delta=timedelta(minutes=30)
+    )
+    # Keep the DB out of the measurement; only token verification differs
+    auth_utils.mark_student_exists(student_id)
+
+    uncached = timeit.timeit(
+        lambda: jwt.decode(token, auth_utils.SECRET_KEY, algorithms=[auth_utils.ALGORITHM]),
+        number=iterations
+    )
+    auth_utils.decode_token(token)
+    cached = timeit.timeit(lambda: auth_utils.decode_token(token), number=iterations)
+
+    before = report("jwt.decode", uncached, iterations)
+    after = report("decode_token (cache hit)", cached, iterations)
+
+    async def dependency_loop():
+        for _ in range(iterations):
+            await auth_utils.get_current_student(token)
+
+    auth_utils.token_cache.clear()
+    loop = asyncio.new_event_loop()
+    dependency = timeit.timeit(lambda: loop.run_until_complete(dependency_loop()), number=1)
+    loop.close()
+    report("get_current_student (end to end)", dependency, iterations)
+    print(f"token verification speedup: {before / after:.1f}x")
+    print(f"token cache: {auth_utils.token_cache.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    main(args.iterations)
@@ -0,0 +1,69 @@
+"""
+Concurrency benchmark for the async data access layer.
+
+Simulates PostgREST round trips with a blocking sleep and compares running
+them directly on the event loop (the old behaviour) against offloading them
+through `backend.db.repository.execute`.
+
+    python -m backend.benchmarks.bench_repository --latency 0.02 --requests 200
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("SUPABASE_URL", "https://bench.supabase.co")
+os.environ.setdefault("SUPABASE_KEY", "bench-key")
+
+from backend.db import repository
+
+
+class SlowQuery:
+    """Stand-in for a query builder whose execute blocks like a network call"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def execute(self):
+        time.sleep(self.latency)
+        return self
+
+
+async def blocking_call(latency: float):
+    return SlowQuery(latency).execute()
+
+
+async def offloaded_call(latency: float):
+    return await repository.execute(SlowQuery(latency))
+
+
+async def drive(call, latency: float, total: int, in_flight: int) -> float:
+    """Run `total` calls with at most `in_flight` outstanding; returns requests/s"""
+    semaphore = asyncio.Semaphore(in_flight)
+
+    async def one():
+        async with semaphore:
+            await call(latency)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return total / (time.perf_counter() - start)
+
+
+async def main(latency: float, total: int, levels):
+    print(f"latency={latency * 1000:.0f}ms requests={total} pool={repository.DB_MAX_CONCURRENCY}")
+    print(f"{'in-flight':>10} {'blocking req/s':>16} {'offloaded req/s':>16} {'speedup':>8}")
+    for in_flight in levels:
+        blocking = await drive(blocking_call, latency, total, in_flight)
+        offloaded = await drive(offloaded_call, latency, total, in_flight)
+        print(f"{in_flight:>10} {blocking:>16.1f} {offloaded:>16.1f} {offloaded / blocking:>7.1f}x")
+    repository.shutdown_executor()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated round trip in seconds")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+    asyncio.run(main(args.latency, args.requests, args.levels))
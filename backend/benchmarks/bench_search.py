@@ -0,0 +1,98 @@
+"""
+Query latency benchmark for the BM25 resource index.
+
+Builds a synthetic catalog with a Zipf-like vocabulary, then compares
+ranking it with `BM25Index.search` against scanning and scoring every
+resource per query, which is what a search without an index has to do.
+
+    python -m backend.benchmarks.bench_search --resources 10000 --queries 500
+"""
+import argparse
+import random
+import statistics
+import time
+
+from backend.search.bm25 import BM25Index, highlight, tokenize
+
+
+def synthetic_catalog(count: int, vocabulary: int, seed: int):
+    rng = random.Random(seed)
+    words = [f"term{i}" for i in range(vocabulary)]
+    # Heavier weights on low ranks, like natural language
+    weights = [1 / (rank + 1) for rank in range(vocabulary)]
+
+    def text(length: int) -> str:
+        return " ".join(rng.choices(words, weights, k=length))
+
+    rows = [
+        {
+            "id": f"{i:08d}",
+            "title": text(6),
+            "description": text(25),
+            "content": text(rng.randint(150, 600)),
+        }
+        for i in range(count)
+    ]
+    queries = [text(rng.randint(1, 4)) for _ in range(512)]
+    return rows, queries
+
+
+def scan(rows, query: str, k: int):
+    """Baseline: tokenize and score every resource for each query"""
+    terms = set(tokenize(query))
+    scored = []
+    for row in rows:
+        tokens = tokenize(f"{row['title']} {row['description']} {row['content']}")
+        score = sum(tokens.count(term) for term in terms)
+        if score:
+            scored.append((score, row["id"]))
+    scored.sort(reverse=True)
+    return scored[:k]
+
+
+def measure(label: str, search, queries, repeat: int):
+    timings = []
+    for i in range(repeat):
+        query = queries[i % len(queries)]
+        start = time.perf_counter()
+        search(query)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<28} p50 {statistics.median(timings):>8.3f} ms   p95 {p95:>8.3f} ms")
+    return statistics.median(timings)
+
+
+def main(resources: int, queries: int, vocabulary: int, k: int, seed: int):
+    rows, query_pool = synthetic_catalog(resources, vocabulary, seed)
+
+    index = BM25Index()
+    start = time.perf_counter()
+    index.load(rows)
+    print(f"indexed {len(index)} resources in {time.perf_counter() - start:.2f} s")
+
+    by_id = {row["id"]: row for row in rows}
+
+    def indexed(query: str):
+        for resource_id, _ in index.search(query, k):
+            highlight(by_id[resource_id]["content"], query)
+
+    fast = measure("BM25Index.search + snippets", indexed, query_pool, queries)
+    slow = measure("full scan", lambda q: scan(rows, q, k), query_pool, min(queries, 20))
+    print(f"speedup: {slow / fast:.1f}x")
+
+    start = time.perf_counter()
+    for row in rows[:1000]:
+        index.add(row["id"], row)
+    print(f"re-index (update) {(time.perf_counter() - start) * 1000 / 1000:.3f} ms/resource")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--resources", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    main(args.resources, args.queries, args.vocabulary, args.k, args.seed)
@@ -0,0 +1,98 @@
+"""
+Serialization benchmark for list endpoints.
+
+Serves the same synthetic `Question` rows through a FastAPI app three
+ways and times complete in-process requests:
+
+  response_model  build Question(**row) per row, FastAPI validates and dumps again
+  validate once   one TypeAdapter pass over the rows, then dump_json
+  trusted rows    encode the DB rows directly (json_response default)
+
+    python -m backend.benchmarks.bench_serialization --rows 1000 10000 100000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import uuid
+from datetime import datetime, UTC
+from typing import List
+
+os.environ.setdefault("SUPABASE_URL", "https://bench.supabase.co")
+os.environ.setdefault("SUPABASE_KEY", "bench-key")
+os.environ.setdefault("JWT_SECRET_KEY", "bench-secret-key")
+
+import httpx
+from fastapi import FastAPI, Response
+from backend.routes.chat import Question
+from backend.utils import serialization
+from backend.utils.serialization import json_response, type_adapter
+
+
+def synthetic_rows(count: int) -> List[dict]:
+    student_id = str(uuid.uuid4())
+    now = datetime.now(UTC).isoformat()
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "student_id": student_id,
+            "question_text": f"How do I reverse a list without slicing? (attempt {i})",
+            "code_context": "items = [1, 2, 3]\nfor i in range(len(items)):\n    print(items[-i])\n",
+            "created_at": now,
+            "resolved": i % 3 == 0,
+        }
+        for i in range(count)
+    ]
+
+
+def build_app(rows: List[dict]) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/response-model", response_model=List[Question])
+    async def response_model():
+        return [Question(**row) for row in rows]
+
+    @app.get("/validate-once", response_model=List[Question])
+    async def validate_once():
+        adapter = type_adapter(List[Question])
+        return Response(adapter.dump_json(adapter.validate_python(rows)), media_type="application/json")
+
+    @app.get("/trusted", response_model=List[Question])
+    async def trusted():
+        return json_response(rows, List[Question])
+
+    return app
+
+
+async def measure(client: httpx.AsyncClient, path: str, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = await client.get(path)
+        response.raise_for_status()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+async def main(sizes: List[int], repeat: int):
+    encoder = "orjson" if serialization.orjson is not None else "pydantic-core"
+    print(f"trusted rows encoder: {encoder}")
+    print(f"{'rows':>8} {'response_model':>16} {'validate once':>15} {'trusted rows':>14} {'speedup':>9}")
+    for size in sizes:
+        app = build_app(synthetic_rows(size))
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            runs = max(1, repeat if size <= 10000 else repeat // 3)
+            baseline = await measure(client, "/response-model", runs)
+            once = await measure(client, "/validate-once", runs)
+            trusted = await measure(client, "/trusted", runs)
+        print(f"{size:>8} {baseline:>13.1f} ms {once:>12.1f} ms {trusted:>11.1f} ms {baseline / trusted:>8.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=9)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.repeat))
@@ -0,0 +1,70 @@
+"""
+Memory benchmark for file uploads.
+
+Measures peak Python heap while handling uploads of growing size, comparing
+the old read-everything path (`await file.read()`) with `spool_upload`,
+which copies the request in fixed-size chunks to a temp file for storage.
+
+    python -m backend.benchmarks.bench_uploads --sizes 8 32 128
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import tracemalloc
+
+os.environ.setdefault("SUPABASE_URL", "https://bench.supabase.co")
+os.environ.setdefault("SUPABASE_KEY", "bench-key")
+
+from fastapi import UploadFile
+from backend.db import storage
+
+MB = 1024 * 1024
+
+
+def make_upload(size: int) -> UploadFile:
+    """An UploadFile backed by a disk file, as Starlette produces for large bodies"""
+    spool = tempfile.TemporaryFile()
+    block = os.urandom(MB)
+    for _ in range(size // MB):
+        spool.write(block)
+    spool.seek(0)
+    return UploadFile(file=spool, filename="payload.bin", size=size)
+
+
+async def read_all(upload: UploadFile) -> int:
+    content = await upload.read()
+    return len(content)
+
+
+async def spooled(upload: UploadFile) -> int:
+    result = await storage.spool_upload(upload, max_bytes=2 ** 40)
+    result.close()
+    return result.size
+
+
+async def peak_memory(handler, size: int) -> float:
+    upload = make_upload(size)
+    tracemalloc.start()
+    await handler(upload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    await upload.close()
+    return peak / MB
+
+
+async def main(sizes):
+    print(f"chunk={storage.UPLOAD_CHUNK_SIZE // 1024}KiB")
+    print(f"{'upload MiB':>10} {'read() peak MiB':>16} {'spooled peak MiB':>17}")
+    for size_mb in sizes:
+        size = size_mb * MB
+        before = await peak_memory(read_all, size)
+        after = await peak_memory(spooled, size)
+        print(f"{size_mb:>10} {before:>16.1f} {after:>17.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[8, 32, 128], help="upload sizes in MiB")
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes))
@@ -0,0 +1,352 @@
+"""
+In-process stand-in for PostgREST and Supabase Storage, for load tests.
+
+Implements the query-builder calls the app makes (select/insert/update/
+delete with eq, neq, in_, or_, order, limit, the create_questions RPC and
+the blob RPCs) over thread-safe in-memory tables. Storage has both the SDK
+calls and the REST endpoint used for streaming downloads. Every call sleeps for an
+injected latency: a blocking sleep for the SDK calls, which run on the
+repository's thread pool just like real network I/O, and an async sleep
+for the streaming endpoint.
+"""
+import asyncio
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, UTC
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+from urllib.parse import unquote
+import httpx
+
+_METHODS = {"select": "GET", "insert": "POST", "rpc": "POST", "update": "PATCH", "delete": "DELETE"}
+
+
+class Latency:
+    """A base delay plus uniform jitter, in seconds"""
+
+    def __init__(self, base: float = 0.0, jitter: float = 0.0, seed: Optional[int] = None):
+        self.base = base
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        if not self.jitter:
+            return self.base
+        with self._lock:
+            return self.base + self._random.uniform(0, self.jitter)
+
+    def sleep(self) -> None:
+        delay = self.sample()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def _split_filters(filters: str) -> List[str]:
+    """Split a PostgREST or=/and= filter list on top-level commas"""
+    parts, depth, current, quoted = [], 0, "", False
+    for char in filters:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and char == "," and depth == 0:
+            parts.append(current)
+            current = ""
+            continue
+        current += char
+    parts.append(current)
+    return parts
+
+
+def _matches(row: Dict[str, Any], expression: str) -> bool:
+    if expression.startswith("and("):
+        return all(_matches(row, part) for part in _split_filters(expression[4:-1]))
+    if expression.startswith("or("):
+        return any(_matches(row, part) for part in _split_filters(expression[3:-1]))
+    field, op, value = expression.split(".", 2)
+    value = value.strip('"')
+    current = str(row.get(field, ""))
+    return {
+        "eq": current == value,
+        "neq": current != value,
+        "lt": current < value,
+        "lte": current <= value,
+        "gt": current > value,
+        "gte": current >= value,
+    }[op]
+
+
+class FakeQuery:
+    def __init__(self, table: "FakeTable", action: str, columns: str = "*", value: Any = None):
+        self.table = table
+        self.action = action
+        self.columns = columns
+        self.value = value
+        self.conditions = []
+        self.orders = []
+        self.limit_count = None
+
+    @property
+    def request(self):
+        """Enough of a postgrest request for the repository's metrics and tracing"""
+        params = [("select", self.columns)] if self.action == "select" else []
+        for op, field, value in self.conditions:
+            if op == "or":
+                params.append(("or", f"({field})"))
+            elif op == "in":
+                params.append((field, f"in.({','.join(map(str, value))})"))
+            else:
+                params.append((field, f"{op}.{value}"))
+        if self.orders:
+            params.append(("order", ",".join(f"{f}.{'desc' if desc else 'asc'}" for f, desc in self.orders)))
+        if self.limit_count is not None:
+            params.append(("limit", str(self.limit_count)))
+        return SimpleNamespace(
+            path=f"http://fake/rest/v1/{self.table.name}",
+            http_method=_METHODS[self.action],
+            params=httpx.QueryParams(params)
+        )
+
+    def eq(self, field: str, value: Any):
+        self.conditions.append(("eq", field, value))
+        return self
+
+    def neq(self, field: str, value: Any):
+        self.conditions.append(("neq", field, value))
+        return self
+
+    def in_(self, field: str, values: List[Any]):
+        self.conditions.append(("in", field, set(values)))
+        return self
+
+    def or_(self, filters: str):
+        self.conditions.append(("or", filters, None))
+        return self
+
+    def order(self, field: str, desc: bool = False):
+        self.orders.append((field, desc))
+        return self
+
+    def limit(self, count: int):
+        self.limit_count = count
+        return self
+
+    def _selected(self, row: Dict[str, Any]) -> bool:
+        for op, field, value in self.conditions:
+            if op == "eq" and row.get(field) != value:
+                return False
+            if op == "neq" and row.get(field) == value:
+                return False
+            if op == "in" and row.get(field) not in value:
+                return False
+            if op == "or" and not any(_matches(row, part) for part in _split_filters(field)):
+                return False
+        return True
+
+    def _project(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        if self.columns == "*":
+            return dict(row)
+        return {name.strip(): row.get(name.strip()) for name in self.columns.split(",")}
+
+    def execute(self):
+        self.table.latency.sleep()
+        with self.table.lock:
+            if self.action == "insert":
+                values = self.value if isinstance(self.value, list) else [self.value]
+                rows = [{**value, "id": str(uuid.uuid4())} for value in values]
+                self.table.rows.extend(rows)
+                return SimpleNamespace(data=[dict(row) for row in rows])
+            rows = [row for row in self.table.rows if self._selected(row)]
+            if self.action == "update":
+                for row in rows:
+                    row.update(self.value)
+            elif self.action == "delete":
+                doomed = {id(row) for row in rows}
+                self.table.rows[:] = [row for row in self.table.rows if id(row) not in doomed]
+            for field, desc in reversed(self.orders):
+                rows.sort(key=lambda row: row.get(field) or "", reverse=desc)
+            if self.limit_count is not None:
+                rows = rows[:self.limit_count]
+            return SimpleNamespace(data=[self._project(row) for row in rows])
+
+
+class FakeTable:
+    def __init__(self, name: str, latency: Latency):
+        self.name = name
+        self.latency = latency
+        self.rows: List[Dict[str, Any]] = []
+        self.lock = threading.Lock()
+
+    def select(self, columns: str = "*"):
+        return FakeQuery(self, "select", columns=columns)
+
+    def insert(self, value):
+        return FakeQuery(self, "insert", value=value)
+
+    def update(self, value: Dict[str, Any]):
+        return FakeQuery(self, "update", value=value)
+
+    def delete(self):
+        return FakeQuery(self, "delete")
+
+
+class FakeRpc:
+    def __init__(self, client: "FakeSupabase", function: str, params: Dict[str, Any]):
+        self.client = client
+        self.function = function
+        self.params = params
+
+    @property
+    def request(self):
+        return SimpleNamespace(path=f"http://fake/rest/v1/rpc/{self.function}", http_method="POST", params=None)
+
+    def execute(self):
+        self.client.latency.sleep()
+        return SimpleNamespace(data=getattr(self.client, f"_rpc_{self.function}")(**self.params))
+
+
+class FakeStorage:
+    """Storage SDK calls plus an httpx transport for the streaming REST endpoint"""
+
+    def __init__(self, latency: Latency):
+        self.latency = latency
+        self.objects: Dict[str, bytes] = {}
+        self.lock = threading.Lock()
+
+    def from_(self, bucket: str):
+        return self
+
+    def upload(self, path: str, data: Any, file_options: Optional[Dict[str, Any]] = None):
+        self.latency.sleep()
+        if isinstance(data, str):
+            with open(data, "rb") as source:
+                data = source.read()
+        with self.lock:
+            self.objects[path] = bytes(data)
+        return {"Key": path}
+
+    def download(self, path: str) -> bytes:
+        self.latency.sleep()
+        return self.objects.get(path, b"")
+
+    def remove(self, paths: List[str]):
+        self.latency.sleep()
+        with self.lock:
+            for path in paths:
+                self.objects.pop(path, None)
+        return [{"name": path} for path in paths]
+
+    def transport(self) -> httpx.MockTransport:
+        async def handle(request: httpx.Request) -> httpx.Response:
+            delay = self.latency.sample()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            path = unquote(request.url.path).split("/object/", 1)[1].split("/", 1)[1]
+            data = self.objects.get(path)
+            if data is None:
+                return httpx.Response(404, json={"error": "not_found"})
+            range_header = request.headers.get("range")
+            if range_header:
+                start, end = (int(x) for x in range_header[len("bytes="):].split("-"))
+                return httpx.Response(206, content=data[start:end + 1])
+            return httpx.Response(200, content=data)
+        return httpx.MockTransport(handle)
+
+
+class FakeSupabase:
+    """The subset of the Supabase client used by the app"""
+
+    def __init__(self, latency: Latency, storage_latency: Latency):
+        self.latency = latency
+        self.tables: Dict[str, FakeTable] = {}
+        self.storage = FakeStorage(storage_latency)
+        self._lock = threading.Lock()
+        # storage_path -> blobs row; each blob RPC holds the lock, like its transaction
+        self.blobs: Dict[str, Dict[str, Any]] = {}
+        self._blob_lock = threading.Lock()
+
+    def table(self, name: str) -> FakeTable:
+        with self._lock:
+            if name not in self.tables:
+                self.tables[name] = FakeTable(name, self.latency)
+            return self.tables[name]
+
+    def rpc(self, function: str, params: Dict[str, Any]) -> FakeRpc:
+        return FakeRpc(self, function, params)
+
+    def _rpc_create_questions(self, p_student_id: str, p_questions: List[Dict[str, Any]]):
+        questions, conversations = self.table("questions"), self.table("conversations")
+        created = []
+        for question in p_questions:
+            now = datetime.now(UTC).isoformat()
+            row = {
+                "id": str(uuid.uuid4()),
+                "student_id": p_student_id,
+                "question_text": question["question_text"],
+                "code_context": question.get("code_context"),
+                "resolved": False,
+                "created_at": now
+            }
+            with questions.lock:
+                questions.rows.append(row)
+            with conversations.lock:
+                conversations.rows.append({
+                    "id": str(uuid.uuid4()),
+                    "student_id": p_student_id,
+                    "question_id": row["id"],
+                    "message_type": "student",
+                    "message_text": question["question_text"],
+                    "created_at": now
+                })
+            created.append(dict(row))
+        return created
+
+    def _rpc_claim_blobs(self, p_paths: List[str], p_stale_seconds: int):
+        with self._blob_lock:
+            now = time.monotonic()
+            for path in p_paths:
+                row = self.blobs.setdefault(path, {"state": "uploading", "updated_at": now})
+                if row["state"] == "deleting" and row["updated_at"] < now - p_stale_seconds:
+                    row.update(state="uploading", updated_at=now)
+            return [{"storage_path": path, "state": self.blobs[path]["state"]} for path in p_paths]
+
+    def _rpc_mark_blobs_ready(self, p_paths: List[str]):
+        with self._blob_lock:
+            for path in p_paths:
+                self.blobs[path] = {"state": "ready", "updated_at": time.monotonic()}
+        return None
+
+    def _rpc_begin_blob_release(self, p_paths: List[str]):
+        files = self.table("files")
+        with self._blob_lock, files.lock:
+            referenced = {row["storage_path"] for row in files.rows}
+            released = []
+            for path in p_paths:
+                row = self.blobs.get(path)
+                if row is not None and row["state"] == "ready" and path not in referenced:
+                    row.update(state="deleting", updated_at=time.monotonic())
+                    released.append({"storage_path": path})
+            return released
+
+    def _rpc_finish_blob_release(self, p_paths: List[str]):
+        with self._blob_lock:
+            for path in p_paths:
+                if self.blobs.get(path, {}).get("state") == "deleting":
+                    del self.blobs[path]
+        return None
+
+
+def install(db_latency: Latency, storage_latency: Latency) -> FakeSupabase:
+    """Point the app's Supabase client and storage HTTP client at a fresh fake"""
+    from backend.db import storage, supabase_client
+
+    fake = FakeSupabase(db_latency, storage_latency)
+    supabase_client.get_supabase = lambda: fake
+    http = httpx.AsyncClient(base_url="http://fake/storage/v1", transport=fake.storage.transport())
+    storage.get_storage_http = lambda: http
+    return fake
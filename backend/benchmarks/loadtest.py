@@ -0,0 +1,373 @@
+"""
+Load test of the full app against an in-process Supabase stand-in.
+
+Virtual users register, log in, then loop over a weighted mix of the
+question, conversation, answer, file and resource endpoints until the
+run ends. Requests go through the real app, middleware and repository
+thread pool via httpx's ASGI transport; only PostgREST and Storage are
+replaced (see fake_supabase), with an injected latency per call so the
+numbers reflect waiting on the network rather than an instant fake.
+
+Reports count, errors, p50/p95/p99 and throughput per operation. With
+--output the report is also written as JSON; --save-baseline stores it
+for later runs and --baseline compares against a stored one, exiting 1
+when p95 latency, throughput or error rate regressed beyond --tolerance.
+
+    python -m backend.benchmarks.loadtest --users 50 --duration 30 --db-latency-ms 5 --baseline loadtest-baseline.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, UTC
+from typing import Any, Dict, List, Optional
+
+os.environ.setdefault("SUPABASE_URL", "https://bench.supabase.co")
+os.environ.setdefault("SUPABASE_KEY", "bench-key")
+os.environ.setdefault("JWT_SECRET_KEY", "bench-secret-key")
+
+import httpx
+from backend.benchmarks.fake_supabase import Latency, install
+from backend.main import app
+
+# Operation -> relative weight in the steady-state mix
+MIX = {
+    "list_questions": 15,
+    "ask_question": 10,
+    "conversation": 15,
+    "answer": 5,
+    "upload_file": 5,
+    "list_files": 10,
+    "download_file": 10,
+    "list_resources": 10,
+    "get_resource": 10,
+    "search_tags": 5,
+    "search_text": 5,
+}
+
+TAGS = ["python", "loops", "recursion", "functions", "lists", "dictionaries", "errors", "classes", "strings", "sorting"]
+WORDS = ["loop", "function", "recursion", "list", "dictionary", "error", "class", "string", "sort", "variable"]
+QUESTIONS = [
+    "How do I write a for loop over a list?",
+    "Why does my recursive function never stop?",
+    "What is the difference between a list and a dictionary?",
+    "How do I read this traceback error?",
+    "When should I use a while loop?",
+]
+CODE = "def total(items):\n    result = 0\n    for item in items:\n        result += item\n    return result\n"
+
+
+class Recorder:
+    """Latencies and failures per operation"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.first_error: Dict[str, str] = {}
+
+    def record(self, name: str, seconds: float, error: Optional[str] = None) -> None:
+        self.latencies[name].append(seconds)
+        if error is not None:
+            self.errors[name] += 1
+            self.first_error.setdefault(name, error)
+
+
+def percentile(ordered: List[float], share: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    return ordered[max(math.ceil(share * len(ordered)) - 1, 0)]
+
+
+def summarize(samples: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "errors": errors,
+        "error_rate": round(errors / len(ordered), 4) if ordered else 0.0,
+        "throughput_rps": round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+    }
+
+
+class VirtualUser:
+    """One student working through the operation mix"""
+
+    def __init__(
+        self,
+        index: int,
+        client: httpx.AsyncClient,
+        recorder: Recorder,
+        rng: random.Random,
+        resource_ids: List[str],
+        shared_uploads: float = 0.5
+    ):
+        self.index = index
+        self.client = client
+        self.recorder = recorder
+        self.rng = rng
+        self.resource_ids = resource_ids
+        self.shared_uploads = shared_uploads
+        self.headers: Dict[str, str] = {}
+        self.question_ids: List[str] = []
+        self.file_ids: List[str] = []
+
+    async def request(self, name: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        """Time one request; anything but a 2xx/3xx counts as an error"""
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=self.headers, **kwargs)
+        except Exception as e:
+            self.recorder.record(name, time.perf_counter() - start, f"{type(e).__name__}: {e}")
+            return None
+        error = None if response.status_code < 400 else f"{response.status_code} {response.text[:200]}"
+        self.recorder.record(name, time.perf_counter() - start, error)
+        return response if error is None else None
+
+    async def setup(self) -> bool:
+        email = f"loadtest-{self.index}-{uuid.uuid4().hex[:8]}@example.com"
+        registered = await self.request("register", "POST", "/auth/register", json={
+            "email": email,
+            "password": "loadtest-password",
+            "name": f"Load Test {self.index}",
+            "grade_level": "10",
+            "school": "Benchmark High"
+        })
+        logged_in = await self.request("login", "POST", "/auth/login", json={
+            "email": email,
+            "password": "loadtest-password"
+        })
+        response = logged_in or registered
+        if response is None:
+            return False
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        return True
+
+    async def run(self, deadline: float, iterations: Optional[int]) -> None:
+        names, weights = list(MIX), list(MIX.values())
+        done = 0
+        while time.perf_counter() < deadline and (iterations is None or done < iterations):
+            await getattr(self, self.rng.choices(names, weights)[0])()
+            done += 1
+
+    async def list_questions(self):
+        await self.request("list_questions", "GET", "/chat/questions", params={"limit": 20})
+
+    async def ask_question(self):
+        response = await self.request("ask_question", "POST", "/chat/questions", json={
+            "question_text": self.rng.choice(QUESTIONS),
+            "code_context": CODE if self.rng.random() < 0.5 else None
+        })
+        if response is not None:
+            self.question_ids.append(response.json()["id"])
+
+    async def conversation(self):
+        if not self.question_ids:
+            return await self.ask_question()
+        await self.request("conversation", "GET", f"/chat/conversations/{self.rng.choice(self.question_ids)}")
+
+    async def answer(self):
+        if not self.question_ids:
+            return await self.ask_question()
+        await self.request("answer", "GET", f"/chat/questions/{self.rng.choice(self.question_ids)}/answer/stream")
+
+    async def upload_file(self):
+        # Shared uploads repeat content other students uploaded, exercising blob sharing
+        variant = self.rng.randrange(4) if self.rng.random() < self.shared_uploads else uuid.uuid4().hex
+        content = f"# solution {variant}\n{CODE}".encode() * 20
+        response = await self.request("upload_file", "POST", "/files/upload", files={
+            "file": (f"solution_{variant}.py", content, "text/x-python")
+        })
+        if response is not None:
+            self.file_ids.append(response.json()["id"])
+
+    async def list_files(self):
+        await self.request("list_files", "GET", "/files/list")
+
+    async def download_file(self):
+        if not self.file_ids:
+            return await self.upload_file()
+        await self.request("download_file", "GET", f"/files/{self.rng.choice(self.file_ids)}/raw")
+
+    async def list_resources(self):
+        await self.request("list_resources", "GET", "/resources/", params={"limit": 20})
+
+    async def get_resource(self):
+        await self.request("get_resource", "GET", f"/resources/{self.rng.choice(self.resource_ids)}")
+
+    async def search_tags(self):
+        await self.request("search_tags", "GET", "/resources/search", params={"tag": self.rng.sample(TAGS, 2)})
+
+    async def search_text(self):
+        await self.request("search_text", "GET", "/resources/search/text", params={"q": " ".join(self.rng.sample(WORDS, 2))})
+
+
+def seed_resources(fake, count: int, rng: random.Random) -> List[str]:
+    """Insert `count` resources straight into the fake, outside the measurement"""
+    now = datetime.now(UTC)
+    rows = []
+    for i in range(count):
+        stamp = (now - timedelta(minutes=i)).isoformat()
+        words = " ".join(rng.choices(WORDS, k=40))
+        rows.append({
+            "id": str(uuid.uuid4()),
+            "title": f"Resource {i}: {rng.choice(WORDS)}",
+            "description": f"About {rng.choice(WORDS)} and {rng.choice(WORDS)}",
+            "content": words,
+            "file_type": "article",
+            "tags": rng.sample(TAGS, 3),
+            "created_at": stamp,
+            "updated_at": stamp,
+        })
+    fake.table("resources").rows.extend(rows)
+    return [row["id"] for row in rows]
+
+
+async def run(config: Dict[str, Any]) -> Dict[str, Any]:
+    rng = random.Random(config["seed"])
+    fake = install(
+        Latency(config["db_latency_ms"] / 1000, config["db_jitter_ms"] / 1000, config["seed"]),
+        Latency(config["storage_latency_ms"] / 1000, config["db_jitter_ms"] / 1000, config["seed"])
+    )
+    resource_ids = seed_resources(fake, config["resources"], rng)
+    recorder = Recorder()
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with app.router.lifespan_context(app), httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+        users = [
+            VirtualUser(i, client, recorder, random.Random(rng.random()), resource_ids, config["shared_uploads"])
+            for i in range(config["users"])
+        ]
+        setup_start = time.perf_counter()
+        ready = await asyncio.gather(*(user.setup() for user in users))
+        setup_elapsed = time.perf_counter() - setup_start
+        users = [user for user, ok in zip(users, ready) if ok]
+
+        start = time.perf_counter()
+        deadline = start + config["duration"] if config["iterations"] is None else math.inf
+        await asyncio.gather(*(user.run(deadline, config["iterations"]) for user in users))
+        elapsed = time.perf_counter() - start
+
+    operations = {}
+    for name in sorted(recorder.latencies):
+        phase = setup_elapsed if name in ("register", "login") else elapsed
+        operations[name] = summarize(recorder.latencies[name], recorder.errors[name], phase)
+    mixed = [seconds for name, samples in recorder.latencies.items() if name in MIX for seconds in samples]
+    overall = summarize(mixed, sum(recorder.errors[name] for name in MIX), elapsed)
+    return {
+        "config": config,
+        "started_at": datetime.now(UTC).isoformat(),
+        "active_users": len(users),
+        "duration_seconds": round(elapsed, 3),
+        "overall": overall,
+        "operations": operations,
+        "first_errors": dict(recorder.first_error),
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float, min_delta_ms: float) -> List[str]:
+    """Regressions of `report` against `baseline`, as readable lines"""
+    regressions = []
+    checked = {"overall": (report["overall"], baseline["overall"])}
+    for name, base in baseline["operations"].items():
+        if name not in report["operations"]:
+            regressions.append(f"{name}: not run")
+            continue
+        checked[name] = (report["operations"][name], base)
+    for name, (current, base) in checked.items():
+        if current["p95_ms"] > base["p95_ms"] * (1 + tolerance) and current["p95_ms"] - base["p95_ms"] > min_delta_ms:
+            regressions.append(f"{name}: p95 {base['p95_ms']:.1f}ms -> {current['p95_ms']:.1f}ms")
+        if current["error_rate"] > base["error_rate"] + 0.01:
+            regressions.append(f"{name}: error rate {base['error_rate']:.2%} -> {current['error_rate']:.2%}")
+    current, base = report["overall"]["throughput_rps"], baseline["overall"]["throughput_rps"]
+    if current < base * (1 - tolerance):
+        regressions.append(f"overall: throughput {base:.1f} -> {current:.1f} req/s")
+    return regressions
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    config = report["config"]
+    print(
+        f"{report['active_users']} users, {report['duration_seconds']:.1f}s, "
+        f"db latency {config['db_latency_ms']}ms (+{config['db_jitter_ms']}ms jitter), "
+        f"storage latency {config['storage_latency_ms']}ms"
+    )
+    print(f"{'operation':<16} {'count':>7} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, stats in list(report["operations"].items()) + [("overall", report["overall"])]:
+        print(
+            f"{name:<16} {stats['count']:>7} {stats['errors']:>7} {stats['throughput_rps']:>9.1f} "
+            f"{stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}"
+        )
+    for name, error in report["first_errors"].items():
+        print(f"first {name} error: {error}")
+
+
+def write_json(path: str, data: Dict[str, Any]) -> None:
+    with open(path, "w") as out:
+        json.dump(data, out, indent=2)
+        out.write("\n")
+
+
+def main(args) -> int:
+    config = {
+        "users": args.users,
+        "duration": args.duration,
+        "iterations": args.iterations,
+        "resources": args.resources,
+        "db_latency_ms": args.db_latency_ms,
+        "db_jitter_ms": args.db_jitter_ms,
+        "storage_latency_ms": args.storage_latency_ms,
+        "shared_uploads": args.shared_uploads,
+        "seed": args.seed,
+    }
+    report = asyncio.run(run(config))
+    print_report(report)
+    if args.output:
+        write_json(args.output, report)
+    if args.save_baseline:
+        write_json(args.save_baseline, report)
+        print(f"Saved baseline to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline) as source:
+            baseline = json.load(source)
+        if baseline["config"] != config:
+            print(f"Warning: baseline was recorded with a different config: {baseline['config']}")
+        regressions = compare(report, baseline, args.tolerance, args.min_delta_ms)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of steady-state load")
+    parser.add_argument("--iterations", type=int, default=None, help="operations per user instead of a duration")
+    parser.add_argument("--resources", type=int, default=500, help="resources seeded before the run")
+    parser.add_argument("--db-latency-ms", type=float, default=5.0, help="delay added to every PostgREST call")
+    parser.add_argument("--db-jitter-ms", type=float, default=2.0, help="uniform jitter added to every injected delay")
+    parser.add_argument("--storage-latency-ms", type=float, default=15.0, help="delay added to every storage call")
+    parser.add_argument(
+        "--shared-uploads", type=float, default=0.5,
+        help="share of uploads repeating content other students uploaded, exercising blob sharing"
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--save-baseline", help="store the JSON report as a baseline")
+    parser.add_argument("--baseline", help="compare against a stored baseline; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative p95/throughput change")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="ignore p95 increases smaller than this")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,167 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import stat
+import tarfile
+import tempfile
+import zipfile
+import zlib
+from typing import BinaryIO, List, Optional
+from fastapi import HTTPException, status
+from dotenv import load_dotenv
+from backend.db.file_store import MAX_BATCH_FILES, PendingFile
+from backend.db.storage import MAX_UPLOAD_BYTES, UPLOAD_CHUNK_SIZE, SpooledUpload
+
+# Load environment variables
+load_dotenv()
+
+# Archive limits. The size of the archive itself is checked while it is
+# spooled; everything else is checked on the decompressed bytes as they come
+# out, so a zip bomb is stopped after at most one chunk past a limit.
+ARCHIVE_MAX_BYTES = int(os.getenv("ARCHIVE_MAX_BYTES", str(100 * 1024 * 1024)))
+ARCHIVE_MAX_EXPANDED_BYTES = int(os.getenv("ARCHIVE_MAX_EXPANDED_BYTES", str(200 * 1024 * 1024)))
+ARCHIVE_MAX_RATIO = float(os.getenv("ARCHIVE_MAX_RATIO", "100"))
+ARCHIVE_MAX_ENTRIES = int(os.getenv("ARCHIVE_MAX_ENTRIES", "1000"))
+ARCHIVE_MAX_FILES = int(os.getenv("ARCHIVE_MAX_FILES", str(MAX_BATCH_FILES)))
+
+# Small archives may compress well without being suspicious
+_RATIO_FLOOR_BYTES = 1024 * 1024
+
+def _too_large(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=detail)
+
+class ExpansionBudget:
+    """Running total of decompressed bytes, checked against the archive limits"""
+
+    def __init__(self, archive_size: int):
+        self.archive_size = archive_size
+        self.expanded = 0
+        self.entries = 0
+        self.files = 0
+
+    def consume(self, count: int) -> None:
+        self.expanded += count
+        if self.expanded > ARCHIVE_MAX_EXPANDED_BYTES:
+            raise _too_large(f"Archive expands past the {ARCHIVE_MAX_EXPANDED_BYTES} byte limit")
+        if self.expanded > _RATIO_FLOOR_BYTES and self.expanded > ARCHIVE_MAX_RATIO * max(self.archive_size, 1):
+            raise _too_large(f"Archive compression ratio exceeds {ARCHIVE_MAX_RATIO:g}:1")
+
+    def entry(self) -> None:
+        self.entries += 1
+        if self.entries > ARCHIVE_MAX_ENTRIES:
+            raise _too_large(f"Archive has more than {ARCHIVE_MAX_ENTRIES} entries")
+
+    def file(self) -> None:
+        self.files += 1
+        if self.files > ARCHIVE_MAX_FILES:
+            raise _too_large(f"Archive has more than {ARCHIVE_MAX_FILES} files")
+
+class _MeteredReader:
+    """Counts every byte read from a decompressing stream against the budget"""
+
+    def __init__(self, raw: BinaryIO, budget: ExpansionBudget):
+        self.raw = raw
+        self.budget = budget
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.raw.read(size)
+        self.budget.consume(len(data))
+        return data
+
+def member_name(path: str) -> Optional[str]:
+    """An archive path as a clean relative name, or None for entries to skip"""
+    parts = [part for part in path.replace("\\", "/").split("/") if part not in ("", ".")]
+    if not parts or ".." in parts:
+        return None
+    # Resource forks and Finder metadata added by macOS zip tools
+    if parts[0] == "__MACOSX" or parts[-1] == ".DS_Store" or parts[-1].startswith("._"):
+        return None
+    return "/".join(parts)
+
+def _spool_member(source: BinaryIO, name: str, budget: Optional[ExpansionBudget] = None) -> PendingFile:
+    """Copy one member to a temp file chunk by chunk, hashing as it goes"""
+    digest = hashlib.sha256()
+    size = 0
+    fd, path = tempfile.mkstemp(prefix="archive-")
+    spooled = SpooledUpload(path=path, size=0, sha256="")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = source.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise _too_large(f"{name} exceeds the {MAX_UPLOAD_BYTES} byte upload limit")
+                if budget is not None:
+                    budget.consume(len(chunk))
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        spooled.close()
+        raise
+    spooled.size = size
+    spooled.sha256 = digest.hexdigest()
+    content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    return PendingFile(name, content_type, spooled)
+
+def _extract_zip(path: str, budget: ExpansionBudget, members: List[PendingFile]) -> None:
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            budget.entry()
+            name = member_name(info.filename)
+            if info.is_dir() or name is None or stat.S_ISLNK(info.external_attr >> 16):
+                continue
+            if info.flag_bits & 0x1:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Encrypted archives are not supported"
+                )
+            budget.file()
+            # Count what actually comes out, not the sizes the headers claim
+            with archive.open(info) as source:
+                members.append(_spool_member(source, name, budget))
+
+def _extract_tar(path: str, budget: ExpansionBudget, members: List[PendingFile]) -> None:
+    with open(path, "rb") as raw:
+        compressed = raw.read(2) == b"\x1f\x8b"
+        raw.seek(0)
+        stream = gzip.GzipFile(fileobj=raw, mode="rb") if compressed else raw
+        # Headers count too, so oversized pax headers can't slip past the budget
+        with tarfile.open(fileobj=_MeteredReader(stream, budget), mode="r|") as archive:
+            for member in archive:
+                budget.entry()
+                name = member_name(member.name)
+                if not member.isfile() or name is None:
+                    continue
+                budget.file()
+                members.append(_spool_member(archive.extractfile(member), name))
+
+def extract_archive(path: str, archive_size: int) -> List[PendingFile]:
+    """
+    Stream the regular files out of the zip or (gzipped) tar at `path` into
+    temp files, one chunk in memory at a time. Directories, links and macOS
+    metadata are skipped. Raises 413 when a limit is crossed and 400 for
+    anything that isn't a readable archive; temp files are cleaned up on
+    failure, otherwise the caller closes them. Blocking: run in a thread.
+    """
+    budget = ExpansionBudget(archive_size)
+    members: List[PendingFile] = []
+    try:
+        if zipfile.is_zipfile(path):
+            _extract_zip(path, budget, members)
+        else:
+            _extract_tar(path, budget, members)
+    except (zipfile.BadZipFile, tarfile.TarError, gzip.BadGzipFile, zlib.error, EOFError, NotImplementedError):
+        for member in members:
+            member.spooled.close()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Not a valid zip or tar.gz archive"
+        )
+    except BaseException:
+        for member in members:
+            member.spooled.close()
+        raise
+    return members
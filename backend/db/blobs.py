@@ -0,0 +1,105 @@
+import asyncio
+import os
+from typing import Iterable, List, Optional, Set
+from dotenv import load_dotenv
+from backend.db.repository import execute, rpc, storage_remove, storage_upload
+from backend.db.storage import SpooledUpload
+
+# Load environment variables
+load_dotenv()
+
+# Bucket holding content-addressed file blobs
+BLOB_BUCKET = "files"
+
+# A release left in "deleting" this long (its worker died mid-release) is taken over by uploads
+BLOB_RELEASE_STALE_SECONDS = int(os.getenv("BLOB_RELEASE_STALE_SECONDS", "60"))
+# First pause before claiming a blob that is being released again; doubles up to a second
+BLOB_CLAIM_RETRY_SECONDS = float(os.getenv("BLOB_CLAIM_RETRY_SECONDS", "0.05"))
+
+# States of a `blobs` row; see "File Storage" in the README
+BLOB_UPLOADING = "uploading"
+BLOB_READY = "ready"
+BLOB_DELETING = "deleting"
+
+def blob_path(sha256: str) -> str:
+    """Storage path of the blob with the given SHA-256 hex digest"""
+    return f"blobs/{sha256[:2]}/{sha256}"
+
+async def claim_blobs(storage_paths: Iterable[str]) -> Set[str]:
+    """
+    Which of `storage_paths` the caller must upload. Only blobs marked ready
+    are known to be in storage; a blob another upload is still sending, or
+    failed to send, is uploaded again (upsert makes the overlap harmless).
+    Call after inserting the referencing rows, so a release that starts
+    later sees them. Waits while a release is removing one of the paths.
+    """
+    pending = sorted(set(storage_paths))
+    needed: Set[str] = set()
+    delay = BLOB_CLAIM_RETRY_SECONDS
+    while pending:
+        result = await execute(rpc("claim_blobs", {
+            "p_paths": pending,
+            "p_stale_seconds": BLOB_RELEASE_STALE_SECONDS
+        }))
+        states = {row["storage_path"]: row["state"] for row in result.data or []}
+        needed.update(path for path in pending if states.get(path) not in (BLOB_READY, BLOB_DELETING))
+        pending = [path for path in pending if states.get(path) == BLOB_DELETING]
+        if pending:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 1.0)
+    return needed
+
+async def mark_blobs_ready(storage_paths: Iterable[str]) -> None:
+    """Record that the blobs at `storage_paths` were written to storage"""
+    paths = sorted(set(storage_paths))
+    if paths:
+        await execute(rpc("mark_blobs_ready", {"p_paths": paths}))
+
+async def ensure_blob(spooled: SpooledUpload, content_type: Optional[str]) -> bool:
+    """
+    Make sure the blob for `spooled` is in storage, uploading it unless an
+    earlier upload of the same content has finished. Call after inserting
+    the referencing row. Returns whether bytes were sent to storage.
+    """
+    path = blob_path(spooled.sha256)
+    if not await claim_blobs([path]):
+        return False
+    await upload_blob(spooled, content_type)
+    return True
+
+async def upload_blob(spooled: SpooledUpload, content_type: Optional[str]) -> None:
+    """Send `spooled` to storage at its content address and mark the blob ready"""
+    path = blob_path(spooled.sha256)
+    await storage_upload(
+        BLOB_BUCKET,
+        path,
+        spooled.path,
+        {
+            "content-type": content_type or "application/octet-stream",
+            # Identical bytes, so a concurrent first upload of the same blob is harmless
+            "upsert": "true",
+        }
+    )
+    await mark_blobs_ready([path])
+
+async def release_blobs(storage_paths: Iterable[str]) -> List[str]:
+    """
+    Remove blobs whose last referencing row has been deleted.
+    Call after deleting the rows; returns the paths removed from storage.
+    The check for references and the switch to "deleting" are one
+    transaction, and uploads wait for "deleting" blobs, so an upload can't
+    land between the check and the removal and lose its bytes.
+    """
+    paths = sorted(set(storage_paths))
+    if not paths:
+        return []
+    result = await execute(rpc("begin_blob_release", {"p_paths": paths}))
+    orphaned = sorted(row["storage_path"] for row in result.data or [])
+    if not orphaned:
+        return []
+    try:
+        await storage_remove(BLOB_BUCKET, orphaned)
+    finally:
+        # Even after a failed remove: without a row, the next upload sends the blob again
+        await execute(rpc("finish_blob_release", {"p_paths": orphaned}))
+    return orphaned
@@ -0,0 +1,118 @@
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+from backend.db.repository import execute, table
+from backend.db.pagination import DEFAULT_PAGE_SIZE, paginate, trim_page
+from backend.utils.cache import TTLCache
+from backend.utils.http import weak_etag
+
+# Load environment variables
+load_dotenv()
+
+# Resource catalog cache configuration
+RESOURCE_CACHE_SIZE = int(os.getenv("RESOURCE_CACHE_SIZE", "1024"))
+RESOURCE_CACHE_TTL_SECONDS = float(os.getenv("RESOURCE_CACHE_TTL_SECONDS", "60"))
+RESOURCE_PREWARM_COUNT = int(os.getenv("RESOURCE_PREWARM_COUNT", str(DEFAULT_PAGE_SIZE)))
+
+@dataclass
+class CatalogPage:
+    """One cached page of the resources listing"""
+    rows: List[Dict[str, Any]]
+    next_cursor: Optional[str]
+    etag: str
+    last_modified: Optional[str]
+
+def resource_etag(row: Dict[str, Any]) -> str:
+    """Validator for a single resource, from its id and updated_at"""
+    return weak_etag([row["id"], str(row["updated_at"])])
+
+class ResourceCatalog:
+    """
+    Read-through cache of resource pages and individual resources.
+    Admin writes call `invalidate`, which bumps `version`; a fill that
+    started before a write is discarded instead of caching stale rows.
+    The TTL bounds staleness in workers that did not handle the write.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = RESOURCE_CACHE_SIZE,
+        ttl: float = RESOURCE_CACHE_TTL_SECONDS,
+        columns: str = "*"
+    ):
+        self.columns = columns
+        self.version = 0
+        self._pages: TTLCache[CatalogPage] = TTLCache(maxsize, ttl)
+        self._items: TTLCache[Dict[str, Any]] = TTLCache(maxsize, ttl)
+        self._lock = threading.Lock()
+
+    async def get_page(self, cursor: Optional[str], limit: int) -> CatalogPage:
+        """A page of the catalog, newest first"""
+        key = (cursor, limit)
+        page = self._pages.get(key)
+        if page is not None:
+            return page
+        version = self.version
+        result = await execute(paginate(table("resources").select(self.columns), cursor, limit))
+        rows, next_cursor = trim_page(result.data, limit)
+        page = CatalogPage(
+            rows=rows,
+            next_cursor=next_cursor,
+            etag=weak_etag([cursor or "", str(limit)] + [resource_etag(r) for r in rows]),
+            last_modified=max((r["updated_at"] for r in rows), default=None)
+        )
+        with self._lock:
+            if version == self.version:
+                self._pages.set(key, page)
+                for row in rows:
+                    self._items.set(row["id"], row)
+        return page
+
+    async def get_item(self, resource_id: str) -> Optional[Dict[str, Any]]:
+        """A single resource, or None if it doesn't exist"""
+        row = self._items.get(resource_id)
+        if row is not None:
+            return row
+        version = self.version
+        result = await execute(table("resources").select(self.columns).eq("id", resource_id))
+        if not result.data:
+            return None
+        row = result.data[0]
+        with self._lock:
+            if version == self.version:
+                self._items.set(resource_id, row)
+        return row
+
+    def invalidate(self, resource_id: Optional[str] = None, row: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Record a write: drop every cached page and the affected resource.
+        Pass the written `row` to cache it straight away.
+        """
+        with self._lock:
+            self.version += 1
+            self._pages.clear()
+            if resource_id is not None:
+                self._items.invalidate(resource_id)
+            if row is not None:
+                self._items.set(row["id"], row)
+
+    def clear(self) -> None:
+        """Drop everything"""
+        self.invalidate()
+        self._items.clear()
+
+    async def prewarm(self, count: int = RESOURCE_PREWARM_COUNT) -> int:
+        """Load the first page of the catalog and its resources; returns how many"""
+        if count <= 0:
+            return 0
+        page = await self.get_page(None, count)
+        return len(page.rows)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "pages": self._pages.stats(),
+            "items": self._items.stats(),
+        }
@@ -0,0 +1,141 @@
+import os
+from dataclasses import dataclass
+from datetime import datetime, UTC
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from dotenv import load_dotenv
+from backend.db.repository import execute, gather_limited, table
+from backend.db.blobs import blob_path, claim_blobs, release_blobs, upload_blob
+from backend.db.storage import SpooledUpload
+from backend.ai.context import forget_file, index_uploaded_file
+
+# Load environment variables
+load_dotenv()
+
+# Storage calls a single batch request may have in flight
+FILE_BATCH_CONCURRENCY = int(os.getenv("FILE_BATCH_CONCURRENCY", "4"))
+# Most files accepted by one batch upload or delete
+MAX_BATCH_FILES = int(os.getenv("MAX_BATCH_FILES", "100"))
+
+@dataclass
+class PendingFile:
+    """A spooled file waiting to be stored"""
+    name: str
+    content_type: Optional[str]
+    spooled: SpooledUpload
+
+@dataclass
+class StoredFile:
+    """Outcome for one file of a batch: its `files` row, or why it failed"""
+    name: str
+    row: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+async def store_files(student_id: str, pending: Sequence[PendingFile]) -> List[StoredFile]:
+    """
+    Store a batch of spooled files for `student_id`.
+    All metadata rows go in with one bulk insert, one claim finds the blobs
+    already in storage, and each missing distinct blob is uploaded once,
+    at most FILE_BATCH_CONCURRENCY at a time. Rows whose upload failed are
+    removed with one delete. The caller still owns (and closes) the spools.
+    """
+    if not pending:
+        return []
+    now = datetime.now(UTC).isoformat()
+    result = await execute(
+        table("files").insert([
+            {
+                "name": item.name,
+                "content_type": item.content_type,
+                "size": item.spooled.size,
+                "student_id": student_id,
+                "storage_path": blob_path(item.spooled.sha256),
+                "content_hash": item.spooled.sha256,
+                "created_at": now
+            }
+            for item in pending
+        ])
+    )
+    rows = result.data or []
+    if len(rows) != len(pending):
+        if rows:
+            await execute(table("files").delete().in_("id", [row["id"] for row in rows]))
+        return [StoredFile(item.name, error="Failed to store file metadata") for item in pending]
+
+    # As with single uploads, the rows exist before we claim the blobs,
+    # so a release that starts now keeps them
+    try:
+        needed = await claim_blobs(row["storage_path"] for row in rows)
+    except Exception:
+        await execute(table("files").delete().in_("id", [row["id"] for row in rows]))
+        raise
+    missing: Dict[str, PendingFile] = {}
+    for item, row in zip(pending, rows):
+        if row["storage_path"] in needed:
+            missing.setdefault(row["storage_path"], item)
+
+    outcomes = await gather_limited(
+        (upload_blob(item.spooled, item.content_type) for item in missing.values()),
+        FILE_BATCH_CONCURRENCY
+    )
+    failed = {
+        path: outcome for path, outcome in zip(missing, outcomes)
+        if isinstance(outcome, Exception)
+    }
+    if failed:
+        await execute(
+            table("files")
+            .delete()
+            .in_("id", [row["id"] for row in rows if row["storage_path"] in failed])
+        )
+
+    stored = []
+    for item, row in zip(pending, rows):
+        error = failed.get(row["storage_path"])
+        if error is not None:
+            stored.append(StoredFile(item.name, error=f"Failed to upload file: {str(error)}"))
+            continue
+        # Make the file available as context for the student's questions
+        try:
+            await index_uploaded_file(student_id, row, item.spooled.path)
+        except Exception as e:
+            print(f"Failed to index file {row['id']}: {e}")
+        stored.append(StoredFile(item.name, row=row))
+    return stored
+
+async def delete_files(student_id: str, file_ids: Sequence[str]) -> Tuple[List[str], List[str]]:
+    """
+    Delete the student's files among `file_ids` with one bulk delete, then
+    release the blobs no longer referenced. Returns (deleted, not found) ids.
+    """
+    ids = list(dict.fromkeys(file_ids))
+    if not ids:
+        return [], []
+    result = await execute(
+        table("files")
+        .select("id, storage_path")
+        .eq("student_id", student_id)
+        .in_("id", ids)
+    )
+    paths = {row["id"]: row["storage_path"] for row in result.data or []}
+    deleted: List[str] = []
+    if paths:
+        result = await execute(
+            table("files")
+            .delete()
+            .eq("student_id", student_id)
+            .in_("id", list(paths))
+        )
+        deleted = [row["id"] for row in result.data or []]
+
+    for file_id in deleted:
+        forget_file(student_id, file_id)
+
+    # Storage removes many paths per call, so the blobs go in one request
+    try:
+        await release_blobs(paths[file_id] for file_id in deleted)
+    except Exception as e:
+        # The files are already gone for the student; orphaned blobs are only wasted space
+        print(f"Failed to release blobs for {len(deleted)} deleted files: {e}")
+
+    gone = set(deleted)
+    return [i for i in ids if i in gone], [i for i in ids if i not in gone]
@@ -0,0 +1,74 @@
+import base64
+import binascii
+import json
+import os
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import HTTPException, status
+
+# Page size limits for list endpoints
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "200"))
+
+# Response header carrying the cursor for the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    """Build an opaque cursor pointing just past `row`"""
+    raw = json.dumps([row["created_at"], row["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    Decode a cursor produced by `encode_cursor`.
+    Both values end up inside a PostgREST filter, so anything that isn't a
+    timestamp and a UUID is rejected rather than passed through.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(created_at, str) or not isinstance(row_id, str):
+            raise TypeError("cursor values must be strings")
+        datetime.fromisoformat(created_at)
+        return created_at, str(uuid.UUID(row_id))
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+def after_cursor(query, cursor: str, desc: bool = True):
+    """Restrict a select query to rows ordered after `cursor` on (created_at, id)"""
+    created_at, row_id = decode_cursor(cursor)
+    op = "lt" if desc else "gt"
+    return query.or_(
+        f'created_at.{op}."{created_at}",'
+        f'and(created_at.eq."{created_at}",id.{op}."{row_id}")'
+    )
+
+def paginate(query, cursor: Optional[str], limit: int, desc: bool = True):
+    """
+    Apply keyset pagination on (created_at, id) to a select query.
+    Fetches one extra row so callers can tell whether another page exists.
+    """
+    if cursor:
+        query = after_cursor(query, cursor, desc)
+    return (
+        query
+        .order("created_at", desc=desc)
+        .order("id", desc=desc)
+        .limit(limit + 1)
+    )
+
+def trim_page(rows: Optional[List[Dict[str, Any]]], limit: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Drop the look-ahead row; returns the page and the next cursor, if any"""
+    rows = rows or []
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
+
+def cursor_headers(next_cursor: Optional[str]) -> Dict[str, str]:
+    """Response headers advertising the next page, if there is one"""
+    return {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
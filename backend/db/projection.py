@@ -0,0 +1,59 @@
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type
+from fastapi import HTTPException, Response, status
+from pydantic import BaseModel, create_model
+from backend.utils.serialization import json_response
+
+def columns(model: Type[BaseModel], fields: Optional[Iterable[str]] = None) -> str:
+    """PostgREST select list for `model`'s fields (or just `fields`, in model order)"""
+    wanted = set(model.model_fields if fields is None else fields)
+    return ", ".join(name for name in model.model_fields if name in wanted)
+
+def parse_fields(fields: Optional[str], model: Type[BaseModel]) -> Optional[Tuple[str, ...]]:
+    """
+    Parse a `fields=a,b` query parameter into model field names, in model
+    order and always including `id`. Returns None when no subset was asked
+    for; unknown names are a 400.
+    """
+    if fields is None:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(model.model_fields)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+        )
+    requested.add("id")
+    return tuple(name for name in model.model_fields if name in requested)
+
+def select_columns(model: Type[BaseModel], fields: Optional[Tuple[str, ...]], required: Iterable[str] = ()) -> str:
+    """Select list for a sparse fieldset plus the columns the route itself needs"""
+    if fields is None:
+        return columns(model)
+    return columns(model, set(fields) | set(required))
+
+@lru_cache(maxsize=256)
+def partial_model(model: Type[BaseModel], fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """`model` restricted to `fields`, for validating sparse responses"""
+    return create_model(
+        f"{model.__name__}Fields",
+        **{name: (model.model_fields[name].annotation, model.model_fields[name]) for name in fields}
+    )
+
+def sparse_response(
+    rows: Iterable[Dict[str, Any]],
+    model: Type[BaseModel],
+    fields: Tuple[str, ...],
+    headers: Optional[Dict[str, str]] = None,
+    many: bool = True
+) -> Response:
+    """
+    JSON response carrying only `fields` of each row.
+    Set `many=False` to return a single object.
+    """
+    items = [{name: row.get(name) for name in fields} for row in rows]
+    partial = partial_model(model, fields)
+    if many:
+        return json_response(items, List[partial], headers)
+    return json_response(items[0], partial, headers)
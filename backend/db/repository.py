@@ -0,0 +1,165 @@
+import asyncio
+import contextvars
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Iterable, List, Optional, Tuple, TypeVar
+from dotenv import load_dotenv
+from backend.db import supabase_client
+from backend.db.tracing import QUERY_TRACING, describe_params, record_call
+from backend.utils.metrics import registry
+
+# Load environment variables
+load_dotenv()
+
+# Upper bound on Supabase calls running at the same time in one worker.
+# Requests beyond this wait for a free slot instead of spawning more threads.
+DB_MAX_CONCURRENCY = int(os.getenv("DB_MAX_CONCURRENCY", "16"))
+
+T = TypeVar("T")
+
+# Supabase calls are milliseconds, so the buckets start finer than HTTP's
+DB_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+db_queries = registry.counter(
+    "db_queries_total", "Supabase queries by table, operation and outcome", ("table", "operation", "outcome")
+)
+db_query_duration = registry.histogram(
+    "db_query_duration_seconds",
+    "Supabase query latency, including the wait for a free thread",
+    ("table", "operation"),
+    DB_BUCKETS
+)
+storage_operations = registry.counter(
+    "storage_operations_total", "Storage calls by bucket, operation and outcome", ("bucket", "operation", "outcome")
+)
+storage_operation_duration = registry.histogram(
+    "storage_operation_duration_seconds", "Storage call latency", ("bucket", "operation"), DB_BUCKETS
+)
+storage_bytes = registry.counter(
+    "storage_bytes_total", "Bytes sent to or read from storage through the SDK", ("bucket", "direction")
+)
+
+_INSTRUMENTS = {
+    "db": (db_queries, db_query_duration),
+    "storage": (storage_operations, storage_operation_duration),
+}
+
+_OPERATIONS = {"GET": "select", "HEAD": "select", "POST": "insert", "PATCH": "update", "DELETE": "delete"}
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+def get_executor() -> ThreadPoolExecutor:
+    """Returns the bounded thread pool used for blocking Supabase calls"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=DB_MAX_CONCURRENCY,
+            thread_name_prefix="supabase",
+        )
+    return _executor
+
+def shutdown_executor() -> None:
+    """Stop the Supabase thread pool, waiting for in-flight calls"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+async def run_sync(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a blocking callable on the Supabase thread pool.
+    The caller's context variables are carried over to the worker thread.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, func, *args, **kwargs)
+    return await loop.run_in_executor(get_executor(), call)
+
+async def gather_limited(awaitables: Iterable[Awaitable[T]], limit: int) -> List[Any]:
+    """
+    Await `awaitables` with at most `limit` running at once, so one batch
+    request can't take every slot of the shared pool. Results come back in
+    order; a failure is returned in place of its result instead of raised.
+    """
+    slots = asyncio.Semaphore(max(1, limit))
+
+    async def run(awaitable: Awaitable[T]):
+        async with slots:
+            return await awaitable
+
+    return await asyncio.gather(*(run(a) for a in awaitables), return_exceptions=True)
+
+def get_client():
+    """Returns the Supabase client, initializing it on first use"""
+    return supabase_client.get_supabase()
+
+def table(name: str):
+    """Start a query builder for a table; nothing is sent until `execute`"""
+    return get_client().table(name)
+
+def rpc(function: str, params: Optional[dict] = None):
+    """Start a stored procedure call; nothing is sent until `execute`"""
+    return get_client().rpc(function, params or {})
+
+def query_target(query) -> Tuple[str, str]:
+    """(table, operation) of a query builder, e.g. ("files", "select"); RPCs are (function, "rpc")"""
+    request = getattr(query, "request", None)
+    if request is None:
+        return "unknown", "unknown"
+    path = str(request.path).rsplit("/rest/v1/", 1)[-1]
+    if path.startswith("rpc/"):
+        return path[len("rpc/"):], "rpc"
+    method = str(getattr(request.http_method, "value", request.http_method))
+    return path, _OPERATIONS.get(method, method.lower())
+
+async def _observed(call, kind: str, target: str, operation: str, query=None):
+    """Await `call`, recording its metrics and adding it to the request trace"""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        result = await call
+        outcome = "ok"
+        return result
+    finally:
+        duration = time.perf_counter() - start
+        counter, histogram = _INSTRUMENTS[kind]
+        histogram.labels(target, operation).observe(duration)
+        counter.labels(target, operation, outcome).inc()
+        if QUERY_TRACING:
+            params = getattr(getattr(query, "request", None), "params", None)
+            shape, filters = describe_params(operation, target, params)
+            record_call(kind, target, operation, shape, filters, duration)
+
+async def execute(query):
+    """Execute a query builder off the event loop"""
+    target, operation = query_target(query)
+    return await _observed(run_sync(query.execute), "db", target, operation, query)
+
+def bucket(name: str):
+    """Returns the storage bucket proxy for `name`"""
+    return get_client().storage.from_(name)
+
+async def storage_upload(bucket_name: str, path: str, data: Any, file_options: Optional[dict] = None):
+    """Upload an object to storage off the event loop"""
+    storage = bucket(bucket_name)
+    if file_options:
+        call = run_sync(storage.upload, path, data, file_options)
+    else:
+        call = run_sync(storage.upload, path, data)
+    result = await _observed(call, "storage", bucket_name, "upload")
+    # `data` is either the bytes or the path of a spooled file
+    size = os.path.getsize(data) if isinstance(data, str) else len(data)
+    storage_bytes.labels(bucket_name, "upload").inc(size)
+    return result
+
+async def storage_download(bucket_name: str, path: str) -> bytes:
+    """Download an object from storage off the event loop"""
+    data = await _observed(run_sync(bucket(bucket_name).download, path), "storage", bucket_name, "download")
+    storage_bytes.labels(bucket_name, "download").inc(len(data or b""))
+    return data
+
+async def storage_remove(bucket_name: str, paths: List[str]):
+    """Remove objects from storage off the event loop"""
+    return await _observed(run_sync(bucket(bucket_name).remove, paths), "storage", bucket_name, "remove")
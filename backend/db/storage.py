@@ -0,0 +1,170 @@
+import asyncio
+import hashlib
+import os
+import re
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Optional, Tuple
+from urllib.parse import quote
+import httpx
+from fastapi import HTTPException, UploadFile, status
+from starlette.concurrency import run_in_threadpool
+from dotenv import load_dotenv
+from backend.db.tracing import QUERY_TRACING, record_call
+
+# Load environment variables
+load_dotenv()
+
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+
+# Upload limits
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+UPLOAD_MEMORY_LIMIT_BYTES = int(os.getenv("UPLOAD_MEMORY_LIMIT_BYTES", str(16 * 1024 * 1024)))
+
+# Each chunk held in memory takes a slot, capping upload buffers per worker
+_upload_slots = asyncio.Semaphore(max(1, UPLOAD_MEMORY_LIMIT_BYTES // UPLOAD_CHUNK_SIZE))
+
+@dataclass
+class SpooledUpload:
+    """An upload copied to a local temp file, with its size and SHA-256"""
+    path: str
+    size: int
+    sha256: str
+
+    def close(self) -> None:
+        """Delete the temp file"""
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+def _write_chunk(out, digest, chunk: bytes) -> None:
+    digest.update(chunk)
+    out.write(chunk)
+
+async def spool_upload(upload: UploadFile, max_bytes: Optional[int] = None) -> SpooledUpload:
+    """
+    Copy an upload to a temp file chunk by chunk, hashing as it goes.
+    At most one chunk per upload is held in memory; uploads larger than
+    `max_bytes` are rejected with 413 as soon as the limit is crossed.
+    The returned file path is handed to storage, which streams it from disk.
+    """
+    if max_bytes is None:
+        max_bytes = MAX_UPLOAD_BYTES
+    digest = hashlib.sha256()
+    size = 0
+    fd, path = tempfile.mkstemp(prefix="upload-")
+    spooled = SpooledUpload(path=path, size=0, sha256="")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                async with _upload_slots:
+                    chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise HTTPException(
+                            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"File exceeds the {max_bytes} byte upload limit"
+                        )
+                    await run_in_threadpool(_write_chunk, out, digest, chunk)
+    except BaseException:
+        spooled.close()
+        raise
+    spooled.size = size
+    spooled.sha256 = digest.hexdigest()
+    return spooled
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+_storage_http: Optional[httpx.AsyncClient] = None
+
+def get_storage_http() -> httpx.AsyncClient:
+    """
+    Returns an async HTTP client for the Supabase Storage REST API.
+    Used where the storage SDK would buffer whole objects, e.g. streaming downloads.
+    """
+    global _storage_http
+    if _storage_http is None:
+        _storage_http = httpx.AsyncClient(
+            base_url=f"{SUPABASE_URL}/storage/v1",
+            headers={
+                "apikey": SUPABASE_KEY,
+                "Authorization": f"Bearer {SUPABASE_KEY}",
+            },
+            timeout=httpx.Timeout(30.0, read=None),
+        )
+    return _storage_http
+
+async def close_storage_http() -> None:
+    """Close the storage HTTP client"""
+    global _storage_http
+    if _storage_http is not None:
+        await _storage_http.aclose()
+        _storage_http = None
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range `Range` header into an inclusive (start, end) pair.
+    Returns None when the whole object should be sent (no header, or a
+    multi-range/unknown-unit request, which servers may ignore).
+    Raises 416 when the range cannot be satisfied.
+    """
+    if not header:
+        return None
+    match = _RANGE_PATTERN.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the final N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise _range_not_satisfiable(size)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise _range_not_satisfiable(size)
+    return start, end
+
+def _range_not_satisfiable(size: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+        detail="Requested range not satisfiable",
+        headers={"Content-Range": f"bytes */{size}"}
+    )
+
+async def open_object_stream(bucket_name: str, path: str, byte_range: Optional[Tuple[int, int]] = None) -> httpx.Response:
+    """
+    Start streaming an object from storage without buffering it.
+    The caller must iterate and then `aclose()` the returned response.
+    """
+    client = get_storage_http()
+    # Ask for identity encoding so byte offsets match the stored object
+    headers = {"Accept-Encoding": "identity"}
+    if byte_range is not None:
+        headers["Range"] = f"bytes={byte_range[0]}-{byte_range[1]}"
+    request = client.build_request(
+        "GET",
+        f"/object/{quote(bucket_name)}/{quote(path)}",
+        headers=headers
+    )
+    start = time.perf_counter()
+    response = await client.send(request, stream=True)
+    if QUERY_TRACING:
+        # Time to the response headers; the body streams after the handler returns
+        record_call("storage", bucket_name, "stream", f"stream {bucket_name}", "", time.perf_counter() - start)
+    if response.status_code >= 400:
+        await response.aclose()
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="Failed to retrieve file content"
+        )
+    return response
@@ -0,0 +1,158 @@
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Record every Supabase and storage call made while handling a request
+QUERY_TRACING = os.getenv("QUERY_TRACING", "1") == "1"
+# Warn when one request makes more calls than this...
+QUERY_WARN_COUNT = int(os.getenv("QUERY_WARN_COUNT", "10"))
+# ...or runs the same query shape this many times (a likely N+1)
+QUERY_REPEAT_WARN = int(os.getenv("QUERY_REPEAT_WARN", "3"))
+# Distinct shapes kept for /debug/queries, least recently seen dropped first
+QUERY_STATS_MAX_SHAPES = int(os.getenv("QUERY_STATS_MAX_SHAPES", "500"))
+
+# Filter values inside or=/and= groups, e.g. `created_at.lt.2024-05-01T...`
+_GROUP_VALUE = re.compile(r'\.(eq|neq|gt|gte|lt|lte|like|ilike|is|in|cs|cd|fts)\.(?:"[^"]*"|\([^)]*\)|[^,()]*)')
+# Parameters that shape the query without filtering it
+_MODIFIERS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+_MAX_FILTERS_LENGTH = 200
+
+@dataclass
+class QueryRecord:
+    """One DB or storage call made while handling a request"""
+    kind: str
+    target: str
+    operation: str
+    shape: str
+    filters: str
+    duration: float
+
+@dataclass
+class RequestTrace:
+    """Calls made while handling one request"""
+    records: List[QueryRecord] = field(default_factory=list)
+
+    def totals(self) -> Dict[str, Tuple[int, float]]:
+        """Call count and seconds spent per kind ("db", "storage")"""
+        totals: Dict[str, Tuple[int, float]] = {}
+        for record in self.records:
+            count, seconds = totals.get(record.kind, (0, 0.0))
+            totals[record.kind] = (count + 1, seconds + record.duration)
+        return totals
+
+    def repeated(self, threshold: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Shapes run at least `threshold` (default QUERY_REPEAT_WARN) times, most repeated first"""
+        if threshold is None:
+            threshold = QUERY_REPEAT_WARN
+        shapes = Counter(record.shape for record in self.records if record.kind == "db")
+        return [(shape, count) for shape, count in shapes.most_common() if count >= threshold]
+
+    def server_timing(self, total: Optional[float] = None) -> str:
+        """`Server-Timing` header value; durations are summed, so concurrent calls can exceed `total`"""
+        metrics = []
+        for kind, (count, seconds) in sorted(self.totals().items()):
+            noun = "call" if count == 1 else "calls"
+            metrics.append(f'{kind};dur={seconds * 1000:.1f};desc="{count} {noun}"')
+        if total is not None:
+            metrics.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(metrics)
+
+    def warnings(self) -> List[str]:
+        """Problems worth logging: too many calls, or one shape repeated"""
+        found = []
+        calls = sum(1 for record in self.records if record.kind == "db")
+        if calls > QUERY_WARN_COUNT:
+            found.append(f"{calls} queries (limit {QUERY_WARN_COUNT})")
+        for shape, count in self.repeated():
+            found.append(f"possible N+1: {count}x {shape}")
+        return found
+
+current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("current_trace", default=None)
+
+@dataclass
+class ShapeStats:
+    """Aggregate timings of one query shape"""
+    kind: str
+    shape: str
+    calls: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+class QueryStats:
+    """Timings per query shape across all requests, for finding slow queries in development"""
+
+    def __init__(self, max_shapes: int = QUERY_STATS_MAX_SHAPES):
+        self.max_shapes = max_shapes
+        self._shapes: "OrderedDict[str, ShapeStats]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, shape: str, duration: float) -> None:
+        with self._lock:
+            stats = self._shapes.get(shape)
+            if stats is None:
+                stats = self._shapes[shape] = ShapeStats(kind, shape)
+                if len(self._shapes) > self.max_shapes:
+                    self._shapes.popitem(last=False)
+            else:
+                self._shapes.move_to_end(shape)
+            stats.calls += 1
+            stats.total += duration
+            stats.max = max(stats.max, duration)
+
+    def slowest(self, limit: int = 20, by: str = "total") -> List[ShapeStats]:
+        """Shapes ordered by total, mean or max duration"""
+        keys = {
+            "total": lambda s: s.total,
+            "mean": lambda s: s.total / s.calls,
+            "max": lambda s: s.max,
+        }
+        with self._lock:
+            shapes = list(self._shapes.values())
+        return sorted(shapes, key=keys[by], reverse=True)[:limit]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._shapes.clear()
+
+query_stats = QueryStats()
+
+def describe_params(operation: str, target: str, params: Any) -> Tuple[str, str]:
+    """
+    (shape, filters) for a PostgREST request. The shape keeps the columns
+    and operators but drops the values, so `eq.id` for any id is one shape;
+    the filters keep the values for the per-request trace.
+    """
+    parts, filters = [], []
+    for key, value in params.multi_items() if params is not None else ():
+        if key in ("select", "order"):
+            parts.append(f"{key}={value}")
+        elif key in ("limit", "offset"):
+            parts.append(key)
+        elif key in _MODIFIERS:
+            continue
+        elif key in ("or", "and"):
+            parts.append(key + _GROUP_VALUE.sub(r".\1", value))
+            filters.append(f"{key}={value}")
+        else:
+            operator, _, rest = value.partition(".")
+            if operator == "not":
+                operator = "not." + rest.partition(".")[0]
+            parts.append(f"{key}.{operator}")
+            filters.append(f"{key}={value}")
+    shape = " ".join([operation, target] + parts)
+    return shape, "&".join(filters)[:_MAX_FILTERS_LENGTH]
+
+def record_call(kind: str, target: str, operation: str, shape: str, filters: str, duration: float) -> None:
+    """Add a finished call to the shape stats and the current request's trace"""
+    query_stats.record(kind, shape, duration)
+    trace = current_trace.get()
+    if trace is not None:
+        trace.records.append(QueryRecord(kind, target, operation, shape, filters, duration))
@@ -1,9 +1,23 @@
-from fastapi import FastAPI, Depends, HTTPException
+import hmac
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI, Depends, HTTPException, Header, status
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 import sentry_sdk
 from dotenv import load_dotenv
 import os
-from backend.routes import auth, chat, files, resources
+from backend.db.pagination import NEXT_CURSOR_HEADER
+from backend.ai.answers import answer_jobs
+from backend.db.repository import shutdown_executor
+from backend.db.storage import close_storage_http
+from backend.routes import auth, chat, debug, files, profiler, resources
+from backend.routes.resources import resource_catalog
+from backend.middleware.compression import CompressionMiddleware
+from backend.middleware.tracing import QueryTracingMiddleware
+from backend.middleware.metrics import METRICS_ENABLED, METRICS_TOKEN, MetricsMiddleware
+from backend.utils.metrics import registry
+from backend.utils.sampling import trace_sampler
 
 # Load environment variables
 load_dotenv()
@@ -14,15 +28,32 @@ if sentry_dsn and sentry_dsn.startswith(("http://", "https://")):
     try:
         sentry_sdk.init(
             dsn=sentry_dsn,
-            traces_sample_rate=1.0,
+            # Per-route rates, boosted after errors and capped per second
+            traces_sampler=trace_sampler,
+            before_send=trace_sampler.before_send,
         )
     except Exception as e:
         print(f"Failed to initialize Sentry: {e}")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup and shutdown hooks"""
+    # Prewarm the newest resources so the first students don't pay for the fill
+    try:
+        await resource_catalog.prewarm()
+    except Exception as e:
+        print(f"Failed to prewarm resource catalog: {e}")
+    yield
+    # Finish queued answers, then let in-flight database calls complete
+    answer_jobs.shutdown()
+    shutdown_executor()
+    await close_storage_http()
+
 app = FastAPI(
     title="AI Tutor API",
     description="Backend API for AI Tutor application",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -32,15 +63,40 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
+# Compress responses for clients that accept it. Starlette runs the last-added
+# middleware outermost, so requests pass Metrics -> Tracing -> Compression -> CORS
+# -> routes: compression wraps CORS and sees its final headers and bodies
+app.add_middleware(CompressionMiddleware)
+
+# Per-request DB/storage call totals as Server-Timing, with N+1 warnings
+app.add_middleware(QueryTracingMiddleware)
+
+# Per-route latency, status and byte metrics (added last, so outermost: it wraps
+# compression and counts wire bytes)
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(chat.router)
 app.include_router(files.router)
 app.include_router(resources.router)
+app.include_router(debug.router)
+app.include_router(profiler.router)
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint to verify API status"""
-    return {"status": "healthy", "message": "API is running"} 
\ No newline at end of file
+    return {"status": "healthy", "message": "API is running"} 
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics(authorization: Optional[str] = Header(None)):
+    """Prometheus metrics for this worker process"""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if METRICS_TOKEN and not hmac.compare_digest(authorization or "", f"Bearer {METRICS_TOKEN}"):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
\ No newline at end of file
@@ -0,0 +1,3 @@
+"""
+Middleware package for AI Tutor Backend
+"""
\ No newline at end of file
@@ -0,0 +1,348 @@
+import os
+import threading
+import time
+import zlib
+from typing import Callable, Dict, List, Optional, Tuple
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from dotenv import load_dotenv
+from backend.utils.cache import TTLCache
+from backend.utils.metrics import cache_stats, registry, render_family
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional: pip install zstandard
+    zstandard = None
+
+# Load environment variables
+load_dotenv()
+
+# Bodies smaller than this are sent as-is; compressing them saves nothing
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "500"))
+GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+# Bodies at least this large are compressed on a worker thread
+COMPRESSION_OFFLOAD_BYTES = int(os.getenv("COMPRESSION_OFFLOAD_BYTES", str(256 * 1024)))
+# Compressed bodies of responses with an ETag, keyed by path, ETag and encoding
+COMPRESSION_CACHE_SIZE = int(os.getenv("COMPRESSION_CACHE_SIZE", "256"))
+COMPRESSION_CACHE_MAX_BODY = int(os.getenv("COMPRESSION_CACHE_MAX_BODY", str(1024 * 1024)))
+COMPRESSION_CACHE_TTL_SECONDS = float(os.getenv("COMPRESSION_CACHE_TTL_SECONDS", "600"))
+
+# Media types worth compressing
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+
+class _Gzip:
+    def __init__(self):
+        # wbits 31 selects the gzip container
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+class _Brotli:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+class _Zstd:
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+# Content-coding -> streaming compressor, in server preference order
+ENCODERS: Dict[str, Callable[[], object]] = {}
+if zstandard is not None:
+    ENCODERS["zstd"] = _Zstd
+if brotli is not None:
+    ENCODERS["br"] = _Brotli
+ENCODERS["gzip"] = _Gzip
+
+def compress_body(encoding: str, body: bytes) -> bytes:
+    """Compress a complete body with `encoding`"""
+    if encoding == "gzip":
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        return compressor.compress(body) + compressor.flush()
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+def negotiate(accept_encoding: Optional[str], available=None) -> Optional[str]:
+    """
+    Pick a content-coding from an Accept-Encoding header using its
+    q-values; ties go to the server's preference order. Returns None
+    when the response should not be compressed.
+    """
+    available = list(ENCODERS) if available is None else list(available)
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+    wildcard = weights.get("*")
+    identity = weights.get("identity", wildcard if wildcard is not None else 1.0)
+    best, best_q = None, 0.0
+    for encoding in available:
+        q = weights.get(encoding, wildcard if wildcard is not None else 0.0)
+        if q > best_q:
+            best, best_q = encoding, q
+    # Compression wins ties with identity but not an explicit preference for it
+    if best is None or best_q < identity:
+        return None
+    return best
+
+class CompressionStats:
+    """Counters for bytes saved versus CPU spent compressing"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.responses = 0
+            self.skipped = 0
+            self.cache_hits = 0
+            self.bytes_in: Dict[str, int] = {}
+            self.bytes_out: Dict[str, int] = {}
+            self.cpu_seconds: Dict[str, float] = {}
+
+    def record(self, encoding: str, bytes_in: int, bytes_out: int, cpu_seconds: float, cache_hit: bool = False) -> None:
+        with self._lock:
+            self.responses += 1
+            self.cache_hits += cache_hit
+            self.bytes_in[encoding] = self.bytes_in.get(encoding, 0) + bytes_in
+            self.bytes_out[encoding] = self.bytes_out.get(encoding, 0) + bytes_out
+            self.cpu_seconds[encoding] = self.cpu_seconds.get(encoding, 0.0) + cpu_seconds
+
+    def record_skip(self) -> None:
+        with self._lock:
+            self.skipped += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            bytes_in = sum(self.bytes_in.values())
+            bytes_out = sum(self.bytes_out.values())
+            return {
+                "responses": self.responses,
+                "skipped": self.skipped,
+                "cache_hits": self.cache_hits,
+                "bytes_in": bytes_in,
+                "bytes_out": bytes_out,
+                "bytes_saved": bytes_in - bytes_out,
+                "ratio": bytes_out / bytes_in if bytes_in else 1.0,
+                "cpu_seconds": sum(self.cpu_seconds.values()),
+                "by_encoding": {
+                    encoding: {
+                        "bytes_in": self.bytes_in[encoding],
+                        "bytes_out": self.bytes_out[encoding],
+                        "cpu_seconds": self.cpu_seconds[encoding],
+                    }
+                    for encoding in self.bytes_in
+                },
+            }
+
+    def collect(self) -> List[str]:
+        """Exposition lines for `/metrics`, labeled by encoding"""
+        with self._lock:
+            encodings = sorted(self.bytes_in)
+            families = [
+                ("compression_bytes_in_total", "Response bytes before compression", self.bytes_in),
+                ("compression_bytes_out_total", "Response bytes after compression", self.bytes_out),
+                ("compression_cpu_seconds_total", "CPU time spent compressing responses", self.cpu_seconds),
+            ]
+            lines: List[str] = []
+            for name, documentation, values in families:
+                lines.extend(render_family(
+                    name, "counter", documentation, ("encoding",),
+                    (((encoding,), values[encoding]) for encoding in encodings)
+                ))
+            lines.extend(render_family(
+                "compression_skipped_total", "counter", "Responses sent uncompressed", (), [((), self.skipped)]
+            ))
+            return lines
+
+compression_stats = CompressionStats()
+registry.add_collector(compression_stats.collect)
+
+# (path?query, ETag, encoding) -> compressed body
+compressed_cache: TTLCache[bytes] = TTLCache(COMPRESSION_CACHE_SIZE, COMPRESSION_CACHE_TTL_SECONDS)
+cache_stats.add("compression", compressed_cache.stats)
+
+def _timed_compress(encoding: str, body: bytes) -> Tuple[bytes, float]:
+    # thread_time counts only this thread's CPU, not time spent waiting
+    start = time.thread_time()
+    compressed = compress_body(encoding, body)
+    return compressed, time.thread_time() - start
+
+def _weak(etag: str) -> str:
+    # The compressed bytes differ from the identity ones, so the tag can't stay strong
+    return etag if etag.startswith("W/") else f"W/{etag}"
+
+class CompressionMiddleware:
+    """
+    Compress responses with the best encoding the client accepts
+    (zstd, br or gzip, depending on what is installed).
+
+    Complete bodies under `minimum_size` are left alone. Streaming
+    responses such as SSE are compressed chunk by chunk with a sync flush
+    so every event reaches the client immediately. Bodies of responses
+    that carry an ETag are cached compressed, so repeat hits on cacheable
+    routes like the resources catalog skip the compression work.
+    Ranged and already-encoded responses pass through untouched.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"))
+        responder = _CompressionResponder(scope, send, encoding, self.minimum_size)
+        await self.app(scope, receive, responder.send)
+
+class _CompressionResponder:
+    def __init__(self, scope: Scope, send: Send, encoding: Optional[str], minimum_size: int):
+        self.scope = scope
+        self.downstream = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start: Optional[Message] = None
+        self.mode: Optional[str] = None  # "identity", "buffered" or "stream"
+        self.compressor = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_seconds = 0.0
+
+    def _eligible(self, headers: MutableHeaders) -> bool:
+        status = self.start["status"]
+        content_type = headers.get("content-type", "")
+        return (
+            self.encoding is not None
+            and status not in (204, 206, 304)
+            and "content-encoding" not in headers
+            and "content-range" not in headers
+            and headers.get("accept-ranges", "none") == "none"
+            and content_type.startswith(COMPRESSIBLE_TYPES)
+        )
+
+    def _add_vary(self, headers: MutableHeaders) -> None:
+        if headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES):
+            headers.add_vary_header("Accept-Encoding")
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            await self.downstream(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.mode is None:
+            headers = MutableHeaders(raw=self.start["headers"])
+            self._add_vary(headers)
+            if not self._eligible(headers) or (not more_body and len(body) < self.minimum_size):
+                if self.encoding is not None:
+                    compression_stats.record_skip()
+                self.mode = "identity"
+            elif not more_body:
+                self.mode = "buffered"
+                body = await self._compress_complete(headers, body)
+                headers["Content-Length"] = str(len(body))
+            else:
+                self.mode = "stream"
+                self.compressor = ENCODERS[self.encoding]()
+                del headers["Content-Length"]
+            if self.mode != "identity":
+                headers["Content-Encoding"] = self.encoding
+                if "etag" in headers:
+                    headers["ETag"] = _weak(headers["etag"])
+            await self.downstream(self.start)
+            if self.mode != "stream":
+                await self.downstream({**message, "body": body})
+                return
+
+        if self.mode == "identity":
+            await self.downstream(message)
+            return
+
+        start = time.thread_time()
+        chunk = self.compressor.compress(body) if body else b""
+        if not more_body:
+            chunk += self.compressor.finish()
+        self.cpu_seconds += time.thread_time() - start
+        self.bytes_in += len(body)
+        self.bytes_out += len(chunk)
+        if not more_body:
+            compression_stats.record(self.encoding, self.bytes_in, self.bytes_out, self.cpu_seconds)
+        await self.downstream({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+    async def _compress_complete(self, headers: MutableHeaders, body: bytes) -> bytes:
+        etag = headers.get("etag")
+        cacheable = (
+            etag is not None
+            and len(body) <= COMPRESSION_CACHE_MAX_BODY
+            and "no-store" not in headers.get("cache-control", "")
+        )
+        key = None
+        if cacheable:
+            query = self.scope.get("query_string", b"").decode("latin-1")
+            key = (f"{self.scope['path']}?{query}", etag, self.encoding)
+            compressed = compressed_cache.get(key)
+            if compressed is not None:
+                compression_stats.record(self.encoding, len(body), len(compressed), 0.0, cache_hit=True)
+                return compressed
+
+        if len(body) >= COMPRESSION_OFFLOAD_BYTES:
+            compressed, cpu_seconds = await run_in_threadpool(_timed_compress, self.encoding, body)
+        else:
+            compressed, cpu_seconds = _timed_compress(self.encoding, body)
+        compression_stats.record(self.encoding, len(body), len(compressed), cpu_seconds)
+        if key is not None:
+            compressed_cache.set(key, compressed)
+        return compressed
@@ -0,0 +1,82 @@
+import os
+import time
+from dotenv import load_dotenv
+from backend.utils.metrics import registry
+
+# Load environment variables
+load_dotenv()
+
+# Record request metrics and serve /metrics
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+# When set, /metrics requires `Authorization: Bearer <token>`
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# Label for requests that matched no route, so stray paths can't add series
+UNMATCHED_ROUTE = "unmatched"
+_METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests by method, route template and status code", ("method", "route", "status")
+)
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "Time from request start to the last response byte", ("method", "route")
+)
+http_requests_in_flight = registry.gauge(
+    "http_requests_in_flight", "Requests currently being handled", ("method",)
+)
+http_request_bytes = registry.counter(
+    "http_request_body_bytes_total", "Request body bytes received, e.g. uploads", ("method", "route")
+)
+http_response_bytes = registry.counter(
+    "http_response_body_bytes_total", "Response body bytes sent after compression, e.g. downloads", ("method", "route")
+)
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording latency, status and body sizes per route
+    template (`/files/{file_id}`, not the raw path). Install it outermost so
+    the timings and byte counts cover compression too.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"] if scope["method"] in _METHODS else "OTHER"
+        in_flight = http_requests_in_flight.labels(method)
+        in_flight.inc()
+        start = time.perf_counter()
+        received = sent = 0
+        status_code = 500
+
+        async def counting_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            nonlocal sent, status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            in_flight.dec()
+            # The router leaves the matched route in the scope
+            route = getattr(scope.get("route"), "path", None) or UNMATCHED_ROUTE
+            http_request_duration.labels(method, route).observe(time.perf_counter() - start)
+            http_requests.labels(method, route, str(status_code)).inc()
+            if received:
+                http_request_bytes.labels(method, route).inc(received)
+            if sent:
+                http_response_bytes.labels(method, route).inc(sent)
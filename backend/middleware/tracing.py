@@ -0,0 +1,37 @@
+import time
+from backend.db.tracing import QUERY_TRACING, RequestTrace, current_trace
+
+class QueryTracingMiddleware:
+    """
+    Pure ASGI middleware collecting the DB and storage calls each request
+    makes. It adds their totals as a `Server-Timing` header and prints a
+    warning when a request makes too many calls or repeats a query shape.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not QUERY_TRACING:
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace()
+        token = current_trace.set(trace)
+        start = time.perf_counter()
+
+        async def traced_send(message):
+            if message["type"] == "http.response.start":
+                # Calls made after this point (e.g. while streaming) only show up in the warnings
+                header = trace.server_timing(time.perf_counter() - start).encode("latin-1")
+                message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header)]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, traced_send)
+        finally:
+            current_trace.reset(token)
+            warnings = trace.warnings()
+            if warnings:
+                route = getattr(scope.get("route"), "path", None) or scope["path"]
+                print(f"Query warning for {scope['method']} {route}: {'; '.join(warnings)}")
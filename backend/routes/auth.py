@@ -2,8 +2,8 @@ from fastapi import APIRouter, HTTPException, status
 from pydantic import BaseModel, EmailStr
 from typing import Optional
 from datetime import datetime, timedelta, UTC
-from backend.db.supabase_client import get_supabase
-from backend.auth.utils import create_access_token
+from backend.db.repository import execute, table
+from backend.auth.utils import create_access_token, mark_student_exists
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -25,13 +25,12 @@ class Token(BaseModel):
 @router.post("/register", response_model=Token)
 async def register(student: StudentCreate):
     """Register a new student"""
-    supabase = get_supabase()
-    
     # Check if email already exists
-    result = supabase.table("students")\
-        .select("*")\
-        .eq("email", student.email)\
-        .execute()
+    result = await execute(
+        table("students")
+        .select("id")
+        .eq("email", student.email)
+    )
     
     if result.data:
         raise HTTPException(
@@ -45,7 +44,7 @@ async def register(student: StudentCreate):
         "created_at": datetime.now(UTC).isoformat()
     }
     
-    result = supabase.table("students").insert(student_data).execute()
+    result = await execute(table("students").insert(student_data))
     
     if not result.data:
         raise HTTPException(
@@ -55,6 +54,7 @@ async def register(student: StudentCreate):
     
     # Create access token
     student_id = result.data[0]["id"]
+    mark_student_exists(student_id)
     access_token = create_access_token(
         data={"sub": student_id, "role": "student"},
         expires_delta=timedelta(minutes=30)
@@ -65,13 +65,12 @@ async def register(student: StudentCreate):
 @router.post("/login", response_model=Token)
 async def login(student: StudentLogin):
     """Login with email and password"""
-    supabase = get_supabase()
-    
     # Find student by email
-    result = supabase.table("students")\
-        .select("*")\
-        .eq("email", student.email)\
-        .execute()
+    result = await execute(
+        table("students")
+        .select("id, password")
+        .eq("email", student.email)
+    )
     
     if not result.data:
         raise HTTPException(
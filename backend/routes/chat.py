@@ -1,12 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from typing import List, Dict, Optional
 from pydantic import BaseModel
 from datetime import datetime, UTC
-from backend.db.supabase_client import get_supabase
+import os
+import uuid
+from backend.db.repository import execute, rpc, table
+from backend.db.pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER,
+    after_cursor, cursor_headers, decode_cursor, encode_cursor, paginate, trim_page
+)
+from backend.db.projection import columns
 from backend.auth.utils import get_current_student
+from backend.ai.answers import answer_events, answer_jobs
+from backend.ai.jobs import AnswerJob, QueueClosed, QueueFull, QUEUE_RETRY_AFTER_SECONDS
+from backend.ai.engine import AnswerRequest
+from backend.utils.sse import SSE_HEADERS
+from backend.utils.cache import TTLCache
+from backend.utils.http import not_modified, weak_etag
+from backend.utils.serialization import json_response
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
+# Maximum questions accepted by one bulk create call
+MAX_BULK_QUESTIONS = 100
+
+# Maps question id -> owning student id. Ownership never changes, so entries
+# only age out to bound memory.
+question_owners: TTLCache[str] = TTLCache(
+    int(os.getenv("QUESTION_OWNER_CACHE_SIZE", "10000")),
+    float(os.getenv("QUESTION_OWNER_CACHE_TTL_SECONDS", "3600"))
+)
+
 class QuestionCreate(BaseModel):
     question_text: str
     code_context: Optional[str] = None
@@ -34,85 +59,260 @@ class Conversation(BaseModel):
     message_text: str
     created_at: datetime
 
+class AnswerJobStatus(BaseModel):
+    id: str
+    question_id: str
+    status: str
+    is_hint: bool
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    message_id: Optional[str] = None
+    error: Optional[str] = None
+
 class FeedbackCreate(BaseModel):
     response_id: str
     rating: int
     comment: Optional[str] = None
 
+async def insert_questions(student_id: str, questions: List[QuestionCreate]) -> List[dict]:
+    """
+    Insert questions and their opening student messages in one round trip.
+    The create_questions function writes both tables in a single
+    transaction, so a question never exists without its conversation.
+    """
+    result = await execute(
+        rpc("create_questions", {
+            "p_student_id": student_id,
+            "p_questions": [
+                {
+                    "question_text": question.question_text,
+                    "code_context": question.code_context
+                }
+                for question in questions
+            ]
+        })
+    )
+    
+    if not result.data or len(result.data) != len(questions):
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to create question"
+        )
+    
+    return result.data
+
 @router.post("/questions", response_model=Question)
 async def create_question(
     question: QuestionCreate,
     student_id: str = Depends(get_current_student)
 ):
     """Create a new question"""
-    supabase = get_supabase()
-    
-    question_data = {
-        "student_id": student_id,
-        "question_text": question.question_text,
-        "code_context": question.code_context,
-        "resolved": False,
-        "created_at": datetime.now(UTC).isoformat()
-    }
+    rows = await insert_questions(student_id, [question])
+    return Question(**rows[0])
+
+@router.post("/questions/bulk", response_model=List[Question])
+async def create_questions_bulk(
+    questions: List[QuestionCreate],
+    student_id: str = Depends(get_current_student)
+):
+    """Create several questions at once, e.g. ones queued while offline"""
+    if not questions:
+        return []
+    if len(questions) > MAX_BULK_QUESTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_BULK_QUESTIONS} questions can be created at once"
+        )
     
-    result = supabase.table("questions").insert(question_data).execute()
+    rows = await insert_questions(student_id, questions)
+    return [Question(**q) for q in rows]
+
+@router.get("/questions", response_model=List[Question])
+async def get_questions(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    student_id: str = Depends(get_current_student)
+):
+    """Get the current student's questions, newest first, one page at a time"""
+    result = await execute(
+        paginate(
+            table("questions")
+            .select(columns(Question))
+            .eq("student_id", student_id),
+            cursor,
+            limit
+        )
+    )
     
-    if not result.data:
+    rows, next_cursor = trim_page(result.data, limit)
+    return json_response(rows, List[Question], cursor_headers(next_cursor))
+
+async def owns_question(question_id: str, student_id: str) -> bool:
+    """Check question ownership, consulting the in-process cache first"""
+    owner = question_owners.get(question_id)
+    if owner is None:
+        result = await execute(
+            table("questions")
+            .select("student_id")
+            .eq("id", question_id)
+        )
+        if not result.data:
+            return False
+        owner = result.data[0]["student_id"]
+        question_owners.set(question_id, owner)
+    return owner == student_id
+
+def conversation_etag(question_id: str, last_message_id: Optional[str]) -> str:
+    return weak_etag([question_id, last_message_id or ""])
+
+@router.get("/conversations/{question_id}", response_model=List[Conversation])
+async def get_conversation(
+    question_id: str,
+    request: Request,
+    since: Optional[str] = None,
+    student_id: str = Depends(get_current_student)
+):
+    """
+    Get conversation history for a specific question.
+    Pass the X-Next-Cursor value of the previous response as `since` to
+    fetch only newer messages; If-None-Match is answered with 304 while
+    no message has been added.
+    """
+    if not await owns_question(question_id, student_id):
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to create question"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Question not found"
         )
     
-    question_id = result.data[0]["id"]
+    since_id = decode_cursor(since)[1] if since else None
     
-    # Create initial conversation message
-    conversation_data = {
-        "student_id": student_id,
-        "question_id": question_id,
-        "message_type": "student",
-        "message_text": question.question_text,
-        "created_at": datetime.now(UTC).isoformat()
-    }
+    if request.headers.get("if-none-match") is not None:
+        # Revalidate against the newest message id alone
+        head = await execute(
+            table("conversations")
+            .select("id")
+            .eq("question_id", question_id)
+            .order("created_at", desc=True)
+            .order("id", desc=True)
+            .limit(1)
+        )
+        etag = conversation_etag(question_id, head.data[0]["id"] if head.data else None)
+        if not_modified(request, etag):
+            headers = {"ETag": etag}
+            if since:
+                headers[NEXT_CURSOR_HEADER] = since
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
     
-    result = supabase.table("conversations").insert(conversation_data).execute()
+    query = (
+        table("conversations")
+        .select(columns(Conversation))
+        .eq("question_id", question_id)
+    )
+    if since:
+        query = after_cursor(query, since, desc=False)
+    result = await execute(query.order("created_at").order("id"))
+    messages = result.data or []
     
-    if not result.data:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to create conversation"
-        )
+    headers = {}
+    if messages:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(messages[-1])
+        last_message_id = messages[-1]["id"]
+    else:
+        if since:
+            headers[NEXT_CURSOR_HEADER] = since
+        last_message_id = since_id
+    headers["ETag"] = conversation_etag(question_id, last_message_id)
     
-    return Question(**result.data[0])
+    return json_response(messages, List[Conversation], headers)
 
-@router.get("/questions", response_model=List[Question])
-async def get_questions(
+@router.get("/questions/{question_id}/answer/stream")
+async def stream_answer(
+    question_id: str,
+    hint: bool = False,
+    last_event_id: Optional[str] = Header(None),
     student_id: str = Depends(get_current_student)
 ):
-    """Get all questions for the current student"""
-    supabase = get_supabase()
+    """Generate an AI answer and stream it as Server-Sent Events"""
+    # Verify question belongs to student
+    question_result = await execute(
+        table("questions")
+        .select("question_text, code_context")
+        .eq("id", question_id)
+        .eq("student_id", student_id)
+    )
+    
+    if not question_result.data:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Question not found"
+        )
+    
+    # EventSource reconnects when a stream ends, sending the id of the `done`
+    # event it saw. That answer is already stored; 204 tells it to stop
+    # instead of generating (and storing) another one. Ids that aren't UUIDs
+    # (from proxies or other clients) can't name an answer, and PostgREST
+    # would reject them on the uuid column, so they are ignored.
+    try:
+        answered_id = str(uuid.UUID(last_event_id)) if last_event_id else None
+    except ValueError:
+        answered_id = None
+    if answered_id:
+        answered = await execute(
+            table("conversations")
+            .select("id")
+            .eq("id", answered_id)
+            .eq("question_id", question_id)
+            .eq("student_id", student_id)
+            .eq("message_type", "ai")
+        )
+        if answered.data:
+            return Response(status_code=status.HTTP_204_NO_CONTENT)
     
-    result = supabase.table("questions")\
-        .select("*")\
-        .eq("student_id", student_id)\
-        .order("created_at", desc=True)\
-        .execute()
+    question = question_result.data[0]
+    request = AnswerRequest(
+        question_text=question["question_text"],
+        code_context=question.get("code_context"),
+        is_hint=hint
+    )
     
-    return [Question(**q) for q in result.data] if result.data else []
+    return StreamingResponse(
+        answer_events(student_id, question_id, request),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
 
-@router.get("/conversations/{question_id}", response_model=List[Conversation])
-async def get_conversation(
+def answer_job_status(job: AnswerJob) -> AnswerJobStatus:
+    return AnswerJobStatus(
+        id=job.id,
+        question_id=job.question_id,
+        status=job.status.value,
+        is_hint=job.is_hint,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        message_id=job.message_id,
+        error=job.error
+    )
+
+@router.post(
+    "/questions/{question_id}/answer",
+    response_model=AnswerJobStatus,
+    status_code=status.HTTP_202_ACCEPTED
+)
+async def request_answer(
     question_id: str,
+    hint: bool = False,
     student_id: str = Depends(get_current_student)
 ):
-    """Get conversation history for a specific question"""
-    supabase = get_supabase()
-    
+    """Queue AI answer generation for a question; poll GET for progress"""
     # Verify question belongs to student
-    question_result = supabase.table("questions")\
-        .select("*")\
-        .eq("id", question_id)\
-        .eq("student_id", student_id)\
-        .execute()
+    question_result = await execute(
+        table("questions")
+        .select("question_text, code_context")
+        .eq("id", question_id)
+        .eq("student_id", student_id)
+    )
     
     if not question_result.data:
         raise HTTPException(
@@ -120,13 +320,49 @@ async def get_conversation(
             detail="Question not found"
         )
     
-    result = supabase.table("conversations")\
-        .select("*")\
-        .eq("question_id", question_id)\
-        .order("created_at")\
-        .execute()
+    question = question_result.data[0]
+    job = AnswerJob(
+        question_id=question_id,
+        student_id=student_id,
+        request=AnswerRequest(
+            question_text=question["question_text"],
+            code_context=question.get("code_context"),
+            is_hint=hint
+        )
+    )
+    
+    try:
+        job = answer_jobs.submit(job)
+    except QueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many answers are being generated, try again shortly",
+            headers={"Retry-After": str(QUEUE_RETRY_AFTER_SECONDS)}
+        )
+    except QueueClosed:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Answer generation is shutting down",
+            headers={"Retry-After": str(QUEUE_RETRY_AFTER_SECONDS)}
+        )
     
-    return [Conversation(**msg) for msg in result.data] if result.data else []
+    return answer_job_status(job)
+
+@router.get("/questions/{question_id}/answer", response_model=AnswerJobStatus)
+async def get_answer_status(
+    question_id: str,
+    student_id: str = Depends(get_current_student)
+):
+    """Get the status of the latest answer job for a question"""
+    job = answer_jobs.get(question_id)
+    
+    if job is None or job.student_id != student_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No answer job for this question"
+        )
+    
+    return answer_job_status(job)
 
 @router.post("/responses/{question_id}/feedback")
 async def submit_feedback(
@@ -141,14 +377,13 @@ async def submit_feedback(
             detail="Rating must be between 1 and 5"
         )
     
-    supabase = get_supabase()
-    
     # Verify question belongs to student
-    question_result = supabase.table("questions")\
-        .select("*")\
-        .eq("id", question_id)\
-        .eq("student_id", student_id)\
-        .execute()
+    question_result = await execute(
+        table("questions")
+        .select("id")
+        .eq("id", question_id)
+        .eq("student_id", student_id)
+    )
     
     if not question_result.data:
         raise HTTPException(
@@ -157,12 +392,13 @@ async def submit_feedback(
         )
     
     # Verify response exists and belongs to the question
-    response_result = supabase.table("conversations")\
-        .select("*")\
-        .eq("id", feedback.response_id)\
-        .eq("question_id", question_id)\
-        .eq("message_type", "ai")\
-        .execute()
+    response_result = await execute(
+        table("conversations")
+        .select("id")
+        .eq("id", feedback.response_id)
+        .eq("question_id", question_id)
+        .eq("message_type", "ai")
+    )
     
     if not response_result.data:
         raise HTTPException(
@@ -176,7 +412,7 @@ async def submit_feedback(
         "created_at": datetime.now(UTC).isoformat()
     }
     
-    result = supabase.table("feedback").insert(feedback_data).execute()
+    result = await execute(table("feedback").insert(feedback_data))
     
     if not result.data:
         raise HTTPException(
@@ -0,0 +1,57 @@
+import os
+from typing import List, Literal
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from pydantic import BaseModel
+from dotenv import load_dotenv
+from backend.auth.utils import get_current_admin
+from backend.db.tracing import query_stats
+
+# Load environment variables
+load_dotenv()
+
+# Development-only endpoints; they 404 unless enabled
+DEBUG_ENDPOINTS = os.getenv("DEBUG_ENDPOINTS", "0") == "1"
+
+def require_debug_endpoints():
+    if not DEBUG_ENDPOINTS:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+router = APIRouter(
+    prefix="/debug",
+    tags=["debug"],
+    dependencies=[Depends(require_debug_endpoints)],
+    include_in_schema=DEBUG_ENDPOINTS
+)
+
+class QueryShape(BaseModel):
+    kind: str
+    shape: str
+    calls: int
+    total_ms: float
+    mean_ms: float
+    max_ms: float
+
+@router.get("/queries", response_model=List[QueryShape])
+async def slowest_queries(
+    limit: int = Query(20, ge=1, le=500),
+    sort: Literal["total", "mean", "max"] = "total",
+    admin_id: str = Depends(get_current_admin)
+):
+    """Query shapes seen by this worker, slowest first"""
+    return [
+        QueryShape(
+            kind=stats.kind,
+            shape=stats.shape,
+            calls=stats.calls,
+            total_ms=round(stats.total * 1000, 3),
+            mean_ms=round(stats.total / stats.calls * 1000, 3),
+            max_ms=round(stats.max * 1000, 3)
+        )
+        for stats in query_stats.slowest(limit, sort)
+    ]
+
+@router.delete("/queries")
+async def reset_query_stats(admin_id: str = Depends(get_current_admin)):
+    """Forget the recorded query shapes"""
+    query_stats.clear()
+    return {"message": "Query stats cleared"}
@@ -1,9 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from typing import List, Dict
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status, UploadFile, File
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from typing import List, Dict, Optional
+from urllib.parse import quote
+from pydantic import BaseModel, Field
 from datetime import datetime, UTC
-from backend.db.supabase_client import get_supabase
+from starlette.concurrency import run_in_threadpool
+from backend.db.repository import execute, gather_limited, table, storage_download
+from backend.db.blobs import blob_path, ensure_blob, release_blobs
+from backend.db.storage import open_object_stream, parse_range, spool_upload
+from backend.db.archives import ARCHIVE_MAX_BYTES, extract_archive
+from backend.db.file_store import FILE_BATCH_CONCURRENCY, MAX_BATCH_FILES, PendingFile, delete_files, store_files
+from backend.db.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, cursor_headers, paginate, trim_page
+from backend.db.projection import columns, parse_fields, select_columns, sparse_response
 from backend.auth.utils import get_current_student
+from backend.ai.context import forget_file, index_uploaded_file
+from backend.utils.http import etag_matches
+from backend.utils.serialization import json_response
 import json
 
 router = APIRouter(prefix="/files", tags=["files"])
@@ -27,8 +40,43 @@ class FileResponse(BaseModel):
     size: int
     student_id: str
     storage_path: str
+    content_hash: Optional[str] = None
     created_at: datetime
 
+class BatchUploadResult(BaseModel):
+    name: str
+    status: int
+    file: Optional[FileResponse] = None
+    error: Optional[str] = None
+
+class BatchDeleteRequest(BaseModel):
+    file_ids: List[str] = Field(..., min_length=1)
+
+class BatchDeleteResponse(BaseModel):
+    deleted: List[str]
+    not_found: List[str]
+
+def check_batch_size(count: int) -> None:
+    if count > MAX_BATCH_FILES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_BATCH_FILES} files per batch"
+        )
+
+async def store_batch(student_id: str, pending: List[PendingFile]) -> List[BatchUploadResult]:
+    """Store spooled files in bulk and close them; one result per file, in order"""
+    try:
+        stored = await store_files(student_id, pending)
+    finally:
+        for item in pending:
+            item.spooled.close()
+    
+    return [
+        BatchUploadResult(name=outcome.name, status=500, error=outcome.error) if outcome.error
+        else BatchUploadResult(name=outcome.name, status=201, file=FileResponse(**outcome.row))
+        for outcome in stored
+    ]
+
 @router.post("/upload", response_model=FileResponse)
 async def upload_file(
     file: UploadFile = File(...),
@@ -41,60 +89,121 @@ async def upload_file(
             detail="No file provided"
         )
     
-    supabase = get_supabase()
+    # Stream the upload to a temp file, measuring and hashing it on the way
+    spooled = await spool_upload(file)
     
-    # Read file content
-    content = await file.read()
-    
-    # Generate storage path
-    storage_path = f"files/{student_id}/{file.filename}"
-    
-    # Upload to storage
     try:
-        result = supabase.storage.from_("files").upload(
-            storage_path,
-            content
-        )
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to upload file: {str(e)}"
-        )
+        # Files are stored once per distinct content and shared between students.
+        # The metadata row is written first so a release that starts while
+        # we upload sees it as a reference and keeps the blob.
+        file_data = {
+            "name": file.filename,
+            "content_type": file.content_type,
+            "size": spooled.size,
+            "student_id": student_id,
+            "storage_path": blob_path(spooled.sha256),
+            "content_hash": spooled.sha256,
+            "created_at": datetime.now(UTC).isoformat()
+        }
+        
+        result = await execute(table("files").insert(file_data))
+        
+        if not result.data:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to store file metadata"
+            )
+        
+        file_row = result.data[0]
+        
+        # Upload to storage unless an earlier upload of this content finished
+        try:
+            await ensure_blob(spooled, file.content_type)
+        except Exception as e:
+            await execute(table("files").delete().eq("id", file_row["id"]))
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to upload file: {str(e)}"
+            )
+        
+        # Make the file available as context for the student's questions
+        try:
+            await index_uploaded_file(student_id, file_row, spooled.path)
+        except Exception as e:
+            print(f"Failed to index file {file_row['id']}: {e}")
+    finally:
+        spooled.close()
     
-    # Store file metadata in database
-    file_data = {
-        "name": file.filename,
-        "content_type": file.content_type,
-        "size": len(content),
-        "student_id": student_id,
-        "storage_path": storage_path,
-        "created_at": datetime.now(UTC).isoformat()
-    }
+    return FileResponse(**file_row)
+
+@router.post("/upload-batch", response_model=List[BatchUploadResult])
+async def upload_files(
+    files: List[UploadFile] = File(...),
+    student_id: str = Depends(get_current_student)
+):
+    """Upload several files at once; each file gets its own result"""
+    check_batch_size(len(files))
     
-    result = supabase.table("files").insert(file_data).execute()
+    spools = await gather_limited((spool_upload(file) for file in files), FILE_BATCH_CONCURRENCY)
+    results: List[Optional[BatchUploadResult]] = [None] * len(files)
+    pending, positions = [], []
+    for i, (file, spooled) in enumerate(zip(files, spools)):
+        if isinstance(spooled, HTTPException):
+            results[i] = BatchUploadResult(name=file.filename, status=spooled.status_code, error=spooled.detail)
+        elif isinstance(spooled, Exception):
+            results[i] = BatchUploadResult(name=file.filename, status=500, error=f"Failed to read file: {str(spooled)}")
+        else:
+            pending.append(PendingFile(file.filename, file.content_type, spooled))
+            positions.append(i)
     
-    if not result.data:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to store file metadata"
-        )
+    stored = await store_batch(student_id, pending)
+    for i, result in zip(positions, stored):
+        results[i] = result
     
-    return FileResponse(**result.data[0])
+    return results
+
+@router.post("/upload-archive", response_model=List[BatchUploadResult])
+async def upload_archive(
+    file: UploadFile = File(...),
+    student_id: str = Depends(get_current_student)
+):
+    """Upload a zip or tar.gz project; each regular file in it is stored as its own file"""
+    spooled = await spool_upload(file, max_bytes=ARCHIVE_MAX_BYTES)
+    try:
+        pending = await run_in_threadpool(extract_archive, spooled.path, spooled.size)
+    finally:
+        spooled.close()
+    
+    return await store_batch(student_id, pending)
 
 @router.get("/list", response_model=List[FileResponse])
 async def list_files(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(
+        None,
+        description="Comma-separated FileResponse fields to return, e.g. `id,name,size`; `id` is always included"
+    ),
     student_id: str = Depends(get_current_student)
 ):
-    """List all files for the current student"""
-    supabase = get_supabase()
+    """List the current student's files, newest first, one page at a time"""
+    selected = parse_fields(fields, FileResponse)
+    result = await execute(
+        paginate(
+            table("files")
+            # The cursor is built from created_at and id, so both are always read
+            .select(select_columns(FileResponse, selected, required=("id", "created_at")))
+            .eq("student_id", student_id),
+            cursor,
+            limit
+        )
+    )
     
-    result = supabase.table("files")\
-        .select("*")\
-        .eq("student_id", student_id)\
-        .order("created_at", desc=True)\
-        .execute()
+    rows, next_cursor = trim_page(result.data, limit)
+    if selected:
+        return sparse_response(rows, FileResponse, selected, cursor_headers(next_cursor))
     
-    return [FileResponse(**file) for file in result.data] if result.data else []
+    return json_response(rows, List[FileResponse], cursor_headers(next_cursor))
 
 @router.get("/{file_id}/content", response_model=FileContent)
 async def get_file_content(
@@ -102,14 +211,13 @@ async def get_file_content(
     student_id: str = Depends(get_current_student)
 ):
     """Get file content and metadata"""
-    supabase = get_supabase()
-    
     # Get file metadata
-    result = supabase.table("files")\
-        .select("*")\
-        .eq("id", file_id)\
-        .eq("student_id", student_id)\
-        .execute()
+    result = await execute(
+        table("files")
+        .select(columns(FileResponse))
+        .eq("id", file_id)
+        .eq("student_id", student_id)
+    )
     
     if not result.data:
         raise HTTPException(
@@ -120,8 +228,7 @@ async def get_file_content(
     file_metadata = result.data[0]
     
     # Get file content from storage
-    storage_response = supabase.storage.from_("files")\
-        .download(file_metadata["storage_path"])
+    storage_response = await storage_download("files", file_metadata["storage_path"])
     
     if not storage_response:
         raise HTTPException(
@@ -134,20 +241,118 @@ async def get_file_content(
         metadata=FileMetadata(**file_metadata)
     )
 
+def file_etag(file_metadata: dict) -> str:
+    """Strong ETag for a stored file, from its content hash when known"""
+    if file_metadata.get("content_hash"):
+        return f'"{file_metadata["content_hash"]}"'
+    return f'"{file_metadata["id"]}-{file_metadata["size"]}"'
+
+@router.get("/{file_id}", response_model=FileResponse)
+async def get_file(
+    file_id: str,
+    student_id: str = Depends(get_current_student)
+):
+    """Get file metadata without touching storage"""
+    result = await execute(
+        table("files")
+        .select(columns(FileResponse))
+        .eq("id", file_id)
+        .eq("student_id", student_id)
+    )
+    
+    if not result.data:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File not found"
+        )
+    
+    return FileResponse(**result.data[0])
+
+@router.get("/{file_id}/raw")
+async def download_file(
+    file_id: str,
+    request: Request,
+    student_id: str = Depends(get_current_student)
+):
+    """Stream raw file bytes, honoring Range and If-None-Match"""
+    result = await execute(
+        table("files")
+        .select("id, name, content_type, size, storage_path, content_hash")
+        .eq("id", file_id)
+        .eq("student_id", student_id)
+    )
+    
+    if not result.data:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File not found"
+        )
+    
+    file_metadata = result.data[0]
+    size = file_metadata["size"]
+    etag = file_etag(file_metadata)
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f"inline; filename*=UTF-8''{quote(file_metadata['name'])}",
+    }
+    
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    # If-Range: only honor the range when the client's copy is still current
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range and if_range.strip() != etag:
+        range_header = None
+    byte_range = parse_range(range_header, size)
+    
+    upstream = await open_object_stream("files", file_metadata["storage_path"], byte_range)
+    
+    # Storage (or a proxy in front of it) may ignore Range and send the whole object
+    if byte_range is not None and upstream.status_code != status.HTTP_206_PARTIAL_CONTENT:
+        byte_range = None
+    
+    if byte_range is None:
+        status_code = status.HTTP_200_OK
+        headers["Content-Length"] = str(size)
+    else:
+        start, end = byte_range
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+    
+    return StreamingResponse(
+        upstream.aiter_bytes(),
+        status_code=status_code,
+        media_type=file_metadata.get("content_type") or "application/octet-stream",
+        headers=headers,
+        background=BackgroundTask(upstream.aclose)
+    )
+
+@router.post("/delete-batch", response_model=BatchDeleteResponse)
+async def delete_files_batch(
+    request: BatchDeleteRequest,
+    student_id: str = Depends(get_current_student)
+):
+    """Delete several files at once; ids that aren't the student's are reported as not found"""
+    check_batch_size(len(request.file_ids))
+    deleted, not_found = await delete_files(student_id, request.file_ids)
+    return BatchDeleteResponse(deleted=deleted, not_found=not_found)
+
 @router.delete("/{file_id}")
 async def delete_file(
     file_id: str,
     student_id: str = Depends(get_current_student)
 ):
     """Delete a file"""
-    supabase = get_supabase()
-    
     # Get file metadata
-    result = supabase.table("files")\
-        .select("*")\
-        .eq("id", file_id)\
-        .eq("student_id", student_id)\
-        .execute()
+    result = await execute(
+        table("files")
+        .select("storage_path")
+        .eq("id", file_id)
+        .eq("student_id", student_id)
+    )
     
     if not result.data:
         raise HTTPException(
@@ -157,21 +362,13 @@ async def delete_file(
     
     file_data = result.data[0]
     
-    # Delete from storage
-    try:
-        supabase.storage.from_("files").remove([file_data["storage_path"]])
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to delete file from storage: {str(e)}"
-        )
-    
     # Delete metadata from database
-    result = supabase.table("files")\
-        .delete()\
-        .eq("id", file_id)\
-        .eq("student_id", student_id)\
-        .execute()
+    result = await execute(
+        table("files")
+        .delete()
+        .eq("id", file_id)
+        .eq("student_id", student_id)
+    )
     
     if not result.data:
         raise HTTPException(
@@ -179,4 +376,13 @@ async def delete_file(
             detail="Failed to delete file metadata"
         )
     
+    forget_file(student_id, file_id)
+    
+    # Delete from storage once no other file references the content
+    try:
+        await release_blobs([file_data["storage_path"]])
+    except Exception as e:
+        # The file is already gone for the student; an orphaned blob is only wasted space
+        print(f"Failed to release blob {file_data['storage_path']}: {e}")
+    
     return {"message": "File deleted successfully"} 
\ No newline at end of file
@@ -0,0 +1,68 @@
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+from backend.auth.utils import get_current_admin
+from backend.utils.profiler import PROFILER_INTERVAL_SECONDS, PROFILER_MAX_SECONDS, profiler
+
+router = APIRouter(prefix="/profiler", tags=["profiler"])
+
+class ProfilerStart(BaseModel):
+    interval_ms: float = Field(PROFILER_INTERVAL_SECONDS * 1000, ge=1, le=1000)
+    duration_seconds: float = Field(60, gt=0, le=PROFILER_MAX_SECONDS)
+    include_idle: bool = False
+
+class ProfilerStatus(BaseModel):
+    running: bool
+    interval_seconds: float
+    include_idle: bool
+    samples: int
+    stacks: int
+    started_at: Optional[float] = None
+    stopped_at: Optional[float] = None
+    output: Optional[str] = None
+    hottest: List[Dict[str, Any]] = []
+
+def current_status() -> ProfilerStatus:
+    return ProfilerStatus(**profiler.status(), hottest=profiler.hottest())
+
+@router.post("/start", response_model=ProfilerStatus)
+async def start_profiler(
+    options: ProfilerStart = ProfilerStart(),
+    admin_id: str = Depends(get_current_admin)
+):
+    """Start sampling this worker's stacks; it stops by itself after `duration_seconds`"""
+    if not profiler.start(options.interval_ms / 1000, options.duration_seconds, options.include_idle):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Profiler is already running"
+        )
+    return current_status()
+
+@router.post("/stop", response_model=ProfilerStatus)
+async def stop_profiler(admin_id: str = Depends(get_current_admin)):
+    """Stop the profile and write it to the worker's profile directory"""
+    if not profiler.running:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Profiler is not running"
+        )
+    # Joining the sampler thread (up to one interval) and writing the profile
+    # both block, so they run off the event loop
+    await run_in_threadpool(profiler.stop)
+    return current_status()
+
+@router.get("", response_model=ProfilerStatus)
+async def profiler_status(admin_id: str = Depends(get_current_admin)):
+    """Whether a profile is running, and the hottest frames so far"""
+    return current_status()
+
+@router.get("/folded", response_class=PlainTextResponse)
+async def folded_profile(
+    limit: Optional[int] = Query(None, ge=1, description="Only the hottest `limit` stacks"),
+    admin_id: str = Depends(get_current_admin)
+):
+    """The current or last profile in folded format, for flamegraph.pl or speedscope"""
+    lines = profiler.folded().splitlines(keepends=True)
+    return PlainTextResponse("".join(lines[:limit]))
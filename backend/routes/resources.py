@@ -1,12 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List, Dict, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from typing import List, Dict, Literal, Optional
 from pydantic import BaseModel
 from datetime import datetime, UTC
-from backend.db.supabase_client import get_supabase
+import os
+from backend.db.repository import execute, table
+from backend.db.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER
+from backend.db.catalog import ResourceCatalog, resource_etag
+from backend.db.projection import columns, parse_fields, select_columns, sparse_response
 from backend.auth.utils import get_current_student, get_current_admin
+from backend.search.tag_index import TagIndex
+from backend.search.bm25 import BM25Index, highlight
+from backend.utils.http import http_date, not_modified
+from backend.utils.metrics import cache_stats
+from backend.utils.serialization import json_response
 
 router = APIRouter(prefix="/resources", tags=["resources"])
 
+# Inverted tag -> resource id index backing /resources/search
+tag_index = TagIndex(max_age=float(os.getenv("TAG_INDEX_REFRESH_SECONDS", "300")))
+
+# BM25 full-text index backing /resources/search/text
+text_index = BM25Index(max_age=float(os.getenv("TEXT_INDEX_REFRESH_SECONDS", "300")))
+
+# Clients may reuse a cached copy but must revalidate it first
+CACHE_CONTROL = "private, no-cache"
+
 class Resource(BaseModel):
     id: str
     title: str
@@ -17,6 +35,21 @@ class Resource(BaseModel):
     created_at: datetime
     updated_at: datetime
 
+# Read-through cache of the catalog, invalidated by the admin routes
+resource_catalog = ResourceCatalog(columns=columns(Resource))
+cache_stats.add("resource_pages", lambda: resource_catalog.stats()["pages"])
+cache_stats.add("resource_items", lambda: resource_catalog.stats()["items"])
+
+# Documents the sparse fieldset parameter shared by the read routes
+FIELDS_QUERY = Query(
+    None,
+    description="Comma-separated Resource fields to return, e.g. `id,title,tags`; `id` is always included"
+)
+
+class ResourceMatch(Resource):
+    score: float
+    snippet: str
+
 class ResourceCreate(BaseModel):
     title: str
     description: str
@@ -24,14 +57,26 @@ class ResourceCreate(BaseModel):
     file_type: str
     tags: List[str]
 
+async def get_tag_index() -> TagIndex:
+    """Returns the tag index, rebuilding it from id/tags columns when stale"""
+    if tag_index.stale:
+        result = await execute(table("resources").select("id, tags"))
+        tag_index.load(result.data or [])
+    return tag_index
+
+async def get_text_index() -> BM25Index:
+    """Returns the full-text index, rebuilding it from the text columns when stale"""
+    if text_index.stale:
+        result = await execute(table("resources").select("id, title, description, content"))
+        text_index.load(result.data or [])
+    return text_index
+
 @router.post("/", response_model=Resource)
 async def create_resource(
     resource: ResourceCreate,
     admin_id: str = Depends(get_current_admin)
 ):
     """Create a new learning resource (admin only)"""
-    supabase = get_supabase()
-    
     now = datetime.now(UTC).isoformat()
     resource_data = {
         **resource.dict(),
@@ -39,7 +84,7 @@ async def create_resource(
         "updated_at": now
     }
     
-    result = supabase.table("resources").insert(resource_data).execute()
+    result = await execute(table("resources").insert(resource_data))
     
     if not result.data:
         raise HTTPException(
@@ -47,42 +92,133 @@ async def create_resource(
             detail="Failed to create resource"
         )
     
+    tag_index.add(result.data[0]["id"], result.data[0].get("tags"))
+    text_index.add(result.data[0]["id"], result.data[0])
+    resource_catalog.invalidate(row=result.data[0])
+    
     return Resource(**result.data[0])
 
+def validator_headers(etag: str, last_modified: Optional[str]) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if last_modified:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
 @router.get("/", response_model=List[Resource])
 async def list_resources(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = FIELDS_QUERY,
+    student_id: str = Depends(get_current_student)
+):
+    """List resources, newest first, one page at a time"""
+    selected = parse_fields(fields, Resource)
+    page = await resource_catalog.get_page(cursor, limit)
+    
+    headers = validator_headers(page.etag, page.last_modified)
+    if page.next_cursor:
+        headers[NEXT_CURSOR_HEADER] = page.next_cursor
+    
+    if not_modified(request, page.etag, page.last_modified):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    if selected:
+        # Pages are cached whole, so the subset is cut from the cached rows
+        return sparse_response(page.rows, Resource, selected, headers)
+    
+    return json_response(page.rows, List[Resource], headers)
+
+@router.get("/search", response_model=List[Resource])
+async def search_resources(
+    tag: List[str] = Query(...),
+    match: Literal["any", "all"] = "any",
+    fields: Optional[str] = FIELDS_QUERY,
+    student_id: str = Depends(get_current_student)
+):
+    """Search resources by one or more tags (match any or all of them)"""
+    selected = parse_fields(fields, Resource)
+    index = await get_tag_index()
+    resource_ids = index.search(tag, match_all=match == "all")
+    
+    if not resource_ids:
+        return []
+    
+    # Only the matching rows are fetched from the database
+    result = await execute(
+        table("resources")
+        .select(select_columns(Resource, selected))
+        .in_("id", sorted(resource_ids))
+        .order("created_at", desc=True)
+    )
+    
+    if selected:
+        return sparse_response(result.data or [], Resource, selected)
+    
+    return json_response(result.data or [], List[Resource])
+
+@router.get("/search/text", response_model=List[ResourceMatch])
+async def search_resources_text(
+    q: str = Query(..., min_length=1),
+    k: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
     student_id: str = Depends(get_current_student)
 ):
-    """List all resources"""
-    supabase = get_supabase()
+    """Ranked full-text search over title, description and content"""
+    index = await get_text_index()
+    ranked = index.search(q, k)
+    
+    if not ranked:
+        return []
     
-    result = supabase.table("resources")\
-        .select("*")\
-        .order("created_at", desc=True)\
-        .execute()
+    # Only the top k rows are fetched from the database
+    result = await execute(
+        table("resources")
+        .select(columns(Resource))
+        .in_("id", [resource_id for resource_id, _ in ranked])
+    )
+    rows = {r["id"]: r for r in result.data or []}
     
-    return [Resource(**r) for r in result.data] if result.data else []
+    matches = []
+    for resource_id, score in ranked:
+        row = rows.get(resource_id)
+        if row is None:
+            # Deleted by another worker since this index was refreshed
+            continue
+        snippet = highlight(row.get("content"), q)
+        if "<mark>" not in snippet:
+            snippet = highlight(row.get("description"), q) or snippet
+        matches.append({**row, "score": round(score, 4), "snippet": snippet})
+    return json_response(matches, List[ResourceMatch])
 
 @router.get("/{resource_id}", response_model=Resource)
 async def get_resource(
     resource_id: str,
+    request: Request,
+    response: Response,
+    fields: Optional[str] = FIELDS_QUERY,
     student_id: str = Depends(get_current_student)
 ):
     """Get a specific resource"""
-    supabase = get_supabase()
-    
-    result = supabase.table("resources")\
-        .select("*")\
-        .eq("id", resource_id)\
-        .execute()
+    selected = parse_fields(fields, Resource)
+    row = await resource_catalog.get_item(resource_id)
     
-    if not result.data:
+    if row is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Resource not found"
         )
     
-    return Resource(**result.data[0])
+    etag = resource_etag(row)
+    headers = validator_headers(etag, row["updated_at"])
+    
+    if not_modified(request, etag, row["updated_at"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    if selected:
+        return sparse_response([row], Resource, selected, headers, many=False)
+    
+    response.headers.update(headers)
+    return Resource(**row)
 
 @router.put("/{resource_id}", response_model=Resource)
 async def update_resource(
@@ -91,13 +227,12 @@ async def update_resource(
     admin_id: str = Depends(get_current_admin)
 ):
     """Update a specific resource (admin only)"""
-    supabase = get_supabase()
-    
     # Check if resource exists
-    result = supabase.table("resources")\
-        .select("*")\
-        .eq("id", resource_id)\
-        .execute()
+    result = await execute(
+        table("resources")
+        .select("id")
+        .eq("id", resource_id)
+    )
     
     if not result.data:
         raise HTTPException(
@@ -111,10 +246,11 @@ async def update_resource(
         "updated_at": datetime.now(UTC).isoformat()
     }
     
-    result = supabase.table("resources")\
-        .update(resource_data)\
-        .eq("id", resource_id)\
-        .execute()
+    result = await execute(
+        table("resources")
+        .update(resource_data)
+        .eq("id", resource_id)
+    )
     
     if not result.data:
         raise HTTPException(
@@ -122,27 +258,11 @@ async def update_resource(
             detail="Failed to update resource"
         )
     
-    return Resource(**result.data[0])
-
-@router.get("/search", response_model=List[Resource])
-async def search_resources(
-    tag: str,
-    student_id: str = Depends(get_current_student)
-):
-    """Search resources by tag"""
-    supabase = get_supabase()
+    tag_index.add(resource_id, result.data[0].get("tags"))
+    text_index.add(resource_id, result.data[0])
+    resource_catalog.invalidate(resource_id, row=result.data[0])
     
-    result = supabase.table("resources")\
-        .select("*")\
-        .execute()
-    
-    # Filter by tag (since Supabase doesn't support array contains in free tier)
-    resources = [
-        Resource(**r) for r in result.data
-        if tag in r.get("tags", [])
-    ] if result.data else []
-    
-    return resources
+    return Resource(**result.data[0])
 
 @router.delete("/{resource_id}")
 async def delete_resource(
@@ -150,13 +270,12 @@ async def delete_resource(
     admin_id: str = Depends(get_current_admin)
 ):
     """Delete a specific resource (admin only)"""
-    supabase = get_supabase()
-    
     # Check if resource exists
-    result = supabase.table("resources")\
-        .select("*")\
-        .eq("id", resource_id)\
-        .execute()
+    result = await execute(
+        table("resources")
+        .select("id")
+        .eq("id", resource_id)
+    )
     
     if not result.data:
         raise HTTPException(
@@ -165,10 +284,11 @@ async def delete_resource(
         )
     
     # Delete resource
-    result = supabase.table("resources")\
-        .delete()\
-        .eq("id", resource_id)\
-        .execute()
+    result = await execute(
+        table("resources")
+        .delete()
+        .eq("id", resource_id)
+    )
     
     if not result.data:
         raise HTTPException(
@@ -176,4 +296,8 @@ async def delete_resource(
             detail="Failed to delete resource"
         )
     
+    tag_index.remove(resource_id)
+    text_index.remove(resource_id)
+    resource_catalog.invalidate(resource_id)
+    
     return {"message": "Resource deleted successfully"} 
\ No newline at end of file
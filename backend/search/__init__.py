@@ -0,0 +1,3 @@
+"""
+Search package for AI Tutor Backend
+"""
\ No newline at end of file
@@ -0,0 +1,182 @@
+import heapq
+import html
+import math
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Fields indexed for full-text search and how much a match in each counts
+FIELD_WEIGHTS = {"title": 3.0, "description": 2.0, "content": 1.0}
+
+_TOKEN = re.compile(r"[a-z0-9_]+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from how i in is it of on or the to what with".split()
+)
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lowercase word tokens with stopwords removed"""
+    if not text:
+        return []
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+class BM25Index:
+    """
+    In-memory inverted index over resource title, description and content,
+    ranked with BM25. Field matches are weighted by FIELD_WEIGHTS before
+    saturation. Like TagIndex it is kept current by the admin resource
+    routes and rebuilt from the database when empty or older than `max_age`.
+    """
+
+    def __init__(self, max_age: float = 300, k1: float = 1.2, b: float = 0.75):
+        self.max_age = max_age
+        self.k1 = k1
+        self.b = b
+        # term -> {resource id: weighted term frequency}
+        self._postings: Dict[str, Dict[str, float]] = {}
+        # resource id -> (weighted length, terms), for removal and normalization
+        self._docs: Dict[str, Tuple[float, Tuple[str, ...]]] = {}
+        self._total_length = 0.0
+        # resource id -> BM25 length normalization, recomputed after writes
+        self._norms: Optional[Dict[str, float]] = None
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    @property
+    def stale(self) -> bool:
+        """Whether the index should be rebuilt from the database"""
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.max_age
+
+    def load(self, rows: Iterable[dict]) -> None:
+        """Replace the index with `rows` carrying id and the indexed fields"""
+        fresh = BM25Index(self.max_age, self.k1, self.b)
+        for row in rows:
+            fresh._add(row["id"], row)
+        with self._lock:
+            self._postings = fresh._postings
+            self._docs = fresh._docs
+            self._total_length = fresh._total_length
+            self._norms = None
+            self._loaded_at = time.monotonic()
+
+    def clear(self) -> None:
+        """Empty the index and force a rebuild on next use"""
+        with self._lock:
+            self._postings = {}
+            self._docs = {}
+            self._total_length = 0.0
+            self._norms = None
+            self._loaded_at = None
+
+    def add(self, resource_id: str, row: dict) -> None:
+        """Index a new resource or re-index an updated one"""
+        with self._lock:
+            self._remove(resource_id)
+            self._add(resource_id, row)
+
+    def remove(self, resource_id: str) -> None:
+        """Drop a resource from the index"""
+        with self._lock:
+            self._remove(resource_id)
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Top `k` (resource id, score) pairs for `query`, best first"""
+        terms = set(tokenize(query))
+        scores: Dict[str, float] = {}
+        with self._lock:
+            count = len(self._docs)
+            if not terms or not count:
+                return []
+            norms = self._norms
+            if norms is None:
+                norms = self._norms = self._compute_norms()
+            k1 = self.k1
+            get = scores.get
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                df = len(postings)
+                weight = math.log(1 + (count - df + 0.5) / (df + 0.5)) * (k1 + 1)
+                for resource_id, tf in postings.items():
+                    scores[resource_id] = get(resource_id, 0.0) + weight * tf / (tf + norms[resource_id])
+        # Only the k best survive; the rest of the candidates are never sorted
+        return heapq.nlargest(k, scores.items(), key=lambda item: (item[1], item[0]))
+
+    def _compute_norms(self) -> Dict[str, float]:
+        average_length = self._total_length / len(self._docs) or 1.0
+        return {
+            resource_id: self.k1 * (1 - self.b + self.b * length / average_length)
+            for resource_id, (length, _) in self._docs.items()
+        }
+
+    def _add(self, resource_id: str, row: dict) -> None:
+        frequencies: Dict[str, float] = {}
+        length = 0.0
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(row.get(field)):
+                frequencies[token] = frequencies.get(token, 0.0) + weight
+                length += weight
+        for term, tf in frequencies.items():
+            self._postings.setdefault(term, {})[resource_id] = tf
+        self._docs[resource_id] = (length, tuple(frequencies))
+        self._total_length += length
+        self._norms = None
+
+    def _remove(self, resource_id: str) -> None:
+        doc = self._docs.pop(resource_id, None)
+        if doc is None:
+            return
+        length, terms = doc
+        self._total_length -= length
+        self._norms = None
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(resource_id, None)
+                if not postings:
+                    del self._postings[term]
+
+def highlight(text: Optional[str], query: str, width: int = 160, mark: Tuple[str, str] = ("<mark>", "</mark>")) -> str:
+    """
+    HTML-escaped excerpt of `text` around the densest run of query terms,
+    with each matching word wrapped in `mark`.
+    """
+    if not text:
+        return ""
+    terms = set(tokenize(query))
+    matches = [m for m in _TOKEN.finditer(text.lower()) if m.group() in terms]
+    if not matches:
+        excerpt = text[:width]
+        return html.escape(excerpt) + ("..." if len(text) > width else "")
+
+    # Slide a window over the match positions and keep the one covering most hits
+    best_start, best_hits, right = matches[0].start(), 0, 0
+    for left, match in enumerate(matches):
+        while right < len(matches) and matches[right].end() - match.start() <= width:
+            right += 1
+        if right - left > best_hits:
+            best_start, best_hits = match.start(), right - left
+    start = max(0, min(best_start - width // 4, len(text) - width))
+    # Don't cut a word in half at either end
+    while start > 0 and text[start - 1].isalnum():
+        start -= 1
+    end = min(len(text), start + width)
+    while end < len(text) and text[end].isalnum():
+        end += 1
+
+    parts = ["..." if start > 0 else ""]
+    cursor = start
+    for match in matches:
+        if match.start() < start or match.end() > end:
+            continue
+        parts.append(html.escape(text[cursor:match.start()]))
+        parts.append(mark[0] + html.escape(text[match.start():match.end()]) + mark[1])
+        cursor = match.end()
+    parts.append(html.escape(text[cursor:end]))
+    parts.append("..." if end < len(text) else "")
+    return "".join(parts)
@@ -0,0 +1,334 @@
+import ast
+import keyword
+import math
+import os
+import re
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from dotenv import load_dotenv
+from backend.search.bm25 import STOPWORDS
+
+# Load environment variables
+load_dotenv()
+
+# Embedding width; each vector costs 4 bytes per dimension
+CODE_INDEX_DIM = int(os.getenv("CODE_INDEX_DIM", "512"))
+# Longest chunk, in lines, before a function or window is split further
+MAX_CHUNK_LINES = int(os.getenv("CODE_INDEX_MAX_CHUNK_LINES", "60"))
+# Per-student bound; the oldest files are dropped first when it is exceeded
+CODE_INDEX_MAX_CHUNKS = int(os.getenv("CODE_INDEX_MAX_CHUNKS", "1000"))
+# Students whose index is kept in memory, least recently used evicted first
+CODE_INDEX_MAX_STUDENTS = int(os.getenv("CODE_INDEX_MAX_STUDENTS", "128"))
+# Rebuild a student's index from the database after this many seconds
+CODE_INDEX_REFRESH_SECONDS = float(os.getenv("CODE_INDEX_REFRESH_SECONDS", "600"))
+
+# Extensions treated as source code for function/class aware chunking
+SOURCE_EXTENSIONS = frozenset(
+    ".py .js .jsx .ts .tsx .java .c .h .cpp .hpp .cc .cs .go .rs .rb .php .swift .kt .scala .sql .sh".split()
+)
+
+# Identifiers that say nothing about what a chunk does
+_NOISE = STOPWORDS | frozenset(keyword.kwlist).union(
+    "self cls this none null true false var let const function return int str bool void "
+    "public private protected static new print".split()
+)
+
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_SUBWORD = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+_BOUNDARY = re.compile(
+    r"^\s{0,4}(?:export\s+)?(?:default\s+)?(?:(?:public|private|protected|static|async|final|abstract)\s+)*"
+    r"(?:def|class|function|fn|func|interface|struct|impl|enum|trait)\b\s*\*?\s*(\w+)?"
+)
+
+@dataclass(frozen=True)
+class CodeChunk:
+    """A function, class or window of lines from one of a student's files"""
+    file_id: str
+    file_name: str
+    name: Optional[str]
+    start_line: int
+    end_line: int
+    text: str
+
+    @property
+    def search_text(self) -> str:
+        """Text embedded for retrieval; the definition name counts extra"""
+        return f"{self.name} {self.name}\n{self.text}" if self.name else self.text
+
+    @property
+    def label(self) -> str:
+        where = f"{self.file_name}, lines {self.start_line}-{self.end_line}"
+        return f"`{self.name}` ({where})" if self.name else where
+
+def _python_spans(source: str) -> Optional[List[Tuple[int, int, Optional[str]]]]:
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return None
+    spans = []
+    for node in tree.body:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+        if isinstance(node, ast.ClassDef) and node.end_lineno - start + 1 > MAX_CHUNK_LINES:
+            # Large classes are indexed method by method
+            methods = [
+                child for child in node.body
+                if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef))
+            ]
+            header_end = node.end_lineno
+            if methods:
+                header_end = min([methods[0].lineno] + [d.lineno for d in methods[0].decorator_list]) - 1
+            spans.append((start, header_end, node.name))
+            for method in methods:
+                method_start = min([method.lineno] + [d.lineno for d in method.decorator_list])
+                spans.append((method_start, method.end_lineno, f"{node.name}.{method.name}"))
+        else:
+            spans.append((start, node.end_lineno, node.name))
+    return spans
+
+def _regex_spans(lines: List[str]) -> List[Tuple[int, int, Optional[str]]]:
+    starts = []
+    for number, line in enumerate(lines, 1):
+        match = _BOUNDARY.match(line)
+        if match:
+            starts.append((number, match.group(1)))
+    spans = []
+    for i, (start, name) in enumerate(starts):
+        end = starts[i + 1][0] - 1 if i + 1 < len(starts) else len(lines)
+        spans.append((start, end, name))
+    return spans
+
+def chunk_source(text: str, file_name: str, file_id: str) -> List[CodeChunk]:
+    """
+    Split a file into chunks for retrieval. Python files are split on
+    top-level functions and classes using the AST, other source files on
+    definition keywords, and anything else into fixed windows. Code
+    between definitions becomes its own chunk and every chunk is capped
+    at MAX_CHUNK_LINES.
+    """
+    lines = text.splitlines()
+    if not lines:
+        return []
+    extension = os.path.splitext(file_name)[1].lower()
+    spans: List[Tuple[int, int, Optional[str]]] = []
+    if extension == ".py":
+        spans = _python_spans(text) or []
+    if not spans and extension in SOURCE_EXTENSIONS:
+        spans = _regex_spans(lines)
+
+    # Cover the lines between definitions as unnamed chunks
+    covered: List[Tuple[int, int, Optional[str]]] = []
+    position = 1
+    for start, end, name in sorted(spans):
+        if start > position:
+            covered.append((position, start - 1, None))
+        covered.append((start, end, name))
+        position = max(position, end + 1)
+    if position <= len(lines):
+        covered.append((position, len(lines), None))
+
+    chunks = []
+    for start, end, name in covered:
+        for window_start in range(start, end + 1, MAX_CHUNK_LINES):
+            window_end = min(end, window_start + MAX_CHUNK_LINES - 1)
+            # Trim blank edges so line numbers point at code
+            while window_start <= window_end and not lines[window_start - 1].strip():
+                window_start += 1
+            while window_end >= window_start and not lines[window_end - 1].strip():
+                window_end -= 1
+            if window_start <= window_end:
+                body = "\n".join(lines[window_start - 1:window_end])
+                chunks.append(CodeChunk(file_id, file_name, name, window_start, window_end, body))
+    return chunks
+
+def features(text: str) -> List[str]:
+    """Identifiers and their camelCase/snake_case parts, lowercased"""
+    result = []
+    for identifier in _IDENTIFIER.findall(text):
+        lowered = identifier.lower()
+        if len(lowered) < 2 or lowered in _NOISE:
+            continue
+        result.append(lowered)
+        parts = _SUBWORD.findall(identifier)
+        if len(parts) > 1:
+            result.extend(part.lower() for part in parts if part.lower() not in _NOISE)
+    return result
+
+def embed(texts: Iterable[str], dim: int = CODE_INDEX_DIM) -> np.ndarray:
+    """
+    L2-normalized feature-hashing vectors, one row per text.
+    Runs locally and deterministically: no model, GPU or network.
+    """
+    texts = list(texts)
+    rows, columns, values = [], [], []
+    for row, text in enumerate(texts):
+        for feature, count in Counter(features(text)).items():
+            digest = zlib.crc32(feature.encode())
+            rows.append(row)
+            columns.append(digest % dim)
+            # The top hash bit picks a sign so collisions tend to cancel out
+            values.append((1.0 if digest & 0x80000000 else -1.0) * (1.0 + math.log(count)))
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    if rows:
+        np.add.at(matrix, (np.array(rows), np.array(columns)), np.array(values, dtype=np.float32))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+class StudentCodeIndex:
+    """Chunk vectors for one student's files, kept in a single matrix"""
+
+    def __init__(self, dim: int = CODE_INDEX_DIM, max_chunks: int = CODE_INDEX_MAX_CHUNKS):
+        self.max_chunks = max_chunks
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.chunks: List[CodeChunk] = []
+        # file id -> chunk count, oldest file first
+        self._files: "OrderedDict[str, int]" = OrderedDict()
+        self.loaded_at = time.monotonic()
+
+    @property
+    def nbytes(self) -> int:
+        return self.vectors.nbytes + sum(len(chunk.text) for chunk in self.chunks)
+
+    def add_file(self, file_id: str, chunks: List[CodeChunk], vectors: np.ndarray) -> None:
+        """Index a file's chunks, evicting the oldest files beyond `max_chunks`"""
+        self.remove_file(file_id)
+        chunks = chunks[:self.max_chunks]
+        if not chunks:
+            return
+        while self._files and len(self.chunks) + len(chunks) > self.max_chunks:
+            self.remove_file(next(iter(self._files)))
+        self.vectors = np.vstack([self.vectors, vectors[:len(chunks)]])
+        self.chunks.extend(chunks)
+        self._files[file_id] = len(chunks)
+
+    def remove_file(self, file_id: str) -> None:
+        """Drop every chunk of a file"""
+        if self._files.pop(file_id, None) is None:
+            return
+        keep = [i for i, chunk in enumerate(self.chunks) if chunk.file_id != file_id]
+        self.vectors = self.vectors[keep]
+        self.chunks = [self.chunks[i] for i in keep]
+
+    def search(self, query: np.ndarray, k: int, min_score: float) -> List[Tuple[CodeChunk, float]]:
+        """Top `k` chunks by cosine similarity to the normalized `query` vector"""
+        if not self.chunks or k <= 0:
+            return []
+        scores = self.vectors @ query
+        if len(scores) > k:
+            # Partial selection: only the k candidates get sorted
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self.chunks[i], float(scores[i])) for i in top if scores[i] >= min_score]
+
+class CodeIndex:
+    """
+    Per-student retrieval indexes over uploaded text files.
+    Indexes are built lazily from the database, updated by the file
+    routes, and bounded both per student and in the number of students
+    kept in memory.
+    """
+
+    def __init__(
+        self,
+        max_students: int = CODE_INDEX_MAX_STUDENTS,
+        max_chunks: int = CODE_INDEX_MAX_CHUNKS,
+        dim: int = CODE_INDEX_DIM,
+        max_age: float = CODE_INDEX_REFRESH_SECONDS
+    ):
+        self.max_students = max_students
+        self.max_chunks = max_chunks
+        self.dim = dim
+        self.max_age = max_age
+        self._students: "OrderedDict[str, StudentCodeIndex]" = OrderedDict()
+        # student id -> count of file writes, so a load that raced one is not trusted
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def generation(self, student_id: str) -> int:
+        """Write counter to pass back to `load`"""
+        with self._lock:
+            return self._generations.get(student_id, 0)
+
+    def loaded(self, student_id: str) -> bool:
+        """Whether a fresh index for the student is in memory"""
+        with self._lock:
+            index = self._students.get(student_id)
+            return index is not None and time.monotonic() - index.loaded_at <= self.max_age
+
+    def load(self, student_id: str, files: Iterable[Tuple[str, str, str]], generation: int) -> None:
+        """
+        Replace a student's index with `files` of (file id, name, text).
+        If a file was added or removed since `generation` was read, the
+        result is kept but marked stale so the next query reloads it.
+        """
+        index = StudentCodeIndex(self.dim, self.max_chunks)
+        for file_id, file_name, text in files:
+            chunks = chunk_source(text, file_name, file_id)
+            index.add_file(file_id, chunks, embed((c.search_text for c in chunks), self.dim))
+        with self._lock:
+            if self._generations.get(student_id, 0) != generation:
+                index.loaded_at = float("-inf")
+            self._students[student_id] = index
+            self._students.move_to_end(student_id)
+            while len(self._students) > self.max_students:
+                self._students.popitem(last=False)
+
+    def add_file(self, student_id: str, file_id: str, file_name: str, text: str) -> int:
+        """Index a new file if the student's index is in memory; returns chunks added"""
+        chunks = chunk_source(text, file_name, file_id)
+        vectors = embed((c.search_text for c in chunks), self.dim)
+        with self._lock:
+            self._bump(student_id)
+            index = self._students.get(student_id)
+            if index is None:
+                # Picked up from the database when the index is next built
+                return 0
+            index.add_file(file_id, chunks, vectors)
+            return len(chunks)
+
+    def remove_file(self, student_id: str, file_id: str) -> None:
+        """Forget a deleted file"""
+        with self._lock:
+            self._bump(student_id)
+            index = self._students.get(student_id)
+            if index is not None:
+                index.remove_file(file_id)
+
+    def search(self, student_id: str, query: str, k: int, min_score: float = 0.1) -> List[Tuple[CodeChunk, float]]:
+        """Top `k` chunks of the student's files for `query`"""
+        vector = embed([query], self.dim)[0]
+        with self._lock:
+            index = self._students.get(student_id)
+            if index is None:
+                return []
+            self._students.move_to_end(student_id)
+            return index.search(vector, k, min_score)
+
+    def _bump(self, student_id: str) -> None:
+        if len(self._generations) >= 8 * self.max_students:
+            # Forgetting counters only makes in-flight loads look stale, never fresh
+            self._generations.clear()
+        self._generations[student_id] = self._generations.get(student_id, 0) + 1
+
+    def clear(self) -> None:
+        """Drop every student's index"""
+        with self._lock:
+            self._students.clear()
+            self._generations.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "students": len(self._students),
+                "chunks": sum(len(index.chunks) for index in self._students.values()),
+                "bytes": sum(index.nbytes for index in self._students.values()),
+            }
@@ -0,0 +1,85 @@
+import threading
+import time
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set
+
+class TagIndex:
+    """
+    In-memory inverted index from tag to resource ids.
+    Kept current by the admin resource routes and rebuilt from the
+    database when empty or older than `max_age` seconds, so workers that
+    did not see a write converge on the next refresh.
+    """
+
+    def __init__(self, max_age: float = 300):
+        self.max_age = max_age
+        self._postings: Dict[str, Set[str]] = {}
+        self._tags: Dict[str, FrozenSet[str]] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def stale(self) -> bool:
+        """Whether the index should be rebuilt from the database"""
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.max_age
+
+    def load(self, rows: Iterable[dict]) -> None:
+        """Replace the index with `rows` of `{"id", "tags"}`"""
+        postings: Dict[str, Set[str]] = {}
+        tags: Dict[str, FrozenSet[str]] = {}
+        for row in rows:
+            resource_tags = frozenset(row.get("tags") or [])
+            tags[row["id"]] = resource_tags
+            for tag in resource_tags:
+                postings.setdefault(tag, set()).add(row["id"])
+        with self._lock:
+            self._postings = postings
+            self._tags = tags
+            self._loaded_at = time.monotonic()
+
+    def clear(self) -> None:
+        """Empty the index and force a rebuild on next use"""
+        with self._lock:
+            self._postings = {}
+            self._tags = {}
+            self._loaded_at = None
+
+    def add(self, resource_id: str, tags: Iterable[str]) -> None:
+        """Index a new resource or replace the tags of an existing one"""
+        new_tags = frozenset(tags or [])
+        with self._lock:
+            old_tags = self._tags.get(resource_id, frozenset())
+            for tag in old_tags - new_tags:
+                self._discard(tag, resource_id)
+            for tag in new_tags - old_tags:
+                self._postings.setdefault(tag, set()).add(resource_id)
+            self._tags[resource_id] = new_tags
+
+    def remove(self, resource_id: str) -> None:
+        """Drop a resource from the index"""
+        with self._lock:
+            for tag in self._tags.pop(resource_id, frozenset()):
+                self._discard(tag, resource_id)
+
+    def search(self, tags: List[str], match_all: bool = False) -> Set[str]:
+        """Resource ids carrying any (or, with `match_all`, every) tag in `tags`"""
+        with self._lock:
+            postings = [self._postings.get(tag, set()) for tag in set(tags)]
+            if not postings:
+                return set()
+            if match_all:
+                # Intersect smallest-first so the work is bounded by the rarest tag
+                postings.sort(key=len)
+                result = set(postings[0])
+                for ids in postings[1:]:
+                    result &= ids
+                    if not result:
+                        break
+                return result
+            return set().union(*postings)
+
+    def _discard(self, tag: str, resource_id: str) -> None:
+        ids = self._postings.get(tag)
+        if ids is not None:
+            ids.discard(resource_id)
+            if not ids:
+                del self._postings[tag]
@@ -1,13 +1,19 @@
 import pytest
 from fastapi.testclient import TestClient
 from backend.main import app
-from backend.auth.utils import create_access_token
+from backend.auth.utils import create_access_token, clear_student_cache
+from backend.routes.resources import resource_catalog, tag_index, text_index
+from backend.routes.chat import question_owners
+from backend.ai.cache import answer_cache
+from backend.ai.context import code_index
 import os
 from unittest.mock import MagicMock
-from backend.db.supabase_client import get_supabase
 from datetime import datetime, timedelta, UTC
 from typing import Dict, Any, List
 import uuid
+import httpx
+from types import SimpleNamespace
+from urllib.parse import unquote
 
 # Ensure we're using test environment variables
 os.environ["TESTING"] = "1"
@@ -15,26 +21,130 @@ os.environ["SUPABASE_URL"] = "https://test.supabase.co"
 os.environ["SUPABASE_KEY"] = "test-key"
 os.environ["JWT_SECRET_KEY"] = "test-secret-key"
 
+def _split_filters(filters: str) -> List[str]:
+    """Split a PostgREST or=/and= filter list on top-level commas"""
+    parts, depth, current, quoted = [], 0, "", False
+    for char in filters:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and char == "," and depth == 0:
+            parts.append(current)
+            current = ""
+            continue
+        current += char
+    parts.append(current)
+    return parts
+
+def _matches_filter(item: Dict[str, Any], expression: str) -> bool:
+    """Evaluate a single PostgREST logical filter expression against a row"""
+    if expression.startswith("and("):
+        return all(_matches_filter(item, part) for part in _split_filters(expression[4:-1]))
+    if expression.startswith("or("):
+        return any(_matches_filter(item, part) for part in _split_filters(expression[3:-1]))
+    field, op, value = expression.split(".", 2)
+    value = value.strip('"')
+    current = str(item.get(field, ""))
+    return {
+        "eq": current == value,
+        "lt": current < value,
+        "lte": current <= value,
+        "gt": current > value,
+        "gte": current >= value,
+    }[op]
+
 class MockSupabaseQuery:
-    def __init__(self, data: List[Dict[str, Any]], table: 'MockSupabaseTable'):
+    def __init__(
+        self,
+        data: List[Dict[str, Any]],
+        table: 'MockSupabaseTable',
+        action: str = "select",
+        value: Dict[str, Any] = None,
+        columns: str = "*",
+        path: str = None
+    ):
         self.data = data
         self.table = table
+        self.action = action
+        self.value = value
+        self.columns = columns
         self.conditions = []
         self.order_conditions = []
+        self.limit_count = None
+        self.path = path if path is not None else getattr(table, "name", None)
+    
+    @property
+    def request(self):
+        """What repository.execute reads to label DB metrics"""
+        method = {"select": "GET", "insert": "POST", "rpc": "POST", "update": "PATCH", "delete": "DELETE"}[self.action]
+        params = [("select", self.columns)] if self.action == "select" else []
+        for op, field, value in self.conditions:
+            if op == "or":
+                params.append(("or", f"({field})"))
+            elif op == "in":
+                params.append((field, f"in.({','.join(map(str, value))})"))
+            else:
+                params.append((field, f"{op}.{value}"))
+        if self.order_conditions:
+            params.append(("order", ",".join(f"{f}.{'desc' if desc else 'asc'}" for f, desc in self.order_conditions)))
+        if self.limit_count is not None:
+            params.append(("limit", str(self.limit_count)))
+        return SimpleNamespace(
+            path=f"https://test.supabase.co/rest/v1/{self.path}",
+            http_method=method,
+            params=httpx.QueryParams(params)
+        )
     
     def eq(self, field: str, value: Any):
         self.conditions.append(("eq", field, value))
         return self
     
+    def neq(self, field: str, value: Any):
+        self.conditions.append(("neq", field, value))
+        return self
+    
+    def in_(self, field: str, values: List[Any]):
+        self.conditions.append(("in", field, list(values)))
+        return self
+    
+    def or_(self, filters: str):
+        self.conditions.append(("or", filters, None))
+        return self
+    
     def order(self, field: str, desc: bool = False):
         self.order_conditions.append((field, desc))
         return self
     
+    def limit(self, count: int):
+        self.limit_count = count
+        return self
+    
     def execute(self):
         filtered_data = self.data.copy()
         for op, field, value in self.conditions:
             if op == "eq":
                 filtered_data = [item for item in filtered_data if item.get(field) == value]
+            elif op == "neq":
+                filtered_data = [item for item in filtered_data if item.get(field) != value]
+            elif op == "in":
+                filtered_data = [item for item in filtered_data if item.get(field) in value]
+            elif op == "or":
+                filtered_data = [
+                    item for item in filtered_data
+                    if any(_matches_filter(item, part) for part in _split_filters(field))
+                ]
+        
+        if self.action == "update":
+            for item in filtered_data:
+                item.update(self.value)
+        elif self.action == "delete":
+            self.table.data[:] = [
+                item for item in self.table.data
+                if not any(item is match for match in filtered_data)
+            ]
         
         if self.order_conditions:
             for field, desc in reversed(self.order_conditions):
@@ -43,44 +153,148 @@ class MockSupabaseQuery:
                     reverse=desc
                 )
         
+        if self.limit_count is not None:
+            filtered_data = filtered_data[:self.limit_count]
+        
+        if self.columns != "*":
+            names = [name.strip() for name in self.columns.split(",")]
+            filtered_data = [{name: item.get(name) for name in names} for item in filtered_data]
+        
         return MagicMock(data=filtered_data)
 
 class MockSupabaseTable:
-    def __init__(self, initial_data: List[Dict[str, Any]]):
+    def __init__(self, initial_data: List[Dict[str, Any]], name: str = None):
         self.data = initial_data.copy()
+        self.name = name
     
-    def select(self, *args):
-        return MockSupabaseQuery(self.data, self)
+    def select(self, columns: str = "*"):
+        return MockSupabaseQuery(self.data, self, columns=columns)
     
-    def insert(self, value: Dict[str, Any]):
-        new_id = str(uuid.uuid4())
-        new_record = {**value, "id": new_id}
-        self.data.append(new_record)
-        return MockSupabaseQuery([new_record], self)
+    def insert(self, value):
+        values = value if isinstance(value, list) else [value]
+        new_records = [{**item, "id": str(uuid.uuid4())} for item in values]
+        self.data.extend(new_records)
+        return MockSupabaseQuery(new_records, self, action="insert")
     
     def update(self, value: Dict[str, Any]):
-        return MockSupabaseQuery(self.data, self)
+        return MockSupabaseQuery(self.data, self, action="update", value=value)
     
     def delete(self):
-        return MockSupabaseQuery([], self)
+        return MockSupabaseQuery(self.data, self, action="delete")
 
 class MockStorage:
+    def __init__(self):
+        self.objects: Dict[str, bytes] = {}
+        # Set to False to act like a proxy that drops Range and answers 200
+        self.honor_ranges = True
+    
     def from_(self, bucket: str):
         return self
     
-    def upload(self, path: str, data: bytes):
+    def upload(self, path: str, data: bytes, file_options: Dict[str, Any] = None):
+        if isinstance(data, str):
+            with open(data, "rb") as f:
+                data = f.read()
+        self.objects[path] = data
         return {"Key": path}
     
     def download(self, path: str):
-        return b"test content"
+        return self.objects.get(path, b"test content")
+    
+    def http_transport(self) -> httpx.MockTransport:
+        """Storage REST stand-in for streaming downloads"""
+        def handle(request: httpx.Request) -> httpx.Response:
+            path = unquote(request.url.path).split("/object/", 1)[1].split("/", 1)[1]
+            if path not in self.objects:
+                return httpx.Response(404, json={"error": "not_found"})
+            data = self.objects[path]
+            range_header = request.headers.get("range")
+            if range_header and self.honor_ranges:
+                start, end = (int(x) for x in range_header[len("bytes="):].split("-"))
+                return httpx.Response(206, content=data[start:end + 1])
+            return httpx.Response(200, content=data)
+        return httpx.MockTransport(handle)
     
     def remove(self, paths: List[str]):
-        return True
+        for path in paths:
+            self.objects.pop(path, None)
+        return [{"name": path} for path in paths]
+
+class MockRpc:
+    """Stand-ins for the SQL functions documented in the README"""
+    def __init__(self, tables: Dict[str, MockSupabaseTable]):
+        self.tables = tables
+    
+    def __call__(self, function: str, params: Dict[str, Any]):
+        return MockSupabaseQuery(getattr(self, function)(**params), None, action="rpc", path=f"rpc/{function}")
+    
+    def create_questions(self, p_student_id: str, p_questions: List[Dict[str, Any]]):
+        created = []
+        for question in p_questions:
+            now = datetime.now(UTC).isoformat()
+            row = self.tables["questions"].insert({
+                "student_id": p_student_id,
+                "question_text": question["question_text"],
+                "code_context": question.get("code_context"),
+                "resolved": False,
+                "created_at": now
+            }).data[0]
+            self.tables["conversations"].insert({
+                "student_id": p_student_id,
+                "question_id": row["id"],
+                "message_type": "student",
+                "message_text": question["question_text"],
+                "created_at": now
+            })
+            created.append(row)
+        return created
+    
+    def _blob_rows(self) -> Dict[str, Dict[str, Any]]:
+        return {row["storage_path"]: row for row in self.tables["blobs"].data}
+    
+    def claim_blobs(self, p_paths: List[str], p_stale_seconds: int):
+        blobs = self._blob_rows()
+        for path in p_paths:
+            if path not in blobs:
+                blobs[path] = self.tables["blobs"].insert({"storage_path": path, "state": "uploading"}).data[0]
+        return [{"storage_path": path, "state": blobs[path]["state"]} for path in p_paths]
+    
+    def mark_blobs_ready(self, p_paths: List[str]):
+        blobs = self._blob_rows()
+        for path in p_paths:
+            if path in blobs:
+                blobs[path]["state"] = "ready"
+            else:
+                self.tables["blobs"].insert({"storage_path": path, "state": "ready"})
+        return []
+    
+    def begin_blob_release(self, p_paths: List[str]):
+        referenced = {row["storage_path"] for row in self.tables["files"].data}
+        released = []
+        for path, row in self._blob_rows().items():
+            if path in p_paths and row["state"] == "ready" and path not in referenced:
+                row["state"] = "deleting"
+                released.append({"storage_path": path})
+        return released
+    
+    def finish_blob_release(self, p_paths: List[str]):
+        self.tables["blobs"].data[:] = [
+            row for row in self.tables["blobs"].data
+            if not (row["storage_path"] in p_paths and row["state"] == "deleting")
+        ]
+        return []
 
 @pytest.fixture(autouse=True)
 def mock_supabase(monkeypatch):
     """Mock Supabase client for all tests"""
     mock_client = MagicMock()
+    clear_student_cache()
+    tag_index.clear()
+    text_index.clear()
+    resource_catalog.clear()
+    answer_cache.clear()
+    question_owners.clear()
+    code_index.clear()
     
     # Create mock tables with initial data
     test_student_id = str(uuid.uuid4())
@@ -120,15 +334,27 @@ def mock_supabase(monkeypatch):
             }
         ]),
         "files": MockSupabaseTable([]),
+        "blobs": MockSupabaseTable([]),
         "resources": MockSupabaseTable([]),
         "feedback": MockSupabaseTable([])
     }
     
+    for name, mock_table in tables.items():
+        mock_table.name = name
+    
     def get_table(name: str):
-        return tables.get(name, MockSupabaseTable([]))
+        return tables.get(name, MockSupabaseTable([], name))
     
     mock_client.table = get_table
+    mock_client.rpc = MockRpc(tables)
     mock_client.storage = MockStorage()
+    monkeypatch.setattr(
+        "backend.db.storage.get_storage_http",
+        lambda: httpx.AsyncClient(
+            base_url="https://test.supabase.co/storage/v1",
+            transport=mock_client.storage.http_transport()
+        )
+    )
     
     def mock_get_supabase():
         return mock_client
@@ -154,11 +380,10 @@ def test_student():
     }
 
 @pytest.fixture
-def student_token(test_student):
+def student_token(test_student, mock_supabase):
     """Create a valid student token"""
     # First create the student in the database
-    supabase = get_supabase()
-    result = supabase.table("students").insert(test_student).execute()
+    result = mock_supabase.table("students").insert(test_student).execute()
     student_id = result.data[0]["id"]
     
     # Create access token
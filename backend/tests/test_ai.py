@@ -0,0 +1,306 @@
+import json
+import asyncio
+import threading
+import time
+import uuid
+import pytest
+from backend.ai.answers import answer_jobs
+from backend.ai.jobs import AnswerJob, AnswerJobQueue, JobStatus, QueueFull
+from backend.ai.cache import answer_cache, answer_cache_key, normalize_code
+from backend.ai.engine import AnswerRequest, LocalTutorEngine
+
+def parse_events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+def create_question(test_client, headers, text="How do I use a for loop?", code=None):
+    response = test_client.post("/chat/questions", json={"question_text": text, "code_context": code}, headers=headers)
+    assert response.status_code == 200
+    return response.json()["id"]
+
+def test_local_engine_is_deterministic():
+    """The stand-in model gives the same answer for the same question"""
+    engine = LocalTutorEngine()
+    request = AnswerRequest("How do I write a recursive function?", "def f(n):\n    return f(n - 1)")
+    first = asyncio.run(engine.generate(request))
+    assert first == asyncio.run(engine.generate(request))
+    assert "base case" in first
+    hint = asyncio.run(engine.generate(AnswerRequest("recursion?", is_hint=True)))
+    assert hint.startswith("Hint:")
+
+def test_answer_streams_over_sse(test_client, student_token, mock_supabase):
+    """Tokens stream as events and the finished answer joins the conversation"""
+    headers = {"Authorization": f"Bearer {student_token}"}
+    question_id = create_question(test_client, headers)
+    
+    with test_client.stream("GET", f"/chat/questions/{question_id}/answer/stream", headers=headers) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = parse_events(response.read().decode())
+    
+    kinds = [kind for kind, _ in events]
+    assert kinds[0] == "start"
+    assert kinds[-1] == "done"
+    tokens = "".join(data["text"] for kind, data in events if kind == "token")
+    done = events[-1][1]
+    assert done["response_text"] == tokens
+    assert "for loop" in tokens
+    
+    messages = test_client.get(f"/chat/conversations/{question_id}", headers=headers).json()
+    assert [m["message_type"] for m in messages] == ["student", "ai"]
+    assert messages[-1]["id"] == done["id"]
+
+def test_answer_stream_reconnect_does_not_duplicate(test_client, student_token):
+    """A reconnect carrying the finished answer's event id gets 204, not another answer"""
+    headers = {"Authorization": f"Bearer {student_token}"}
+    question_id = create_question(test_client, headers)
+    url = f"/chat/questions/{question_id}/answer/stream"
+    
+    response = test_client.get(url, headers=headers)
+    done_id = parse_events(response.text)[-1][1]["id"]
+    assert f"id: {done_id}\nevent: done" in response.text
+    
+    response = test_client.get(url, headers={**headers, "Last-Event-ID": done_id})
+    assert response.status_code == 204
+    messages = test_client.get(f"/chat/conversations/{question_id}", headers=headers).json()
+    assert [m["message_type"] for m in messages] == ["student", "ai"]
+    
+    # A UUID that isn't this question's answer is ignored
+    response = test_client.get(url, headers={**headers, "Last-Event-ID": str(uuid.uuid4())})
+    assert parse_events(response.text)[-1][0] == "done"
+
+def test_answer_stream_ignores_junk_last_event_id(test_client, student_token, mock_supabase, monkeypatch):
+    """A Last-Event-ID that isn't a UUID never reaches the uuid id filter"""
+    headers = {"Authorization": f"Bearer {student_token}"}
+    question_id = create_question(test_client, headers)
+    query_class = type(mock_supabase.table("conversations").select("id"))
+    original_eq = query_class.eq
+    
+    def strict_eq(self, field, value):
+        # PostgREST rejects a malformed uuid in the filter
+        if self.path == "conversations" and field == "id":
+            uuid.UUID(value)
+        return original_eq(self, field, value)
+    
+    monkeypatch.setattr(query_class, "eq", strict_eq)
+    for junk in ["unknown", "42", "1:abc"]:
+        response = test_client.get(
+            f"/chat/questions/{question_id}/answer/stream",
+            headers={**headers, "Last-Event-ID": junk}
+        )
+        assert response.status_code == 200
+        assert parse_events(response.text)[-1][0] == "done"
+
+def test_answer_stream_requires_ownership(test_client, student_token):
+    """Students can't stream answers to questions that aren't theirs"""
+    headers = {"Authorization": f"Bearer {student_token}"}
+    response = test_client.get("/chat/questions/unknown/answer/stream", headers=headers)
+    assert response.status_code == 404
+
+def test_code_normalization_ignores_naming_and_comments():
+    """Equivalent snippets share a cache key"""
+    first = AnswerRequest("How do I use a for loop?", "# sum a list\nnums = [1, 2]\nfor x in nums:\n    total += x")
+    second = AnswerRequest("how do i use a  for loop ?", "values = [1, 2]\nfor item in values:   # add\n\n    acc += item")
+    other = AnswerRequest("How do I use a for loop?", "nums = [1, 2]\nwhile x in nums:\n    total += x")
+    assert answer_cache_key(first, "local") == answer_cache_key(second, "local")
+    assert answer_cache_key(first, "local") != answer_cache_key(other, "local")
+    assert answer_cache_key(first, "local") != answer_cache_key(first, "other-model")
+
+def test_question_normalization_keeps_operators():
+    """Questions differing only in an operator or bracket don't share an answer"""
+    keys = {
+        answer_cache_key(AnswerRequest(text), "local")
+        for text in ["Why does a+b fail?", "why does a*b fail", "Why does a-b fail?", "why does f(a) fail", "why does f[a] fail"]
+    }
+    assert len(keys) == 5
+    assert answer_cache_key(AnswerRequest("Why does  a+b fail?!"), "local") == answer_cache_key(AnswerRequest("why does a+b fail"), "local")
+    assert normalize_code("int x = 1; /* c */ // d") == normalize_code("int y = 1;")
+
+def test_code_normalization_keeps_outside_names():
+    """Only names the snippet binds are renamed; attributes, imports and free names are kept"""
+    assert normalize_code("nums.sort()") != normalize_code("nums.reverse()")
+    assert normalize_code("import math\nmath.sqrt(x)") != normalize_code("import math\nmath.floor(x)")
+    assert normalize_code("from math import sqrt\nsqrt(2)") != normalize_code("from math import floor\nfloor(2)")
+    assert normalize_code("print(nums)") != normalize_code("print(values)")
+    assert normalize_code("def f(a):\n    return g(key=a)") == normalize_code("def h(b):\n    return g(key=b)")
+    assert normalize_code("def f(a):\n    return g(key=a)") != normalize_code("def f(a):\n    return g(other=a)")
+    assert normalize_code("let n = list.length; n++") == normalize_code("let m = list.length; m++")
+    assert normalize_code("items.push(x);") != normalize_code("items.pop(x);")
+
+def test_repeated_questions_hit_answer_cache(test_client, student_token):
+    """The second equivalent question is answered from the cache and still stored"""
+    headers = {"Authorization": f"Bearer {student_token}"}
+    hits = answer_cache.stats()["hits"]
+    answers = []
+    for text, code in [("How do I use a for loop?", "for i in range(3):  pass"),
+                       ("how do I use a for loop", "# loop\nfor j in range(3): pass")]:
+        question_id = create_question(test_client, headers, text, code)
+        response = test_client.get(f"/chat/questions/{question_id}/answer/stream", headers=headers)
+        done = parse_events(response.text)[-1][1]
+        answers.append(done)
+        messages = test_client.get(f"/chat/conversations/{question_id}", headers=headers).json()
+        assert messages[-1]["message_type"] == "ai"
+    
+    assert [a["cached"] for a in answers] == [False, True]
+    assert answers[0]["response_text"] == answers[1]["response_text"]
+    assert answer_cache.stats()["hits"] == hits + 1
+    assert f'cache_hits_total{{cache="answer"}} {hits + 1}' in test_client.get("/metrics").text
+
+def wait_for(test_client, url, headers, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = test_client.get(url, headers=headers).json()
+        if job["status"] in ("completed", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+def test_answer_job_runs_in_background(test_client, student_token):
+    """Queued answers complete independently of the request and can be polled"""
+    headers = {"Authorization": f"Bearer {student_token}"}
+    question_id = create_question(test_client, headers, "Why does my while loop never stop?")
+    url = f"/chat/questions/{question_id}/answer"
+    
+    response = test_client.post(url, params={"hint": True}, headers=headers)
+    assert response.status_code == 202
+    assert response.json()["is_hint"] is True
+    
+    job = wait_for(test_client, url, headers)
+    assert job["status"] == "completed"
+    messages = test_client.get(f"/chat/conversations/{question_id}", headers=headers).json()
+    assert messages[-1]["id"] == job["message_id"]
+    assert messages[-1]["message_text"].startswith("Hint:")
+
+def test_job_queue_priorities_and_backpressure():
+    """Hints run before full answers and a full queue rejects new jobs"""
+    order = []
+    
+    async def runner(job):
+        order.append(job.question_id)
+        return "message"
+    
+    jobs = AnswerJobQueue(runner, workers=1, max_pending=3)
+    # Hold the only worker until everything is queued
+    gate = threading.Event()
+    blocker = AnswerJob("blocker", "s", AnswerRequest("q"))
+    
+    async def blocking_runner(job):
+        if job.question_id == "blocker":
+            await asyncio.get_running_loop().run_in_executor(None, gate.wait)
+        return await runner(job)
+    
+    jobs.runner = blocking_runner
+    jobs.submit(blocker)
+    while jobs.pending:
+        time.sleep(0.001)
+    
+    jobs.submit(AnswerJob("answer", "s", AnswerRequest("q")))
+    jobs.submit(AnswerJob("hint", "s", AnswerRequest("q", is_hint=True)))
+    assert jobs.submit(AnswerJob("hint", "s", AnswerRequest("q", is_hint=True))).question_id == "hint"
+    jobs.submit(AnswerJob("answer-2", "s", AnswerRequest("q")))
+    with pytest.raises(QueueFull):
+        jobs.submit(AnswerJob("overflow", "s", AnswerRequest("q")))
+    
+    gate.set()
+    jobs.shutdown()
+    assert order == ["blocker", "hint", "answer", "answer-2"]
+    assert jobs.get("answer").status == JobStatus.COMPLETED
+
+def test_saturated_queue_returns_429(test_client, student_token, monkeypatch):
+    """Clients are told to back off when the queue is full"""
+    headers = {"Authorization": f"Bearer {student_token}"}
+    question_id = create_question(test_client, headers)
+    monkeypatch.setattr(answer_jobs, "max_pending", 0)
+    response = test_client.post(f"/chat/questions/{question_id}/answer", headers=headers)
+    assert response.status_code == 429
+    assert response.headers["retry-after"]
+
+def test_answers_pull_in_related_uploaded_code(test_client, student_token):
+    """Chunks of the student's own files are retrieved for their questions"""
+    headers = {"Authorization": f"Bearer {student_token}"}
+    source = (
+        b"def bubble_sort(items):\n"
+        b"    for i in range(len(items)):\n"
+        b"        for j in range(len(items) - i - 1):\n"
+        b"            if items[j] > items[j + 1]:\n"
+        b"                items[j], items[j + 1] = items[j + 1], items[j]\n"
+        b"\n"
+        b"def greet(name):\n"
+        b"    return 'Hello ' + name\n"
+    )
+    response = test_client.post("/files/upload", files={"file": ("sorting.py", source, "text/x-python")}, headers=headers)
+    file_id = response.json()["id"]
+    
+    def answer(text):
+        question_id = create_question(test_client, headers, text)
+        response = test_client.get(f"/chat/questions/{question_id}/answer/stream", headers=headers)
+        return parse_events(response.text)[-1][1]["response_text"]
+    
+    # Built from the database on first use, then updated in place
+    assert "`bubble_sort` (sorting.py, lines 1-5)" in answer("Why is my bubble sort swapping items wrong?")
+    assert "`greet`" not in answer("Why is my bubble sort swapping items wrong?")
+    
+    test_client.delete(f"/files/{file_id}", headers=headers)
+    assert "sorting.py" not in answer("Why is my bubble sort swapping items wrong?")
+
+def test_code_retrieval_never_delays_start(monkeypatch, mock_supabase):
+    """The index is built after `start` is sent, and a slow build is cut off"""
+    from backend.ai import answers, context
+    builds = []
+    
+    async def slow_build(student_id):
+        builds.append(student_id)
+        await asyncio.sleep(5)
+    
+    monkeypatch.setattr(context, "load_student_index", slow_build)
+    monkeypatch.setattr(context, "CODE_CONTEXT_TIMEOUT_SECONDS", 0.01)
+    
+    async def run():
+        events = answers.answer_events("student-1", "question-1", AnswerRequest("How do I use a for loop?"))
+        first = await events.__anext__()
+        assert builds == []
+        return [first] + [event async for event in events]
+    
+    events = parse_events("".join(asyncio.run(run())))
+    assert builds == ["student-1"]
+    assert events[0][0] == "start"
+    assert events[-1][0] == "done"
+    assert "uploaded files" not in events[-1][1]["response_text"]
+
+def test_code_retrieval_after_job_timeout_uses_own_loop(monkeypatch, mock_supabase):
+    """A build left pending on a job worker's loop doesn't break retrieval on the server loop"""
+    from backend.ai import context
+    student_id = "student-loops"
+    
+    async def build(student_id):
+        # The job worker's build outlives its timeout; the server loop's finishes
+        if threading.current_thread() is not threading.main_thread():
+            await asyncio.sleep(5)
+        generation = context.code_index.generation(student_id)
+        context.code_index.load(student_id, [("file-1", "sort.py", "def bubble_sort(items):\n    return sorted(items)\n")], generation)
+    
+    monkeypatch.setattr(context, "load_student_index", build)
+    monkeypatch.setattr(context, "CODE_CONTEXT_TIMEOUT_SECONDS", 0.05)
+    worker_loop = asyncio.new_event_loop()
+    results = []
+    
+    def job():
+        results.append(worker_loop.run_until_complete(context.related_code(student_id, "bubble sort")))
+    
+    worker = threading.Thread(target=job)
+    worker.start()
+    worker.join()
+    assert results == [[]]
+    
+    chunks = asyncio.run(context.related_code(student_id, "bubble sort"))
+    assert [chunk.file_id for chunk in chunks] == ["file-1"]
+    
+    pending = asyncio.all_tasks(worker_loop)
+    for task in pending:
+        task.cancel()
+    worker_loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+    worker_loop.close()
+    assert not context._builds
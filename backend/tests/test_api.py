@@ -1,8 +1,11 @@
+import base64
+import hashlib
 import pytest
 from fastapi.testclient import TestClient
 from backend.main import app
 from backend.auth.utils import create_access_token
 import uuid
+from datetime import datetime
 
 # Test data
 test_user = {
@@ -436,4 +439,440 @@ def test_resource_access_control(test_client, admin_token, user_token):
     
     # Clean up
     response = test_client.delete(f"/resources/{resource_id}", headers=admin_headers)
-    assert response.status_code == 200 
\ No newline at end of file
+    assert response.status_code == 200 
+
+def test_keyset_pagination(test_client, student_token, mock_supabase):
+    """Question listings are paged by an opaque (created_at, id) cursor"""
+    headers = {"Authorization": f"Bearer {student_token}"}
+    student_id = mock_supabase.table("students").data[-1]["id"]
+    # Two questions share a timestamp to exercise the id tie-breaker
+    for i, created_at in enumerate(["2024-01-01T00:00:00", "2024-01-02T00:00:00",
+                                    "2024-01-02T00:00:00", "2024-01-03T00:00:00",
+                                    "2024-01-04T00:00:00"]):
+        mock_supabase.table("questions").insert({
+            "student_id": student_id,
+            "question_text": f"Question {i}",
+            "code_context": None,
+            "resolved": False,
+            "created_at": created_at
+        })
+    
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = test_client.get("/chat/questions", params=params, headers=headers)
+        assert response.status_code == 200
+        assert len(response.json()) <= 2
+        seen.extend(q["id"] for q in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    
+    assert len(seen) == len(set(seen)) == 5
+    
+    # Well-formed JSON that isn't a (timestamp, id) pair must not reach the filter
+    for payload in [b'["2024-01-01T00:00:00\\",id.neq.x","00000000-0000-0000-0000-000000000000"]',
+                    b'["2024-01-01T00:00:00","x\\"),or(id.neq.y"]',
+                    b'[1, 2]']:
+        cursor = base64.urlsafe_b64encode(payload).decode().rstrip("=")
+        response = test_client.get("/chat/questions", params={"cursor": cursor}, headers=headers)
+        assert response.status_code == 400
+    response = test_client.get("/chat/questions", params={"cursor": "not-a-cursor"}, headers=headers)
+    assert response.status_code == 400
+
+def test_upload_is_streamed_and_hashed(test_client, student_token, monkeypatch):
+    """Uploads record size and SHA-256 and respect the size limit"""
+    headers = {"Authorization": f"Bearer {student_token}"}
+    content = b"x" * 5000
+    response = test_client.post("/files/upload", files={"file": ("big.txt", content, "text/plain")}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["size"] == len(content)
+    assert response.json()["content_hash"] == hashlib.sha256(content).hexdigest()
+    
+    monkeypatch.setattr("backend.db.storage.MAX_UPLOAD_BYTES", 1000)
+    monkeypatch.setattr("backend.db.storage.UPLOAD_CHUNK_SIZE", 256)
+    response = test_client.post("/files/upload", files={"file": ("big.txt", content, "text/plain")}, headers=headers)
+    assert response.status_code == 413
+
+def test_raw_download_supports_ranges_and_etags(test_client, student_token):
+    """Raw downloads stream bytes with Range and conditional GET support"""
+    headers = {"Authorization": f"Bearer {student_token}"}
+    content = bytes(range(256)) * 4
+    response = test_client.post("/files/upload", files={"file": ("data.bin", content, "application/octet-stream")}, headers=headers)
+    file_id = response.json()["id"]
+    
+    response = test_client.get(f"/files/{file_id}", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["size"] == len(content)
+    
+    response = test_client.get(f"/files/{file_id}/raw", headers=headers)
+    assert response.status_code == 200
+    assert response.content == content
+    assert response.headers["content-type"] == "application/octet-stream"
+    etag = response.headers["etag"]
+    
+    response = test_client.get(f"/files/{file_id}/raw", headers={**headers, "Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.content == content[10:20]
+    assert response.headers["content-range"] == f"bytes 10-19/{len(content)}"
+    
+    response = test_client.get(f"/files/{file_id}/raw", headers={**headers, "Range": "bytes=-4"})
+    assert response.content == content[-4:]
+    
+    response = test_client.get(f"/files/{file_id}/raw", headers={**headers, "Range": "bytes=5000-"})
+    assert response.status_code == 416
+    
+    response = test_client.get(f"/files/{file_id}/raw", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+def test_raw_download_falls_back_when_storage_ignores_range(test_client, student_token, mock_supabase):
+    """An upstream 200 to a ranged request is passed on as a full 200, not a mislabeled 206"""
+    headers = {"Authorization": f"Bearer {student_token}"}
+    content = bytes(range(256)) * 4
+    response = test_client.post("/files/upload", files={"file": ("data.bin", content, "application/octet-stream")}, headers=headers)
+    file_id = response.json()["id"]
+    mock_supabase.storage.honor_ranges = False
+    
+    response = test_client.get(f"/files/{file_id}/raw", headers={**headers, "Range": "bytes=10-19"})
+    assert response.status_code == 200
+    assert response.content == content
+    assert response.headers["content-length"] == str(len(content))
+    assert "content-range" not in response.headers
+
+def test_uploads_are_deduplicated(test_client, student_token, mock_supabase, monkeypatch):
+    """Identical content is stored once and removed with its last reference"""
+    other = mock_supabase.table("students").insert({"email": "other@example.com", "name": "Other"}).execute().data[0]
+    other_token = create_access_token({"sub": other["id"], "role": "student"})
+    storage = mock_supabase.storage
+    uploads = []
+    original_upload = storage.upload
+    
+    def counting_upload(path, data, file_options=None):
+        uploads.append(path)
+        return original_upload(path, data, file_options)
+    
+    monkeypatch.setattr(storage, "upload", counting_upload)
+    
+    content = b"starter code for assignment 1"
+    file_ids = []
+    for token in (student_token, other_token, student_token):
+        headers = {"Authorization": f"Bearer {token}"}
+        response = test_client.post("/files/upload", files={"file": ("starter.py", content, "text/plain")}, headers=headers)
+        assert response.status_code == 200
+        file_ids.append((headers, response.json()["id"]))
+    
+    assert len(uploads) == 1
+    assert len(storage.objects) == 1
+    
+    for i, (headers, file_id) in enumerate(file_ids):
+        assert test_client.get(f"/files/{file_id}/raw", headers=headers).content == content
+        response = test_client.delete(f"/files/{file_id}", headers=headers)
+        assert response.status_code == 200
+        assert len(storage.objects) == (0 if i == len(file_ids) - 1 else 1)
+
+def test_uploads_wait_for_blobs_to_be_ready(test_client, student_token, mock_supabase, monkeypatch):
+    """A blob counts as stored only once an upload finished; releases in progress are waited out"""
+    import hashlib
+    from backend.db import blobs
+    headers = {"Authorization": f"Bearer {student_token}"}
+    storage = mock_supabase.storage
+    content = b"print('shared starter')"
+    path = blobs.blob_path(hashlib.sha256(content).hexdigest())
+    
+    # Another student's upload of the same bytes is still in flight
+    mock_supabase.table("files").insert({"student_id": "someone-else", "storage_path": path})
+    mock_supabase.table("blobs").insert({"storage_path": path, "state": "uploading"})
+    response = test_client.post("/files/upload", files={"file": ("a.py", content, "text/plain")}, headers=headers)
+    assert response.status_code == 200
+    file_id = response.json()["id"]
+    assert test_client.get(f"/files/{file_id}/raw", headers=headers).content == content
+    assert mock_supabase.table("blobs").data[0]["state"] == "ready"
+    
+    # A release is removing the blob: the upload waits for it, then sends the bytes again
+    mock_supabase.table("blobs").data[0]["state"] = "deleting"
+    storage.objects.clear()
+    claims = []
+    original_claim = mock_supabase.rpc.claim_blobs
+    
+    def claim_while_release_finishes(p_paths, p_stale_seconds):
+        claims.append(p_paths)
+        states = original_claim(p_paths, p_stale_seconds)
+        mock_supabase.rpc.finish_blob_release(p_paths)
+        return states
+    
+    monkeypatch.setattr(mock_supabase.rpc, "claim_blobs", claim_while_release_finishes)
+    monkeypatch.setattr(blobs, "BLOB_CLAIM_RETRY_SECONDS", 0)
+    response = test_client.post("/files/upload", files={"file": ("b.py", content, "text/plain")}, headers=headers)
+    assert response.status_code == 200
+    assert len(claims) == 2
+    assert storage.objects[path] == content
+    assert [row["state"] for row in mock_supabase.table("blobs").data] == ["ready"]
+
+def test_question_creation_is_single_round_trip(test_client, student_token, mock_supabase):
+    """Questions and their opening message are written by one RPC call"""
+    headers = {"Authorization": f"Bearer {student_token}"}
+    response = test_client.post("/chat/questions", json={"question_text": "What is recursion?"}, headers=headers)
+    assert response.status_code == 200
+    question = response.json()
+    assert question["question_text"] == "What is recursion?"
+    
+    messages = test_client.get(f"/chat/conversations/{question['id']}", headers=headers).json()
+    assert [m["message_text"] for m in messages] == ["What is recursion?"]
+    
+    batch = [{"question_text": f"Offline question {i}"} for i in range(3)]
+    response = test_client.post("/chat/questions/bulk", json=batch, headers=headers)
+    assert response.status_code == 200
+    assert [q["question_text"] for q in response.json()] == [q["question_text"] for q in batch]
+    assert len(mock_supabase.table("conversations").data) == 5
+
+def test_resource_catalog_cache_and_conditional_get(test_client, admin_token, student_token, mock_supabase, monkeypatch):
+    """Catalog reads are cached, revalidated with ETags and invalidated by writes"""
+    admin_headers = {"Authorization": f"Bearer {admin_token}"}
+    user_headers = {"Authorization": f"Bearer {student_token}"}
+    resource = {"title": "Loops", "description": "d", "content": "c", "file_type": "text", "tags": ["python"]}
+    resource_id = test_client.post("/resources", json=resource, headers=admin_headers).json()["id"]
+    
+    resources = mock_supabase.table("resources")
+    selects = []
+    original_select = resources.select
+    monkeypatch.setattr(resources, "select", lambda *args: selects.append(args) or original_select(*args))
+    
+    response = test_client.get("/resources", headers=user_headers)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert response.headers["last-modified"]
+    
+    response = test_client.get("/resources", headers={**user_headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert len(selects) == 1
+    
+    response = test_client.get(f"/resources/{resource_id}", headers=user_headers)
+    assert response.status_code == 200
+    assert len(selects) == 1
+    last_modified = response.headers["last-modified"]
+    response = test_client.get(f"/resources/{resource_id}", headers={**user_headers, "If-Modified-Since": last_modified})
+    assert response.status_code == 304
+    
+    response = test_client.put(f"/resources/{resource_id}", json={**resource, "title": "While loops"}, headers=admin_headers)
+    assert response.status_code == 200
+    
+    response = test_client.get("/resources", headers={**user_headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()[0]["title"] == "While loops"
+    assert response.headers["etag"] != etag
+
+def test_conversation_since_and_conditional_get(test_client, student_token, mock_supabase, monkeypatch):
+    """Polling returns only new messages and 304 while nothing changed"""
+    headers = {"Authorization": f"Bearer {student_token}"}
+    question_id = test_client.post("/chat/questions", json={"question_text": "What is a tuple?"}, headers=headers).json()["id"]
+    
+    response = test_client.get(f"/chat/conversations/{question_id}", headers=headers)
+    assert [m["message_text"] for m in response.json()] == ["What is a tuple?"]
+    etag = response.headers["ETag"]
+    since = response.headers["X-Next-Cursor"]
+    
+    queried = []
+    original_table = mock_supabase.table
+    monkeypatch.setattr(mock_supabase, "table", lambda name: queried.append(name) or original_table(name))
+    
+    response = test_client.get(f"/chat/conversations/{question_id}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert queried == ["conversations"]
+    
+    response = test_client.get(f"/chat/conversations/{question_id}", params={"since": since}, headers=headers)
+    assert response.json() == []
+    assert response.headers["ETag"] == etag
+    
+    original_table("conversations").insert({
+        "student_id": "someone",
+        "question_id": question_id,
+        "message_type": "ai",
+        "message_text": "An immutable sequence.",
+        "created_at": "2999-01-01T00:00:00+00:00"
+    }).execute()
+    
+    response = test_client.get(
+        f"/chat/conversations/{question_id}",
+        params={"since": since},
+        headers={**headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert [m["message_text"] for m in response.json()] == ["An immutable sequence."]
+    assert response.headers["ETag"] != etag
+    
+    other = create_access_token(data={"sub": original_table("students").data[0]["id"], "role": "student"})
+    response = test_client.get(f"/chat/conversations/{question_id}", headers={"Authorization": f"Bearer {other}"})
+    assert response.status_code == 404
+
+def test_sparse_fieldsets(test_client, admin_token, student_token, mock_supabase, monkeypatch):
+    """fields= trims responses and queries only read the columns they need"""
+    admin_headers = {"Authorization": f"Bearer {admin_token}"}
+    user_headers = {"Authorization": f"Bearer {student_token}"}
+    resource = {"title": "Loops", "description": "d", "content": "x" * 1000, "file_type": "text", "tags": ["python"]}
+    resource_id = test_client.post("/resources", json=resource, headers=admin_headers).json()["id"]
+    
+    full = test_client.get("/resources", headers=user_headers)
+    sparse = test_client.get("/resources", params={"fields": "title,tags"}, headers=user_headers)
+    assert sparse.json() == [{"id": resource_id, "title": "Loops", "tags": ["python"]}]
+    assert sparse.headers["etag"] == full.headers["etag"]
+    assert len(sparse.content) < len(full.content) // 5
+    
+    response = test_client.get(f"/resources/{resource_id}", params={"fields": "title"}, headers=user_headers)
+    assert response.json() == {"id": resource_id, "title": "Loops"}
+    response = test_client.get("/resources/search", params={"tag": "python", "fields": "file_type"}, headers=user_headers)
+    assert response.json() == [{"id": resource_id, "file_type": "text"}]
+    response = test_client.get("/resources", params={"fields": "title,secret"}, headers=user_headers)
+    assert response.status_code == 400
+    
+    selects = []
+    original_table = mock_supabase.table
+    def recording_table(name):
+        table = original_table(name)
+        original_select = table.select
+        table.select = lambda columns="*": selects.append((name, columns)) or original_select(columns)
+        return table
+    monkeypatch.setattr(mock_supabase, "table", recording_table)
+    
+    for i in range(3):
+        test_client.post("/files/upload", files={"file": (f"f{i}.txt", b"data %d" % i, "text/plain")}, headers=user_headers)
+    response = test_client.get("/files/list", params={"fields": "name", "limit": 2}, headers=user_headers)
+    assert [set(f) for f in response.json()] == [{"id", "name"}] * 2
+    assert "X-Next-Cursor" in response.headers
+    
+    question_id = test_client.post("/chat/questions", json={"question_text": "Why?"}, headers=user_headers).json()["id"]
+    test_client.post(
+        f"/chat/responses/{question_id}/feedback",
+        json={"response_id": "missing", "rating": 5},
+        headers=user_headers
+    )
+    assert "*" not in [columns for _, columns in selects]
+    assert ("files", "id, name, created_at") in selects
+    assert ("questions", "id") in selects
+
+def test_list_serialization_modes_agree(test_client, student_token, monkeypatch):
+    """Trusted rows and validate-once encoding return the same listing"""
+    from backend.utils import serialization
+    headers = {"Authorization": f"Bearer {student_token}"}
+    batch = [{"question_text": f"Question {i}", "code_context": "x = 1" if i % 2 else None} for i in range(5)]
+    test_client.post("/chat/questions/bulk", json=batch, headers=headers)
+    
+    trusted = test_client.get("/chat/questions", params={"limit": 3}, headers=headers)
+    monkeypatch.setattr(serialization, "VALIDATE_RESPONSE_ROWS", True)
+    validated = test_client.get("/chat/questions", params={"limit": 3}, headers=headers)
+    
+    assert trusted.headers["X-Next-Cursor"] == validated.headers["X-Next-Cursor"]
+    for left, right in zip(trusted.json(), validated.json()):
+        assert datetime.fromisoformat(left.pop("created_at").replace("Z", "+00:00")) == \
+            datetime.fromisoformat(right.pop("created_at").replace("Z", "+00:00"))
+        assert left == right
+
+def test_batch_upload_and_delete(test_client, student_token, mock_supabase, monkeypatch):
+    """Batch endpoints write metadata in bulk, upload each blob once and report per file"""
+    from backend.db import storage as storage_module
+    headers = {"Authorization": f"Bearer {student_token}"}
+    storage = mock_supabase.storage
+    uploads = []
+    original_upload = storage.upload
+    monkeypatch.setattr(storage, "upload", lambda path, data, options=None: uploads.append(path) or original_upload(path, data, options))
+    monkeypatch.setattr(storage_module, "MAX_UPLOAD_BYTES", 64)
+    
+    files_table = mock_supabase.table("files")
+    inserts = []
+    original_insert = files_table.insert
+    monkeypatch.setattr(files_table, "insert", lambda value: inserts.append(value) or original_insert(value))
+    
+    files = [
+        ("files", ("main.py", b"def main():\n    return 1\n", "text/x-python")),
+        ("files", ("copy.py", b"def main():\n    return 1\n", "text/x-python")),
+        ("files", ("notes.txt", b"loops and lists", "text/plain")),
+        ("files", ("huge.bin", b"x" * 100, "application/octet-stream")),
+    ]
+    response = test_client.post("/files/upload-batch", files=files, headers=headers)
+    assert response.status_code == 200
+    results = response.json()
+    assert [(r["name"], r["status"]) for r in results] == [
+        ("main.py", 201), ("copy.py", 201), ("notes.txt", 201), ("huge.bin", 413)
+    ]
+    assert results[0]["file"]["storage_path"] == results[1]["file"]["storage_path"]
+    assert len(inserts) == 1 and len(inserts[0]) == 3
+    assert len(uploads) == 2
+    
+    file_ids = [r["file"]["id"] for r in results[:3]]
+    response = test_client.post("/files/delete-batch", json={"file_ids": file_ids[:2] + ["missing"]}, headers=headers)
+    assert response.json() == {"deleted": file_ids[:2], "not_found": ["missing"]}
+    assert len(storage.objects) == 1
+    assert test_client.get(f"/files/{file_ids[2]}", headers=headers).status_code == 200
+    
+    monkeypatch.setattr("backend.routes.files.MAX_BATCH_FILES", 2)
+    response = test_client.post("/files/upload-batch", files=files[:3], headers=headers)
+    assert response.status_code == 400
+
+def test_batch_upload_does_not_trust_unfinished_blobs(test_client, student_token, mock_supabase):
+    """A blob held only by another in-flight upload is uploaded by the batch too"""
+    import hashlib
+    from backend.db.blobs import blob_path
+    headers = {"Authorization": f"Bearer {student_token}"}
+    content = b"def main():\n    return 2\n"
+    path = blob_path(hashlib.sha256(content).hexdigest())
+    mock_supabase.table("files").insert({"student_id": "someone-else", "storage_path": path})
+    mock_supabase.table("blobs").insert({"storage_path": path, "state": "uploading"})
+    
+    response = test_client.post("/files/upload-batch", files=[("files", ("main.py", content, "text/x-python"))], headers=headers)
+    assert [r["status"] for r in response.json()] == [201]
+    assert mock_supabase.storage.objects[path] == content
+    assert mock_supabase.table("blobs").data[0]["state"] == "ready"
+
+def test_archive_upload(test_client, student_token, mock_supabase, monkeypatch):
+    """Zip and tar.gz projects are unpacked into files; bombs and junk are refused"""
+    import io
+    import tarfile
+    import zipfile
+    headers = {"Authorization": f"Bearer {student_token}"}
+    project = {"src/main.py": b"def main():\n    return 1\n", "README.md": b"# Project\n"}
+    
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("src/", b"")
+        for name, data in project.items():
+            archive.writestr(name, data)
+        archive.writestr("__MACOSX/src/._main.py", b"\x00\x05")
+        archive.writestr("../escape.py", b"x = 1")
+    zipped = buffer.getvalue()
+    
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for name, data in project.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    tarred = buffer.getvalue()
+    
+    files_table = mock_supabase.table("files")
+    inserts = []
+    original_insert = files_table.insert
+    monkeypatch.setattr(files_table, "insert", lambda value: inserts.append(value) or original_insert(value))
+    
+    for filename, data in (("project.zip", zipped), ("project.tar.gz", tarred)):
+        response = test_client.post("/files/upload-archive", files={"file": (filename, data, "application/octet-stream")}, headers=headers)
+        assert response.status_code == 200
+        results = response.json()
+        assert [(r["name"], r["status"]) for r in results] == [("src/main.py", 201), ("README.md", 201)]
+        assert results[0]["file"]["content_type"] == "text/x-python"
+        file_id = results[0]["file"]["id"]
+        assert test_client.get(f"/files/{file_id}/raw", headers=headers).content == project["src/main.py"]
+    assert [len(rows) for rows in inserts] == [2, 2]
+    
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("zeros.txt", b"\x00" * (8 * 1024 * 1024))
+    response = test_client.post("/files/upload-archive", files={"file": ("bomb.zip", buffer.getvalue(), "application/zip")}, headers=headers)
+    assert response.status_code == 413
+    assert "ratio" in response.json()["detail"]
+    
+    response = test_client.post("/files/upload-archive", files={"file": ("junk.zip", b"not an archive" * 100, "application/zip")}, headers=headers)
+    assert response.status_code == 400
+    assert len(inserts) == 2
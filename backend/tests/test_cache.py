@@ -0,0 +1,86 @@
+import pytest
+from datetime import timedelta
+from jose import JWTError, jwt
+from backend.utils.cache import TTLCache
+from backend.auth import utils as auth_utils
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+def test_ttl_cache_expires_entries():
+    """Entries disappear once their TTL has elapsed"""
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=5, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=1)
+    clock.now = 2
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    clock.now = 6
+    assert cache.get("a") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+def test_ttl_cache_evicts_least_recently_used():
+    """The cache never grows past maxsize"""
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert "a" in cache
+    assert "b" not in cache
+    assert len(cache) == 2
+    assert cache.stats()["evictions"] == 1
+
+def test_student_check_is_cached(test_client, student_token, mock_supabase, monkeypatch):
+    """Repeated requests from one student hit the DB once"""
+    headers = {"Authorization": f"Bearer {student_token}"}
+    students = mock_supabase.table("students")
+    lookups = []
+    original_select = students.select
+    
+    def counting_select(*args):
+        lookups.append(args)
+        return original_select(*args)
+    
+    monkeypatch.setattr(students, "select", counting_select)
+    
+    for _ in range(3):
+        assert test_client.get("/chat/questions", headers=headers).status_code == 200
+    assert len(lookups) == 1
+    
+    # Deleting the student takes effect once the cache entry is invalidated
+    students.data.clear()
+    assert test_client.get("/chat/questions", headers=headers).status_code == 200
+    student_id = jwt.decode(student_token, auth_utils.SECRET_KEY, algorithms=[auth_utils.ALGORITHM])["sub"]
+    auth_utils.invalidate_student(student_id)
+    assert test_client.get("/chat/questions", headers=headers).status_code == 401
+    
+    # Unknown students are negatively cached as well
+    assert test_client.get("/chat/questions", headers=headers).status_code == 401
+    assert len(lookups) == 2
+
+def test_decode_token_reuses_verified_claims():
+    """The same bearer token is only cryptographically verified once"""
+    token = auth_utils.create_access_token({"sub": "abc", "role": "student"}, expires_delta=timedelta(minutes=5))
+    auth_utils.token_cache.clear()
+    hits = auth_utils.token_cache.hits
+    assert auth_utils.decode_token(token)["sub"] == "abc"
+    assert auth_utils.decode_token(token)["sub"] == "abc"
+    assert auth_utils.token_cache.hits == hits + 1
+
+def test_decode_token_rejects_bad_tokens():
+    """Tampered and expired tokens are never cached"""
+    auth_utils.token_cache.clear()
+    forged = jwt.encode({"sub": "abc", "role": "admin"}, "not-the-secret", algorithm=auth_utils.ALGORITHM)
+    with pytest.raises(JWTError):
+        auth_utils.decode_token(forged)
+    expired = auth_utils.create_access_token({"sub": "abc", "role": "student"}, expires_delta=timedelta(minutes=-1))
+    with pytest.raises(JWTError):
+        auth_utils.decode_token(expired)
+    assert len(auth_utils.token_cache) == 0
@@ -0,0 +1,117 @@
+import gzip
+import zlib
+import pytest
+from backend.middleware.compression import (
+    compressed_cache, compress_body, compression_stats, negotiate
+)
+
+@pytest.fixture(autouse=True)
+def reset_compression():
+    compression_stats.reset()
+    compressed_cache.clear()
+
+def test_negotiate_uses_q_values_and_server_preference():
+    """q-values decide, ties go to the server's order, q=0 and identity preferences are honored"""
+    available = ["zstd", "br", "gzip"]
+    assert negotiate("gzip, br", available) == "br"
+    assert negotiate("gzip;q=1.0, br;q=0.5", available) == "gzip"
+    assert negotiate("br;q=0, gzip", available) == "gzip"
+    assert negotiate("*", available) == "zstd"
+    assert negotiate("*;q=0.5, gzip;q=0", available) == "zstd"
+    assert negotiate("identity", available) is None
+    assert negotiate("gzip;q=0.5, identity", available) is None
+    assert negotiate("deflate", available) is None
+    assert negotiate("", available) is None
+    assert negotiate("br, gzip", ["gzip"]) == "gzip"
+
+def create_resources(test_client, admin_token, count=20):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    for i in range(count):
+        resource = {
+            "title": f"Resource {i}",
+            "description": "Loops and lists",
+            "content": "A for loop repeats a block once for each item. " * 20,
+            "file_type": "text",
+            "tags": ["python"]
+        }
+        assert test_client.post("/resources", json=resource, headers=headers).status_code == 200
+
+def test_large_json_is_gzipped_and_cached_by_etag(test_client, admin_token, student_token):
+    """Catalog pages are compressed once per ETag and served from the compressed cache"""
+    create_resources(test_client, admin_token)
+    compression_stats.reset()
+    headers = {"Authorization": f"Bearer {student_token}", "Accept-Encoding": "gzip"}
+    
+    first = test_client.get("/resources", headers=headers)
+    assert first.status_code == 200
+    assert first.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in first.headers["vary"]
+    assert first.headers["etag"].startswith("W/")
+    assert len(first.json()) == 20
+    
+    second = test_client.get("/resources", headers=headers)
+    assert second.json() == first.json()
+    stats = compression_stats.snapshot()
+    assert stats["responses"] == 2 and stats["cache_hits"] == 1
+    assert stats["bytes_saved"] > stats["bytes_in"] // 2
+    assert stats["by_encoding"]["gzip"]["cpu_seconds"] >= 0
+    text = test_client.get("/metrics").text
+    assert f'compression_bytes_in_total{{encoding="gzip"}} {stats["bytes_in"]}' in text
+    assert f'compression_bytes_out_total{{encoding="gzip"}} {stats["bytes_out"]}' in text
+    assert 'compression_cpu_seconds_total{encoding="gzip"}' in text
+    assert 'cache_hits_total{cache="compression"} 1' in text
+    
+    # The ETag still revalidates once weakened
+    response = test_client.get("/resources", headers={**headers, "If-None-Match": first.headers["etag"]})
+    assert response.status_code == 304
+
+def test_small_and_identity_responses_are_not_compressed(test_client, student_token):
+    """Bodies under the threshold, or clients that don't accept compression, get identity"""
+    response = test_client.get("/health", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert compression_stats.snapshot()["skipped"] == 1
+    
+    response = test_client.get("/health", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+
+def test_event_streams_are_compressed_incrementally(test_client, student_token):
+    """SSE bodies are compressed chunk by chunk with a sync flush per event"""
+    headers = {"Authorization": f"Bearer {student_token}", "Accept-Encoding": "gzip"}
+    question_id = test_client.post(
+        "/chat/questions", json={"question_text": "How do I use a for loop?"}, headers=headers
+    ).json()["id"]
+    
+    with test_client.stream("GET", f"/chat/questions/{question_id}/answer/stream", headers=headers) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        chunks = list(response.iter_raw())
+    
+    # Every chunk decodes on its own prefix, so events are never held back
+    decoder = zlib.decompressobj(31)
+    first_event = decoder.decompress(chunks[0])
+    assert first_event.startswith(b"event: start")
+    text = gzip.decompress(b"".join(chunks)).decode()
+    assert text.rstrip().endswith("}") and "event: done" in text
+
+def test_raw_downloads_keep_ranges_uncompressed(test_client, student_token):
+    """Byte-range capable responses are passed through"""
+    headers = {"Authorization": f"Bearer {student_token}", "Accept-Encoding": "gzip"}
+    content = b"print('hello')\n" * 200
+    file_id = test_client.post(
+        "/files/upload", files={"file": ("hello.txt", content, "text/plain")}, headers=headers
+    ).json()["id"]
+    response = test_client.get(f"/files/{file_id}/raw", headers=headers)
+    assert "content-encoding" not in response.headers
+    assert response.content == content
+
+@pytest.mark.parametrize("encoding, module", [("br", "brotli"), ("zstd", "zstandard")])
+def test_optional_encoders_round_trip(encoding, module):
+    """brotli and zstd are used when their packages are installed"""
+    library = pytest.importorskip(module)
+    body = b'{"content": "' + b"loop " * 500 + b'"}'
+    compressed = compress_body(encoding, body)
+    assert len(compressed) < len(body)
+    if encoding == "br":
+        assert library.decompress(compressed) == body
+    else:
+        assert library.ZstdDecompressor().decompress(compressed, max_output_size=len(body)) == body
@@ -0,0 +1,100 @@
+import pytest
+from backend.utils.cache import TTLCache
+from backend.utils.metrics import CacheStatsCollector, Registry, registry
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    registry.clear()
+
+def sample(text, line_prefix):
+    """Value of the first exposition line starting with `line_prefix`"""
+    for line in text.splitlines():
+        if line.startswith(line_prefix):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"{line_prefix} not in metrics")
+
+def test_histogram_and_counter_exposition():
+    """Buckets are cumulative with +Inf, and label values are escaped"""
+    local = Registry()
+    latency = local.histogram("job_seconds", "Job latency", ("kind",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        latency.labels("a").observe(value)
+    local.counter("jobs_total", "Jobs", ("name",)).labels('say "hi"\n').inc(2)
+    text = local.render()
+    
+    assert "# TYPE job_seconds histogram" in text
+    assert 'job_seconds_bucket{kind="a",le="0.1"} 1' in text
+    assert 'job_seconds_bucket{kind="a",le="1"} 3' in text
+    assert 'job_seconds_bucket{kind="a",le="+Inf"} 4' in text
+    assert 'job_seconds_count{kind="a"} 4' in text
+    assert sample(text, 'job_seconds_sum{kind="a"}') == pytest.approx(4.05)
+    assert 'jobs_total{name="say \\"hi\\"\\n"} 2' in text
+    with pytest.raises(ValueError):
+        latency.labels("a", "b")
+
+def test_metrics_endpoint_reports_routes_db_and_bytes(test_client, student_token):
+    """Requests are labeled by route template, DB calls by table, and body bytes are counted"""
+    headers = {"Authorization": f"Bearer {student_token}"}
+    content = b"print('metrics')\n" * 64
+    file_id = test_client.post(
+        "/files/upload", files={"file": ("m.py", content, "text/plain")}, headers=headers
+    ).json()["id"]
+    for _ in range(2):
+        assert test_client.get(f"/files/{file_id}/raw", headers=headers).content == content
+    test_client.get("/files/missing", headers=headers)
+    test_client.get("/no/such/path")
+    
+    response = test_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    
+    assert sample(text, 'http_requests_total{method="GET",route="/files/{file_id}/raw",status="200"}') == 2
+    assert sample(text, 'http_requests_total{method="GET",route="/files/{file_id}",status="404"}') == 1
+    assert sample(text, 'http_requests_total{method="GET",route="unmatched",status="404"}') == 1
+    assert sample(text, 'http_request_duration_seconds_count{method="GET",route="/files/{file_id}/raw"}') == 2
+    assert sample(text, 'http_response_body_bytes_total{method="GET",route="/files/{file_id}/raw"}') == 2 * len(content)
+    assert sample(text, 'http_request_body_bytes_total{method="POST",route="/files/upload"}') > len(content)
+    assert sample(text, 'http_requests_in_flight{method="GET"}') == 1  # the scrape itself
+    assert sample(text, 'db_queries_total{table="files",operation="insert",outcome="ok"}') == 1
+    assert sample(text, 'db_query_duration_seconds_count{table="files",operation="select"}') >= 3
+    assert sample(text, 'storage_bytes_total{bucket="files",direction="upload"}') == len(content)
+
+def test_metrics_token(test_client, monkeypatch):
+    """METRICS_TOKEN protects the endpoint"""
+    monkeypatch.setattr("backend.main.METRICS_TOKEN", "scrape-secret")
+    assert test_client.get("/metrics").status_code == 401
+    response = test_client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"})
+    assert response.status_code == 200
+
+def test_cache_stats_collector():
+    """Caches added to the collector are exported as counters labeled by cache"""
+    local = Registry()
+    collector = CacheStatsCollector()
+    local.add_collector(collector)
+    cache = TTLCache(maxsize=1, ttl=60)
+    collector.add("demo", cache.stats)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("b")
+    cache.get("a")
+    text = local.render()
+    
+    assert "# TYPE cache_hits_total counter" in text
+    assert sample(text, 'cache_hits_total{cache="demo"}') == 1
+    assert sample(text, 'cache_misses_total{cache="demo"}') == 1
+    assert sample(text, 'cache_evictions_total{cache="demo"}') == 1
+    assert sample(text, 'cache_entries{cache="demo"}') == 1
+
+def test_metrics_endpoint_reports_app_caches(test_client, student_token):
+    """Student, token and catalog cache lookups reach /metrics"""
+    headers = {"Authorization": f"Bearer {student_token}"}
+    before = test_client.get("/metrics").text
+    for _ in range(2):
+        test_client.get("/resources/", headers=headers)
+    text = test_client.get("/metrics").text
+    
+    assert sample(text, 'cache_hits_total{cache="token"}') > sample(before, 'cache_hits_total{cache="token"}')
+    assert sample(text, 'cache_hits_total{cache="student"}') > sample(before, 'cache_hits_total{cache="student"}')
+    assert sample(text, 'cache_hits_total{cache="resource_pages"}') >= 1
+    assert 'cache_misses_total{cache="resource_items"}' in text
@@ -0,0 +1,57 @@
+import threading
+import time
+from backend.utils.profiler import SamplingProfiler, profiler
+
+def spin(stop: threading.Event):
+    while not stop.is_set():
+        sum(i * i for i in range(500))
+
+def test_profiler_samples_busy_threads_into_folded_stacks(tmp_path):
+    """Busy threads show up as root-first folded stacks; idle waits are skipped"""
+    local = SamplingProfiler()
+    stop = threading.Event()
+    worker = threading.Thread(target=spin, args=(stop,), name="spinner-3")
+    idle = threading.Thread(target=stop.wait, name="idler")
+    worker.start()
+    idle.start()
+    try:
+        for _ in range(20):
+            local.sample()
+            time.sleep(0.002)
+    finally:
+        stop.set()
+        worker.join()
+        idle.join()
+    
+    lines = local.folded().splitlines()
+    spinner = [line for line in lines if line.startswith("spinner;")]
+    assert spinner and all(":spin" in line for line in spinner)
+    assert not any(line.startswith("idler;") for line in lines)
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) >= 1 and " " not in stack
+    assert local.samples == 20
+    
+    path = local.dump(str(tmp_path))
+    assert open(path).read() == local.folded()
+
+def test_profiler_endpoints(test_client, admin_token, student_token, tmp_path, monkeypatch):
+    """Admins start and stop the worker's profiler at runtime"""
+    monkeypatch.setattr("backend.utils.profiler.PROFILER_OUTPUT_DIR", str(tmp_path))
+    admin = {"Authorization": f"Bearer {admin_token}"}
+    assert test_client.post("/profiler/start", headers={"Authorization": f"Bearer {student_token}"}).status_code == 403
+    
+    response = test_client.post("/profiler/start", json={"interval_ms": 1, "duration_seconds": 30}, headers=admin)
+    assert response.status_code == 200 and response.json()["running"]
+    assert test_client.post("/profiler/start", headers=admin).status_code == 409
+    for _ in range(5):
+        test_client.get("/health")
+    time.sleep(0.05)
+    
+    status = test_client.post("/profiler/stop", headers=admin).json()
+    assert not status["running"] and status["samples"] > 0
+    assert status["output"].startswith(str(tmp_path))
+    assert status["hottest"] and status["hottest"][0]["samples"] > 0
+    folded = test_client.get("/profiler/folded", params={"limit": 3}, headers=admin).text
+    assert 0 < len(folded.splitlines()) <= 3
+    assert test_client.post("/profiler/stop", headers=admin).status_code == 409
+    assert not profiler.running
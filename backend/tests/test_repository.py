@@ -0,0 +1,46 @@
+import asyncio
+import contextvars
+import threading
+import time
+from backend.db import repository
+
+request_id = contextvars.ContextVar("request_id", default=None)
+
+class SlowQuery:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.thread = None
+        self.request_id = None
+    
+    def execute(self):
+        self.thread = threading.current_thread()
+        self.request_id = request_id.get()
+        time.sleep(self.latency)
+        return self
+
+def test_execute_does_not_block_event_loop():
+    """Concurrent slow queries overlap instead of running back to back"""
+    async def run():
+        queries = [SlowQuery(0.1) for _ in range(5)]
+        start = time.perf_counter()
+        await asyncio.gather(*(repository.execute(q) for q in queries))
+        return time.perf_counter() - start, queries
+    
+    elapsed, queries = asyncio.run(run())
+    assert elapsed < 0.3
+    assert all(q.thread is not threading.main_thread() for q in queries)
+
+def test_execute_propagates_context():
+    """Context variables set by the request are visible to the worker thread"""
+    async def run():
+        request_id.set("req-1")
+        return await repository.execute(SlowQuery(0))
+    
+    assert asyncio.run(run()).request_id == "req-1"
+
+def test_routes_use_patched_client(test_client, student_token, mock_supabase):
+    """Routers resolve the client through the repository at call time"""
+    headers = {"Authorization": f"Bearer {student_token}"}
+    response = test_client.get("/chat/questions", headers=headers)
+    assert response.status_code == 200
+    assert response.json() == []
@@ -0,0 +1,58 @@
+import random
+from backend.utils.sampling import SamplingRule, TraceSampler, parse_rules
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+def make_sampler(clock, rules="/health=0,/chat/*=0.5", **kwargs):
+    options = {"default_rate": 0.1, "error_rate": 1.0, "error_boost_seconds": 60, "max_per_second": 0}
+    options.update(kwargs)
+    return TraceSampler(parse_rules(rules), clock=clock, rng=random.Random(7), **options)
+
+def test_rules_parse_and_first_match_wins():
+    """Globs map paths to rates; malformed entries are skipped"""
+    rules = parse_rules("/files/*/raw=0.01, /files/*=0.3, bogus, /x=abc, =0.5, /chat/*=2")
+    assert rules == [
+        SamplingRule("/files/*/raw", 0.01), SamplingRule("/files/*", 0.3), SamplingRule("/chat/*", 1.0)
+    ]
+    sampler = TraceSampler(rules, default_rate=0.05, max_per_second=0)
+    assert sampler.rate_for("/files/abc/raw") == 0.01
+    assert sampler.rate_for("/files/list") == 0.3
+    assert sampler.rate_for("/resources") == 0.05
+
+def test_sampling_follows_rates_and_parent_decisions():
+    """Each path is sampled at its rule's rate; propagated traces keep their parent's decision"""
+    sampler = make_sampler(FakeClock())
+    chat = sum(sampler({"asgi_scope": {"path": "/chat/questions"}}) for _ in range(2000))
+    other = sum(sampler({"asgi_scope": {"path": "/resources"}}) for _ in range(2000))
+    assert 850 < chat < 1150
+    assert 120 < other < 280
+    assert sampler({"asgi_scope": {"path": "/health"}}) == 0.0
+    assert sampler({"parent_sampled": True, "asgi_scope": {"path": "/health"}}) == 1.0
+    assert sampler({"parent_sampled": False, "asgi_scope": {"path": "/chat/x"}}) == 0.0
+    assert sampler({"transaction_context": {"name": "/health"}}) == 0.0
+
+def test_errors_boost_their_rule_for_a_while():
+    """An error event raises its rule to the error rate until the boost expires"""
+    clock = FakeClock()
+    sampler = make_sampler(clock)
+    event = {"request": {"url": "https://api.example.com/chat/questions/42/answer?x=1"}}
+    assert sampler.before_send(event, {}) is event
+    assert sampler.rate_for("/chat/other") == 1.0
+    assert sampler.rate_for("/resources") == 0.1
+    clock.now += 61
+    assert sampler.rate_for("/chat/other") == 0.5
+
+def test_rate_cap_limits_traces_per_second():
+    """No more than max_per_second traces start, refilling over time"""
+    clock = FakeClock()
+    sampler = make_sampler(clock, rules="", default_rate=1.0, max_per_second=5)
+    assert sum(sampler.sample("/resources") for _ in range(50)) == 5
+    clock.now += 0.5
+    assert sum(sampler.sample("/resources") for _ in range(50)) == 2
+    clock.now += 10
+    assert sum(sampler.sample("/resources") for _ in range(50)) == 5
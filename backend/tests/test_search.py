@@ -0,0 +1,166 @@
+from backend.search.tag_index import TagIndex
+from backend.search.bm25 import BM25Index, highlight
+from backend.search.code_index import CodeIndex, chunk_source, embed
+
+def test_tag_index_any_and_all():
+    """Multi-tag queries support OR and AND semantics"""
+    index = TagIndex()
+    index.load([
+        {"id": "r1", "tags": ["python", "beginner"]},
+        {"id": "r2", "tags": ["python", "advanced"]},
+        {"id": "r3", "tags": ["java"]},
+    ])
+    assert index.search(["python"]) == {"r1", "r2"}
+    assert index.search(["beginner", "java"]) == {"r1", "r3"}
+    assert index.search(["python", "beginner"], match_all=True) == {"r1"}
+    assert index.search(["python", "rust"], match_all=True) == set()
+    assert index.search([]) == set()
+
+def test_tag_index_tracks_updates_and_deletes():
+    """Retagging and deleting keep the postings consistent"""
+    index = TagIndex()
+    index.add("r1", ["python", "beginner"])
+    index.add("r1", ["python", "advanced"])
+    assert index.search(["beginner"]) == set()
+    assert index.search(["advanced"]) == {"r1"}
+    index.remove("r1")
+    assert index.search(["python"]) == set()
+
+def test_search_endpoint_uses_index(test_client, admin_token, student_token):
+    """Search only returns resources whose tags match"""
+    admin_headers = {"Authorization": f"Bearer {admin_token}"}
+    user_headers = {"Authorization": f"Bearer {student_token}"}
+    base = {"description": "d", "content": "c", "file_type": "text"}
+    for title, tags in [("A", ["python", "loops"]), ("B", ["python"]), ("C", ["java"])]:
+        response = test_client.post("/resources", json={**base, "title": title, "tags": tags}, headers=admin_headers)
+        assert response.status_code == 200
+    
+    response = test_client.get("/resources/search", params={"tag": "python"}, headers=user_headers)
+    assert sorted(r["title"] for r in response.json()) == ["A", "B"]
+    
+    response = test_client.get(
+        "/resources/search",
+        params={"tag": ["python", "loops"], "match": "all"},
+        headers=user_headers
+    )
+    assert [r["title"] for r in response.json()] == ["A"]
+    
+    response = test_client.get(
+        "/resources/search",
+        params={"tag": ["loops", "java"], "match": "any"},
+        headers=user_headers
+    )
+    assert sorted(r["title"] for r in response.json()) == ["A", "C"]
+
+
+def test_bm25_ranks_and_updates_incrementally():
+    """Rarer terms and title matches rank higher; updates and deletes re-index"""
+    index = BM25Index()
+    index.load([
+        {"id": "r1", "title": "Python loops", "description": "for and while", "content": "Loops repeat code."},
+        {"id": "r2", "title": "Recursion", "description": "functions calling themselves", "content": "Python recursion and loops."},
+        {"id": "r3", "title": "Java basics", "description": "classes", "content": "Java has loops too."},
+    ])
+    assert [rid for rid, _ in index.search("python loops")] == ["r1", "r2", "r3"]
+    assert [rid for rid, _ in index.search("loops", k=1)] == ["r1"]
+    assert index.search("the of") == []
+    
+    index.add("r1", {"id": "r1", "title": "Dictionaries", "description": "", "content": "Mapping keys."})
+    assert "r1" not in [rid for rid, _ in index.search("loops")]
+    index.remove("r2")
+    assert index.search("recursion") == []
+    assert len(index) == 2
+
+def test_highlight_marks_terms_in_window():
+    """Snippets center on matches, escape HTML and mark each hit"""
+    text = "Intro text. " * 30 + "A <b>python</b> loop repeats. Loops are useful." + " Outro." * 30
+    snippet = highlight(text, "loops python", width=80)
+    assert snippet.startswith("...") and snippet.endswith("...")
+    assert "&lt;b&gt;<mark>python</mark>&lt;/b&gt;" in snippet
+    assert "<mark>Loops</mark>" in snippet
+    assert highlight("short", "missing") == "short"
+
+def test_text_search_endpoint(test_client, admin_token, student_token):
+    """Full-text search returns ranked matches with snippets and follows writes"""
+    admin_headers = {"Authorization": f"Bearer {admin_token}"}
+    user_headers = {"Authorization": f"Bearer {student_token}"}
+    base = {"file_type": "text", "tags": []}
+    ids = {}
+    for title, content in [("Loops", "A for loop repeats code."), ("Lists", "Lists hold items; loop over them.")]:
+        response = test_client.post(
+            "/resources", json={**base, "title": title, "description": title, "content": content}, headers=admin_headers
+        )
+        ids[title] = response.json()["id"]
+    
+    response = test_client.get("/resources/search/text", params={"q": "loops"}, headers=user_headers)
+    assert response.status_code == 200
+    assert [r["title"] for r in response.json()] == ["Loops"]
+    
+    response = test_client.get("/resources/search/text", params={"q": "loop"}, headers=user_headers)
+    results = response.json()
+    assert {r["title"] for r in results} == {"Loops", "Lists"}
+    assert all("<mark>loop</mark>" in r["snippet"] for r in results)
+    assert results[0]["score"] >= results[1]["score"]
+    
+    test_client.delete(f"/resources/{ids['Lists']}", headers=admin_headers)
+    response = test_client.get("/resources/search/text", params={"q": "loop", "k": 5}, headers=user_headers)
+    assert [r["title"] for r in response.json()] == ["Loops"]
+
+SAMPLE = """import math
+
+def fibonacci(n):
+    # Naive recursive version
+    if n < 2:
+        return n
+    return fibonacci(n - 1) + fibonacci(n - 2)
+
+@cached
+def area_of_circle(radius):
+    return math.pi * radius ** 2
+
+print(fibonacci(10))
+"""
+
+def test_chunk_source_splits_on_definitions():
+    """Python uses the AST, other languages definition keywords, the rest fixed windows"""
+    chunks = chunk_source(SAMPLE, "maths.py", "f1")
+    assert [(c.name, c.start_line, c.end_line) for c in chunks] == [
+        (None, 1, 1), ("fibonacci", 3, 7), ("area_of_circle", 9, 11), (None, 13, 13)
+    ]
+    js = "const x = 1;\nfunction add(a, b) {\n  return a + b;\n}\nexport class Stack {\n}\n"
+    assert [c.name for c in chunk_source(js, "util.js", "f2")] == [None, "add", "Stack"]
+    notes = "\n".join(f"line {i}" for i in range(150))
+    assert [(c.start_line, c.end_line) for c in chunk_source(notes, "notes.txt", "f3")] == [(1, 60), (61, 120), (121, 150)]
+
+def test_code_index_retrieves_and_updates_incrementally():
+    """Relevant chunks rank first; deletes and the per-student bound drop chunks"""
+    index = CodeIndex(max_students=2, max_chunks=5)
+    index.load("s1", [("f1", "maths.py", SAMPLE)], index.generation("s1"))
+    top = index.search("s1", "why is my recursive fibonacci so slow?", k=1)
+    assert [(chunk.name, chunk.file_id) for chunk, _ in top] == [("fibonacci", "f1")]
+    assert index.search("s1", "circle radius area", k=1)[0][0].name == "area_of_circle"
+    
+    index.add_file("s1", "f2", "stack.py", "class Stack:\n    def push(self, item):\n        self.items.append(item)\n")
+    assert index.search("s1", "push onto the stack", k=1)[0][0].file_id == "f2"
+    # f1 and f2 hold 5 chunks; adding one more evicts the oldest file
+    index.add_file("s1", "f3", "queue.py", "def enqueue(queue, item):\n    queue.append(item)\n")
+    assert {chunk.file_id for chunk, _ in index.search("s1", "fibonacci stack enqueue", k=10, min_score=0)} == {"f2", "f3"}
+    index.remove_file("s1", "f2")
+    assert index.search("s1", "push stack", k=3) == []
+    
+    # A write while a load is in flight leaves the loaded index stale
+    generation = index.generation("s2")
+    index.add_file("s2", "f4", "a.py", "def a():\n    pass\n")
+    index.load("s2", [], generation)
+    assert not index.loaded("s2")
+    index.load("s3", [], index.generation("s3"))
+    assert index.stats()["students"] == 2 and not index.loaded("s1")
+
+def test_embeddings_are_normalized_and_deterministic():
+    """Feature hashing gives unit vectors that are stable across calls"""
+    vectors = embed(["parseUserInput(raw_text)", "", "parse_user_input"])
+    assert vectors.shape[0] == 3
+    assert abs(float((vectors[0] ** 2).sum()) - 1.0) < 1e-5
+    assert float((vectors[1] ** 2).sum()) == 0.0
+    assert float(vectors[0] @ vectors[2]) > 0.5
+    assert (embed(["parseUserInput(raw_text)"])[0] == vectors[0]).all()
@@ -0,0 +1,83 @@
+import asyncio
+import httpx
+import pytest
+from backend.db import tracing
+from backend.db.repository import execute, table
+from backend.db.tracing import RequestTrace, current_trace, describe_params, query_stats
+
+@pytest.fixture(autouse=True)
+def reset_query_stats():
+    query_stats.clear()
+
+def test_shapes_drop_filter_values():
+    """Shapes keep columns and operators; filters keep the values"""
+    params = httpx.QueryParams([
+        ("select", "id,name"),
+        ("student_id", "eq.42"),
+        ("id", "not.in.(1,2)"),
+        ("or", '(created_at.lt."2024-05-01T10:00:00+00:00",and(created_at.eq.2024-05-01,id.lt.9))'),
+        ("order", "created_at.desc,id.desc"),
+        ("limit", "51"),
+    ])
+    shape, filters = describe_params("select", "files", params)
+    assert shape == (
+        "select files select=id,name student_id.eq id.not.in "
+        "or(created_at.lt,and(created_at.eq,id.lt)) order=created_at.desc,id.desc limit"
+    )
+    assert filters.startswith("student_id=eq.42&id=not.in.(1,2)&or=")
+    assert describe_params("select", "files", httpx.QueryParams([("student_id", "eq.7")]))[0] == "select files student_id.eq"
+
+def test_repeated_shapes_are_flagged(mock_supabase, monkeypatch):
+    """The same shape run in a loop is reported as a possible N+1"""
+    async def n_plus_one():
+        trace = RequestTrace()
+        token = current_trace.set(trace)
+        try:
+            for question_id in ("a", "b", "c"):
+                await execute(table("conversations").select("id").eq("question_id", question_id))
+            await execute(table("questions").select("id").eq("id", "a"))
+        finally:
+            current_trace.reset(token)
+        return trace
+    
+    trace = asyncio.run(n_plus_one())
+    assert [r.filters for r in trace.records[:3]] == ["question_id=eq.a", "question_id=eq.b", "question_id=eq.c"]
+    assert trace.repeated() == [("select conversations select=id question_id.eq", 3)]
+    assert trace.totals()["db"][0] == 4
+    assert trace.warnings() == ["possible N+1: 3x select conversations select=id question_id.eq"]
+    monkeypatch.setattr(tracing, "QUERY_WARN_COUNT", 3)
+    assert trace.warnings()[0] == "4 queries (limit 3)"
+
+def test_server_timing_header_and_warning(test_client, student_token, monkeypatch, capsys):
+    """Responses carry per-request DB/storage totals; over-budget requests are logged"""
+    headers = {"Authorization": f"Bearer {student_token}"}
+    file_id = test_client.post(
+        "/files/upload", files={"file": ("t.txt", b"trace me", "text/plain")}, headers=headers
+    ).json()["id"]
+    
+    response = test_client.get(f"/files/{file_id}/raw", headers=headers)
+    timing = response.headers["server-timing"]
+    assert 'db;dur=' in timing and 'storage;dur=' in timing and "total;dur=" in timing
+    assert 'desc="1 call"' in timing.split("storage;", 1)[1].split(",")[0]
+    
+    monkeypatch.setattr(tracing, "QUERY_WARN_COUNT", 0)
+    test_client.get("/files/list", headers=headers)
+    assert "Query warning for GET /files/list" in capsys.readouterr().out
+
+def test_debug_queries_endpoint(test_client, admin_token, student_token, monkeypatch):
+    """Slowest shapes are listed for admins, and only when debug endpoints are on"""
+    admin_headers = {"Authorization": f"Bearer {admin_token}"}
+    assert test_client.get("/debug/queries", headers=admin_headers).status_code == 404
+    
+    monkeypatch.setattr("backend.routes.debug.DEBUG_ENDPOINTS", True)
+    for _ in range(2):
+        test_client.get("/files/list", headers={"Authorization": f"Bearer {student_token}"})
+    assert test_client.get("/debug/queries", headers={"Authorization": f"Bearer {student_token}"}).status_code == 403
+    
+    shapes = test_client.get("/debug/queries", params={"sort": "max"}, headers=admin_headers).json()
+    listing = next(s for s in shapes if s["shape"].startswith("select files"))
+    assert listing["calls"] == 2 and "student_id.eq" in listing["shape"]
+    assert [s["max_ms"] for s in shapes] == sorted((s["max_ms"] for s in shapes), reverse=True)
+    
+    assert test_client.delete("/debug/queries", headers=admin_headers).status_code == 200
+    assert test_client.get("/debug/queries", headers=admin_headers).json() == []
@@ -0,0 +1,3 @@
+"""
+Utilities package for AI Tutor Backend
+"""
\ No newline at end of file
@@ -0,0 +1,55 @@
+import hashlib
+from datetime import datetime, UTC
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Optional, Union
+from fastapi import Request
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Evaluate an If-None-Match header against `etag` (weak comparison)"""
+    if not if_none_match:
+        return False
+    candidates = [_opaque(tag) for tag in if_none_match.split(",")]
+    return "*" in candidates or _opaque(etag) in candidates
+
+def weak_etag(parts: Iterable[str]) -> str:
+    """Weak ETag derived from a sequence of version strings"""
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(part.encode())
+        digest.update(b"\x00")
+    return f'W/"{digest.hexdigest()[:20]}"'
+
+def parse_timestamp(value: Union[str, datetime]) -> datetime:
+    """Timezone-aware datetime from a DB timestamp"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=UTC)
+    return value
+
+def http_date(value: Union[str, datetime]) -> str:
+    """Format a timestamp as an HTTP-date for Last-Modified"""
+    return format_datetime(parse_timestamp(value).astimezone(UTC), usegmt=True)
+
+def not_modified(request: Request, etag: str, last_modified: Optional[Union[str, datetime]] = None) -> bool:
+    """
+    Whether the client's cached copy is current.
+    If-None-Match takes precedence over If-Modified-Since, as in RFC 9110.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=UTC)
+        return parse_timestamp(last_modified).replace(microsecond=0) <= since
+    return False
@@ -0,0 +1,262 @@
+import bisect
+import math
+import threading
+from typing import Callable, Dict, Generic, Iterable, List, Sequence, Tuple, TypeVar
+
+# Default latency buckets in seconds, for whole HTTP requests
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+S = TypeVar("S")
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class _CounterSeries:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+class _GaugeSeries(_CounterSeries):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+class _HistogramSeries:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # One slot per bucket plus +Inf; cumulated only when rendering
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+class _Metric(Generic[S]):
+    """
+    A metric family. `labels(...)` returns the series for one label set;
+    keep the returned series around on hot paths to skip the lookup. Each
+    series has its own lock, so recording never contends across series.
+    """
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[Tuple[str, ...], S] = {}
+        self._lock = threading.Lock()
+
+    def _new_series(self) -> S:
+        raise NotImplementedError
+
+    def labels(self, *values: str) -> S:
+        series = self._series.get(values)
+        if series is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                series = self._series.setdefault(values, self._new_series())
+        return series
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def samples(self) -> Iterable[Tuple[str, str, float]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+class Counter(_Metric[_CounterSeries]):
+    """Monotonic count; `name` should end in `_total`"""
+    kind = "counter"
+
+    def _new_series(self) -> _CounterSeries:
+        return _CounterSeries()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def samples(self):
+        for values, series in list(self._series.items()):
+            yield "", _format_labels(self.labelnames, values), series.value
+
+class Gauge(_Metric[_GaugeSeries]):
+    """Value that goes up and down, such as requests in flight"""
+    kind = "gauge"
+
+    def _new_series(self) -> _GaugeSeries:
+        return _GaugeSeries()
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def samples(self):
+        for values, series in list(self._series.items()):
+            yield "", _format_labels(self.labelnames, values), series.value
+
+class Histogram(_Metric[_HistogramSeries]):
+    """Distribution of observed values over fixed buckets"""
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets if b != math.inf))
+
+    def _new_series(self) -> _HistogramSeries:
+        return _HistogramSeries(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def samples(self):
+        for values, series in list(self._series.items()):
+            with series._lock:
+                counts, total = list(series.counts), series.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                yield "_bucket", _format_labels(self.labelnames, values, le), cumulative
+            labels = _format_labels(self.labelnames, values)
+            yield "_sum", labels, total
+            yield "_count", labels, cumulative
+
+def render_family(
+    name: str,
+    kind: str,
+    documentation: str,
+    labelnames: Sequence[str],
+    samples: Iterable[Tuple[Sequence[str], float]]
+) -> List[str]:
+    """Exposition lines for one metric family whose values are kept elsewhere, for collectors"""
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+    for values, value in samples:
+        lines.append(f"{name}{_format_labels(labelnames, values)} {_format_value(value)}")
+    return lines
+
+class CacheStatsCollector:
+    """
+    Collector for caches that count their own lookups (anything with a
+    `stats()` returning hits, misses, evictions and size, like TTLCache).
+    Read at scrape time, so caching code stays free of metric calls.
+    """
+
+    # (metric, kind, stats key, documentation)
+    FAMILIES = (
+        ("cache_hits_total", "counter", "hits", "Cache lookups that found a live entry"),
+        ("cache_misses_total", "counter", "misses", "Cache lookups that found nothing or an expired entry"),
+        ("cache_evictions_total", "counter", "evictions", "Entries dropped to stay within the cache size"),
+        ("cache_entries", "gauge", "size", "Entries currently held"),
+    )
+
+    def __init__(self):
+        self._caches: Dict[str, Callable[[], Dict[str, float]]] = {}
+
+    def add(self, name: str, stats: Callable[[], Dict[str, float]]) -> None:
+        """Export `stats()` under the label cache=`name`"""
+        self._caches[name] = stats
+
+    def __call__(self) -> List[str]:
+        snapshots = [(name, stats()) for name, stats in list(self._caches.items())]
+        lines: List[str] = []
+        for metric, kind, key, documentation in self.FAMILIES:
+            lines.extend(render_family(
+                metric, kind, documentation, ("cache",),
+                (((name,), snapshot[key]) for name, snapshot in snapshots if key in snapshot)
+            ))
+        return lines
+
+class Registry:
+    """Metrics exported by `/metrics`, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[str]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collect: Callable[[], Iterable[str]]) -> None:
+        """Add a callback producing exposition lines at scrape time, for stats kept elsewhere"""
+        self._collectors.append(collect)
+
+    def get(self, name: str) -> _Metric:
+        return self._metrics[name]
+
+    def clear(self) -> None:
+        """Drop every recorded series (tests and benchmarks)"""
+        for metric in self._metrics.values():
+            metric.clear()
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            lines.extend(collect())
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+# Hit/miss stats of the app's caches, added by the modules that own them
+cache_stats = CacheStatsCollector()
+registry.add_collector(cache_stats)
@@ -0,0 +1,195 @@
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Default time between samples
+PROFILER_INTERVAL_SECONDS = float(os.getenv("PROFILER_INTERVAL_SECONDS", "0.01"))
+# A profile stops by itself after this long, so a forgotten one can't run forever
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "300"))
+# Distinct stacks kept; further new stacks are counted under a single marker
+PROFILER_MAX_STACKS = int(os.getenv("PROFILER_MAX_STACKS", "20000"))
+# Where finished profiles are written
+PROFILER_OUTPUT_DIR = os.getenv("PROFILER_OUTPUT_DIR", tempfile.gettempdir())
+
+TRUNCATED_STACK = "[truncated]"
+
+# Leaf frames of threads that are waiting rather than working
+_IDLE_LEAVES = {
+    ("selectors", "EpollSelector.select"),
+    ("selectors", "KqueueSelector.select"),
+    ("selectors", "_PollLikeSelector.select"),
+    ("selectors", "SelectSelector.select"),
+    ("threading", "Condition.wait"),
+    ("threading", "Event.wait"),
+    ("threading", "Thread._wait_for_tstate_lock"),
+    ("queue", "Queue.get"),
+    ("thread", "_worker"),
+}
+_THREAD_NUMBER = re.compile(r"[_-]\d+$")
+
+def _module(filename: str) -> str:
+    return os.path.splitext(os.path.basename(filename))[0]
+
+def _frame_label(code) -> str:
+    # No spaces or semicolons: those separate frames and counts in folded output
+    return f"{_module(code.co_filename)}:{code.co_qualname}".replace(" ", "_").replace(";", ":")
+
+def _is_idle(code) -> bool:
+    return (_module(code.co_filename), code.co_qualname) in _IDLE_LEAVES
+
+class SamplingProfiler:
+    """
+    Statistical profiler for the whole worker. A background thread wakes
+    every `interval` seconds, reads every thread's stack with
+    `sys._current_frames()` and counts each distinct stack. The cost is a
+    stack walk per sample, independent of how much code runs in between.
+    Output is in the folded format read by flamegraph.pl and speedscope:
+    one `thread;outer;...;inner count` line per stack.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.interval = PROFILER_INTERVAL_SECONDS
+        self.include_idle = False
+        self.started_at: Optional[float] = None
+        self.stopped_at: Optional[float] = None
+        self.last_output: Optional[str] = None
+        # Code object -> (label, idle); code objects live as long as their functions
+        self._labels: Dict[Any, Tuple[str, bool]] = {}
+        # Thread id -> name, refreshed when an unknown thread shows up
+        self._names: Dict[int, str] = {}
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(
+        self,
+        interval: float = PROFILER_INTERVAL_SECONDS,
+        duration: float = PROFILER_MAX_SECONDS,
+        include_idle: bool = False
+    ) -> bool:
+        """Start a new profile; returns False if one is already running"""
+        with self._lock:
+            if self.running:
+                return False
+            self.stacks = Counter()
+            self.samples = 0
+            self.interval = max(interval, 0.001)
+            self.include_idle = include_idle
+            self.started_at = time.time()
+            self.stopped_at = None
+            self.last_output = None
+            self._stop.clear()
+            deadline = time.monotonic() + min(duration, PROFILER_MAX_SECONDS)
+            self._thread = threading.Thread(target=self._run, args=(deadline,), name="sampling-profiler", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self) -> Optional[str]:
+        """Stop the running profile and write it out; returns the file path"""
+        thread = self._thread
+        if thread is None:
+            return None
+        self._stop.set()
+        if thread is not threading.current_thread():
+            thread.join()
+        return self.last_output
+
+    def _run(self, deadline: float) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.sample(own_id)
+            if time.monotonic() >= deadline:
+                break
+        self.stopped_at = time.time()
+        try:
+            self.last_output = self.dump()
+        except OSError as e:
+            print(f"Failed to write profile: {e}")
+
+    def sample(self, skip_thread: Optional[int] = None) -> None:
+        """Record the current stack of every thread once"""
+        frames = sys._current_frames()
+        if not frames.keys() <= self._names.keys():
+            self._names = {
+                thread.ident: _THREAD_NUMBER.sub("", thread.name).replace(" ", "_")
+                for thread in threading.enumerate()
+            }
+        for thread_id, frame in frames.items():
+            if thread_id == skip_thread:
+                continue
+            label, idle = self._describe(frame.f_code)
+            if idle and not self.include_idle:
+                continue
+            labels = [label]
+            frame = frame.f_back
+            while frame is not None:
+                labels.append(self._describe(frame.f_code)[0])
+                frame = frame.f_back
+            labels.append(self._names.get(thread_id, "thread"))
+            stack = ";".join(reversed(labels))
+            if stack not in self.stacks and len(self.stacks) >= PROFILER_MAX_STACKS:
+                stack = TRUNCATED_STACK
+            self.stacks[stack] += 1
+        self.samples += 1
+
+    def _describe(self, code) -> Tuple[str, bool]:
+        described = self._labels.get(code)
+        if described is None:
+            described = self._labels[code] = (_frame_label(code), _is_idle(code))
+        return described
+
+    def folded(self) -> str:
+        """The profile so far in folded-stack format, hottest stacks first"""
+        # dict() copies in one step, so the sampler thread can keep counting
+        stacks = dict(self.stacks)
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items(), key=lambda item: -item[1]))
+
+    def dump(self, directory: str = None) -> str:
+        """Write the folded profile to a file and return its path"""
+        directory = directory or PROFILER_OUTPUT_DIR
+        os.makedirs(directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started_at or time.time()))
+        path = os.path.join(directory, f"profile-{os.getpid()}-{stamp}.folded")
+        with open(path, "w") as out:
+            out.write(self.folded())
+        return path
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "interval_seconds": self.interval,
+            "include_idle": self.include_idle,
+            "samples": self.samples,
+            "stacks": len(self.stacks),
+            "started_at": self.started_at,
+            "stopped_at": self.stopped_at,
+            "output": self.last_output,
+        }
+
+    def hottest(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Leaf functions with the most samples, for a quick look without a flamegraph"""
+        leaves: Counter = Counter()
+        for stack, count in dict(self.stacks).items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        total = sum(leaves.values()) or 1
+        return [
+            {"frame": frame, "samples": count, "share": round(count / total, 4)}
+            for frame, count in leaves.most_common(limit)
+        ]
+
+profiler = SamplingProfiler()
@@ -0,0 +1,155 @@
+import fnmatch
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+from dotenv import load_dotenv
+from backend.utils.metrics import registry
+
+# Load environment variables
+load_dotenv()
+
+# Share of requests traced when no rule matches
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.05"))
+# Per-path rates as `glob=rate` pairs, first match wins, e.g. "/chat/*=0.2,/files/*/raw=0.01"
+TRACE_SAMPLE_RULES = os.getenv("TRACE_SAMPLE_RULES", "/health=0,/metrics=0")
+# After an error on a path, its rule is sampled at this rate for TRACE_ERROR_BOOST_SECONDS
+TRACE_ERROR_SAMPLE_RATE = float(os.getenv("TRACE_ERROR_SAMPLE_RATE", "1.0"))
+TRACE_ERROR_BOOST_SECONDS = float(os.getenv("TRACE_ERROR_BOOST_SECONDS", "60"))
+# Most new traces started per second by this worker, 0 for no cap
+TRACE_MAX_PER_SECOND = float(os.getenv("TRACE_MAX_PER_SECOND", "10"))
+
+trace_decisions = registry.counter(
+    "trace_sampling_decisions_total", "Trace sampling decisions by rule and outcome", ("rule", "decision")
+)
+
+DEFAULT_RULE = "*"
+
+@dataclass
+class SamplingRule:
+    """Sample paths matching `pattern` (an fnmatch glob) at `rate`"""
+    pattern: str
+    rate: float
+
+    def matches(self, path: str) -> bool:
+        return fnmatch.fnmatchcase(path, self.pattern)
+
+def parse_rules(spec: str) -> List[SamplingRule]:
+    """Parse `glob=rate,glob=rate`; malformed entries are reported and skipped"""
+    rules = []
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        pattern, _, rate = entry.rpartition("=")
+        try:
+            value = float(rate)
+        except ValueError:
+            value = None
+        if not pattern.strip() or value is None:
+            print(f"Ignoring trace sampling rule {entry!r}: expected glob=rate")
+            continue
+        rules.append(SamplingRule(pattern.strip(), min(max(value, 0.0), 1.0)))
+    return rules
+
+class TokenBucket:
+    """Allows `rate` events per second on average, with bursts up to `rate`"""
+
+    def __init__(self, rate: float, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = max(rate, 1.0)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def take(self) -> bool:
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+class TraceSampler:
+    """
+    Sentry `traces_sampler` with per-path rules, a boost for paths that have
+    recently errored, and a cap on traces per second. It makes the decision
+    itself (returning 0 or 1) so the cap counts traces actually started.
+    Incoming traces keep their parent's decision.
+    """
+
+    def __init__(
+        self,
+        rules: Optional[List[SamplingRule]] = None,
+        default_rate: float = TRACE_SAMPLE_RATE,
+        error_rate: float = TRACE_ERROR_SAMPLE_RATE,
+        error_boost_seconds: float = TRACE_ERROR_BOOST_SECONDS,
+        max_per_second: float = TRACE_MAX_PER_SECOND,
+        clock=time.monotonic,
+        rng: random.Random = None
+    ):
+        self.rules = parse_rules(TRACE_SAMPLE_RULES) if rules is None else rules
+        self.default_rate = default_rate
+        self.error_rate = error_rate
+        self.error_boost_seconds = error_boost_seconds
+        self.bucket = TokenBucket(max_per_second, clock)
+        self.clock = clock
+        self.random = rng or random.Random()
+        # Rule pattern -> monotonic time its error boost ends
+        self._boosted: Dict[str, float] = {}
+
+    def rule_for(self, path: str) -> SamplingRule:
+        for rule in self.rules:
+            if rule.matches(path):
+                return rule
+        return SamplingRule(DEFAULT_RULE, self.default_rate)
+
+    def rate_for(self, path: str) -> float:
+        return self._rate(self.rule_for(path))
+
+    def _rate(self, rule: SamplingRule) -> float:
+        if self._boosted.get(rule.pattern, 0.0) > self.clock():
+            return max(rule.rate, self.error_rate)
+        return rule.rate
+
+    def record_error(self, path: str) -> None:
+        """Sample the rule covering `path` at the error rate for a while"""
+        self._boosted[self.rule_for(path).pattern] = self.clock() + self.error_boost_seconds
+
+    def sample(self, path: str) -> bool:
+        rule = self.rule_for(path)
+        rate = self._rate(rule)
+        if rate <= 0 or self.random.random() >= rate:
+            decision = "rate"
+        elif not self.bucket.take():
+            decision = "capped"
+        else:
+            decision = "sampled"
+        trace_decisions.labels(rule.pattern, decision).inc()
+        return decision == "sampled"
+
+    def __call__(self, sampling_context: Dict[str, Any]) -> float:
+        parent_sampled = sampling_context.get("parent_sampled")
+        if parent_sampled is not None:
+            return 1.0 if parent_sampled else 0.0
+        return 1.0 if self.sample(_request_path(sampling_context)) else 0.0
+
+    def before_send(self, event: Dict[str, Any], hint: Dict[str, Any]) -> Dict[str, Any]:
+        """Sentry `before_send` hook: note the erroring path, pass the event on unchanged"""
+        url = (event.get("request") or {}).get("url")
+        if url:
+            self.record_error(urlsplit(url).path)
+        return event
+
+def _request_path(sampling_context: Dict[str, Any]) -> str:
+    scope = sampling_context.get("asgi_scope") or {}
+    if scope.get("path"):
+        return scope["path"]
+    return (sampling_context.get("transaction_context") or {}).get("name") or "/"
+
+trace_sampler = TraceSampler()
@@ -0,0 +1,46 @@
+import os
+from functools import lru_cache
+from typing import Any, Dict, Optional
+import pydantic_core
+from fastapi import Response
+from pydantic import TypeAdapter
+from dotenv import load_dotenv
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson
+    orjson = None
+
+# Load environment variables
+load_dotenv()
+
+# Validate rows against the response type before encoding them. Off by
+# default: routes select exactly the model's columns, so DB rows already
+# have the right shape. Turn on to catch schema drift in development.
+VALIDATE_RESPONSE_ROWS = os.getenv("VALIDATE_RESPONSE_ROWS", "0") == "1"
+
+@lru_cache(maxsize=256)
+def type_adapter(tp: Any) -> TypeAdapter:
+    """Cached TypeAdapter for a response type such as List[Question]"""
+    return TypeAdapter(tp)
+
+def dumps(value: Any) -> bytes:
+    """Encode JSON-compatible data with orjson when installed, else pydantic-core"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return pydantic_core.to_json(value)
+
+def encode(value: Any, tp: Any) -> bytes:
+    """JSON for `value`, which must match `tp`; validated once when VALIDATE_RESPONSE_ROWS is set"""
+    if VALIDATE_RESPONSE_ROWS:
+        adapter = type_adapter(tp)
+        return adapter.dump_json(adapter.validate_python(value))
+    return dumps(value)
+
+def json_response(value: Any, tp: Any, headers: Optional[Dict[str, str]] = None, status_code: int = 200) -> Response:
+    """
+    Response for DB rows shaped like `tp`, bypassing the per-item model
+    construction and the second validation pass of `response_model`.
+    Keep `response_model` on the route so the schema is still documented.
+    """
+    return Response(encode(value, tp), status_code=status_code, media_type="application/json", headers=headers)
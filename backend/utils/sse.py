@@ -0,0 +1,14 @@
+import json
+from typing import Any, Optional
+
+# Headers that keep proxies from buffering an event stream
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+def format_sse(event: str, data: Any, event_id: Optional[str] = None) -> str:
+    """Encode one Server-Sent Event with a JSON payload; `event_id` comes back as Last-Event-ID on reconnect"""
+    payload = json.dumps(data, default=str)
+    id_line = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{id_line}event: {event}\ndata: {payload}\n\n"
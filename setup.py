@@ -13,7 +13,8 @@ setup(
         "python-dotenv>=0.19.0",
         "supabase>=2.3.0",
         "httpx>=0.24.0,<0.25.0",
-        "email-validator>=2.0.0"
+        "email-validator>=2.0.0",
+        "numpy>=1.24"
     ],
     python_requires=">=3.8",
 ) 
\ No newline at end of file